@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import psutil
+
+import constants as c
+
+"""
+    * The Dask cores resource only limits how many evaluations run, not how much memory their JVMs take.
+    * Before an engine is launched, we check that the node has memory (and cpu) to spare for one more.
+    * Launches that are still coming up have not claimed their memory yet, so they are reserved up front.
+    * If the node is full, the launch waits until an engine exits or another worker frees up memory.
+    * The peak RSS of every engine (JVM and its children) is recorded, and replaces the estimate once it is higher.
+"""
+
+GB: int = 1024**3
+
+
+def get_process_tree_rss(pid: int) -> int:
+    try:
+        process: psutil.Process = psutil.Process(pid)
+        processes: list[psutil.Process] = [process, *process.children(recursive=True)]
+    except psutil.Error:
+        return 0
+
+    rss: int = 0
+    for tree_process in processes:
+        try:
+            rss += tree_process.memory_info().rss
+        except psutil.Error:
+            continue
+
+    return rss
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        est_ram_per_engine_gb: float,
+        memory_headroom_gb: float,
+        max_load_per_core: float,
+        poll_interval_sec: float,
+        timeout_sec: float,
+    ) -> None:
+        self.est_ram_per_engine_bytes: int = int(est_ram_per_engine_gb * GB)
+        self.memory_headroom_bytes: int = int(memory_headroom_gb * GB)
+        self.max_load_per_core: float = max_load_per_core
+        self.poll_interval_sec: float = poll_interval_sec
+        self.timeout_sec: float = timeout_sec
+
+        self.reserved_launches: int = 0
+        self.peak_rss_bytes: int = 0
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def engine_bytes(self) -> int:
+        return max(self.est_ram_per_engine_bytes, self.peak_rss_bytes)
+
+    def has_room(self) -> tuple[bool, str]:
+        available_bytes: int = psutil.virtual_memory().available - self.reserved_launches * self.engine_bytes
+        if available_bytes < self.engine_bytes + self.memory_headroom_bytes:
+            return False, f'{available_bytes / GB:.2f} GB available, an engine needs {self.engine_bytes / GB:.2f} GB'
+
+        load_per_core: float = psutil.getloadavg()[0] / (psutil.cpu_count() or 1)
+        if load_per_core > self.max_load_per_core:
+            return False, f'load per core is {load_per_core:.2f}'
+
+        return True, ''
+
+    # Launches are admitted one at a time, so two of them can't both see the same free memory
+    async def admit(self, slot: int) -> None:
+        start_time: float = time.monotonic()
+        waiting_reason: str | None = None
+
+        async with self.lock:
+            while True:
+                admitted, reason = self.has_room()
+                if admitted:
+                    break
+
+                if time.monotonic() - start_time > self.timeout_sec:
+                    raise RuntimeError(f'Engine in slot {slot} was not admitted within {self.timeout_sec} sec: {reason}')
+
+                if waiting_reason is None:
+                    print(f'Engine launch for slot {slot} is waiting for room on the node: {reason}')
+                waiting_reason = reason
+                await asyncio.sleep(self.poll_interval_sec)
+
+            self.reserved_launches += 1
+
+        if waiting_reason is not None:
+            print(f'Engine launch for slot {slot} admitted after {time.monotonic() - start_time:.1f} sec')
+
+    # Called once the engine is up (or failed to come up), its memory now shows up in the node's usage
+    def release(self) -> None:
+        self.reserved_launches = max(0, self.reserved_launches - 1)
+
+    def record_rss(self, rss_bytes: int) -> None:
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+
+
+# Made the first time an engine is launched on this worker, from the settings pushed to it
+class AdmissionControllerHolder:
+    def __init__(self) -> None:
+        self.controller: AdmissionController | None = None
+
+
+_ADMISSION_CONTROLLER: AdmissionControllerHolder = AdmissionControllerHolder()
+
+
+# Must be called from inside the pool loop
+def get_admission_controller() -> AdmissionController:
+    if _ADMISSION_CONTROLLER.controller is None:
+        _ADMISSION_CONTROLLER.controller = AdmissionController(
+            est_ram_per_engine_gb=c.EST_RAM_PER_ENGINE_GB,
+            memory_headroom_gb=c.ADMISSION_MEMORY_HEADROOM_GB,
+            max_load_per_core=c.ADMISSION_MAX_LOAD_PER_CORE,
+            poll_interval_sec=c.ADMISSION_POLL_SEC,
+            timeout_sec=c.ADMISSION_TIMEOUT_SEC,
+        )
+
+    return _ADMISSION_CONTROLLER.controller
@@ -0,0 +1,84 @@
+import time
+from collections import deque
+
+import aiofiles
+
+import constants as c
+
+"""
+    * Engines are chatty, and writing every line on its own means a thread hop and a tiny write to cluster storage.
+    * The sink keeps the raw lines in memory, and writes them out in batches on size, on time, or when an error shows up.
+    * With the errors level, only the errors and the last few lines of the engine are ever written.
+"""
+
+
+class EngineLogSink:
+    def __init__(
+        self,
+        log_file: aiofiles.threadpool.binary.AsyncBufferedIOBase,
+        level: str,
+        buffer_bytes: int,
+        flush_interval_sec: float,
+        tail_lines: int,
+    ) -> None:
+        self.log_file: aiofiles.threadpool.binary.AsyncBufferedIOBase = log_file
+        self.level: str = level
+        self.buffer_bytes: int = buffer_bytes
+        self.flush_interval_sec: float = flush_interval_sec
+
+        self.buffer: list[bytes] = []
+        self.buffered_bytes: int = 0
+        self.last_flush: float = time.monotonic()
+        self.tail: deque[bytes] = deque(maxlen=tail_lines)
+
+    @classmethod
+    async def open(cls, path: str, level: str | None = None) -> 'EngineLogSink':
+        return cls(
+            await aiofiles.open(path, 'wb'),
+            level=c.ENGINE_LOG_LEVEL if level is None else level,
+            buffer_bytes=c.ENGINE_LOG_BUFFER_BYTES,
+            flush_interval_sec=c.ENGINE_LOG_FLUSH_SEC,
+            tail_lines=c.ENGINE_LOG_TAIL_LINES,
+        )
+
+    async def write(self, line: bytes, is_error: bool = False) -> None:
+        if self.level == c.ENGINE_LOG_LEVELS.ERRORS:
+            if is_error:
+                # The lines leading up to the error are the useful context
+                self.append(b''.join(self.tail))
+                self.append(line)
+                self.tail.clear()
+            else:
+                self.tail.append(line)
+        else:
+            self.append(line)
+
+        if is_error or self.buffered_bytes >= self.buffer_bytes or time.monotonic() - self.last_flush >= self.flush_interval_sec:
+            await self.flush()
+
+    def append(self, data: bytes) -> None:
+        if len(data) == 0:
+            return
+
+        self.buffer.append(data)
+        self.buffered_bytes += len(data)
+
+    async def flush(self) -> None:
+        self.last_flush = time.monotonic()
+        if len(self.buffer) == 0:
+            return
+
+        data: bytes = b''.join(self.buffer)
+        self.buffer.clear()
+        self.buffered_bytes = 0
+
+        await self.log_file.write(data)
+        await self.log_file.flush()
+
+    async def close(self) -> None:
+        if self.level == c.ENGINE_LOG_LEVELS.ERRORS:
+            self.append(b''.join(self.tail))
+            self.tail.clear()
+
+        await self.flush()
+        await self.log_file.close()
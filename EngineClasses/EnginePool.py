@@ -0,0 +1,392 @@
+import asyncio
+import atexit
+import os
+import shutil
+import signal
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Coroutine
+from contextlib import asynccontextmanager
+from types import FrameType
+from typing import Any, TypeVar
+
+from distributed import Worker, WorkerPlugin
+from pyftg.socket.aio.gateway import Gateway
+
+import constants as c
+import EngineClasses.EngineRegistry as er
+import EngineClasses.Staging as st
+import functions as f
+import MotionClasses.MotionEditor as me
+from EngineClasses.AdmissionController import AdmissionController, get_admission_controller, get_process_tree_rss
+from EngineClasses.EngineLogSink import EngineLogSink
+
+"""
+    * Starting a JVM is the slowest part of an evaluation, so we keep the engines alive on each worker.
+    * Every engine is launched with a config path for all 3 characters, that points to its own slot files.
+    * Handing an engine new motions is overwriting its slot files while it is idle. The engine reads them again for every game,
+      so it is only restarted for them when ENGINE_HOT_RELOAD_MOTIONS is off.
+    * Other than that, an engine is only restarted if it dies, or if it was interrupted mid game.
+    * Starting is supervised, an engine that doesn't come up is retried before the slot is retired.
+    * Every engine runs in its own workspace, so the output of a game can be handed to the evaluation that played it.
+    * Launches go through the worker's admission controller, so we only start JVMs the node has memory for.
+    * Pools are keyed on the command line, so every fidelity has its own. HP and duration can't be set per game.
+      A pool that grows first stops the idle engines the other pools have beyond what they reserved.
+    * Retired engines never come back, a runner waiting on one is told so by acquire returning None.
+    * Engines are registered on the node and killed as a process group, see EngineRegistry.
+"""
+
+T = TypeVar('T')
+# What signal.getsignal can hand back
+SignalHandler = Callable[[int, FrameType | None], object] | int | signal.Handlers | None
+
+
+class Engine:
+    def __init__(self, slot: int, pool_name: str) -> None:
+        self.slot: int = slot
+        self.process: asyncio.subprocess.Process | None = None
+        self.gateway: Gateway | None = None
+        self.port: int | None = None
+        self.ready_future: asyncio.Future[int] | None = None
+        self.log_task: asyncio.Task | None = None
+        self.log_sink: EngineLogSink | None = None
+        self.log_path: str | None = None
+        self.motion_key: str | None = None
+        self.peak_rss_bytes: int = 0
+        self.workspace: str = st.get_engine_workspace(pool_name, slot)
+
+        self.motion_paths: list[str] = [
+            st.get_custom_motion_path(
+                pool_name,
+                f'engine_{slot}',
+                f'{character_name.lower()}.csv',
+            )  #
+            for character_name in c.CHARACTER_ORDER.keys()
+        ]
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def config_arguments(self) -> list[str]:
+        arguments: list[str] = ['--config-path', str(len(self.motion_paths))]
+        for character_name, motion_path in zip(c.CHARACTER_ORDER.keys(), self.motion_paths, strict=True):
+            arguments.append(character_name)
+            arguments.append(os.path.abspath(motion_path))
+
+        return arguments
+
+
+class EnginePool:
+    def __init__(self, common_commands: list[str], pool_name: str | None = None) -> None:
+        self.common_commands: list[str] = list(common_commands)
+        self.pool_name: str = (
+            f'enginepool_{os.getpid()}'  #
+            if pool_name is None
+            else pool_name
+        )
+
+        if '-' in self.pool_name:
+            raise ValueError('Please avoid using pool names with -, it will mess up the data consolidator')
+
+        self.admission_controller: AdmissionController = get_admission_controller()
+        self.engines: list[Engine] = []
+        self.idle_engines: deque[Engine] = deque()
+        # Set whenever an engine goes idle or is retired, so a waiting acquire looks again
+        self.engines_changed: asyncio.Event = asyncio.Event()
+        self.next_slot: int = 0
+        # Engines asked for by the evaluations and games running on this worker right now
+        self.reserved_engines: int = 0
+
+    async def ensure_size(self, size: int) -> None:
+        new_engines: list[Engine] = []
+        for _ in range(len(self.engines), size):
+            new_engines.append(Engine(self.next_slot, self.pool_name))
+            self.next_slot += 1
+
+        if len(new_engines) == 0:
+            return
+
+        await stop_unreserved_engines(self)
+        self.engines.extend(new_engines)
+        start_results: list[BaseException | None] = await asyncio.gather(
+            *(self.start_engine(engine) for engine in new_engines),
+            return_exceptions=True,
+        )
+
+        for engine, start_result in zip(new_engines, start_results, strict=True):
+            if isinstance(start_result, BaseException):
+                print(f'Retiring engine slot {engine.slot}: {start_result}')
+                self.retire(engine)
+            else:
+                self.put_idle(engine)
+
+        if len(self.engines) == 0:
+            raise RuntimeError('No engines could be started, ABORT ALL')
+
+    # Evaluations share the pool, so it is sized to what all of them need together
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        self.reserved_engines += size
+        try:
+            await self.ensure_size(self.reserved_engines)
+            yield
+        finally:
+            self.reserved_engines -= size
+
+    async def start_engine(self, engine: Engine) -> None:
+        for attempt in range(c.ENGINE_START_RETRY_LIMIT + 1):
+            try:
+                await self.launch_engine(engine)
+                return
+            except RuntimeError as error:
+                print(f'Engine in slot {engine.slot} failed to start (attempt {attempt + 1}/{c.ENGINE_START_RETRY_LIMIT + 1}): {error}')
+
+        raise RuntimeError(f'Engine in slot {engine.slot} failed to start after {c.ENGINE_START_RETRY_LIMIT + 1} attempts')
+
+    async def launch_engine(self, engine: Engine) -> None:
+        for motion_path, default_motion in zip(engine.motion_paths, me.DEFAULT_MOTION_LIST, strict=True):
+            if not os.path.exists(motion_path):
+                me.save_custom_motion(motion=default_motion, path=motion_path)
+
+        os.makedirs(st.get_log_path(c.LOGS.ENGINES), exist_ok=True)
+
+        await self.admission_controller.admit(engine.slot)
+        try:
+            await self.spawn_engine(engine)
+        finally:
+            self.admission_controller.release()
+
+    async def spawn_engine(self, engine: Engine) -> None:
+        # The motion key stays, a restarted engine reads the same slot files
+        engine.ready_future = asyncio.get_running_loop().create_future()
+        engine.peak_rss_bytes = 0
+        engine.process = await asyncio.create_subprocess_exec(
+            *self.common_commands,
+            *engine.config_arguments(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=engine.workspace,
+            start_new_session=os.name != 'nt',
+        )
+        er.register_engine(engine.process.pid)
+        engine.log_path = st.get_log_path(c.LOGS.ENGINES, f'{self.pool_name}-pid-{engine.process.pid}-{c.GAME_TIME}.log')
+        engine.log_sink = await EngineLogSink.open(engine.log_path)
+        engine.log_task = asyncio.create_task(
+            f.process_simulator_logs(
+                engine.process,
+                engine.log_sink,
+                engine.process.pid,
+                engine.ready_future,
+            )
+        )
+        print(f'Engine started (PID: {engine.process.pid}, SLOT: {engine.slot}).')
+
+        try:
+            engine.port = await asyncio.wait_for(engine.ready_future, timeout=c.ENGINE_READY_TIMEOUT_SEC)
+        except TimeoutError as error:
+            pid: int = engine.process.pid
+            await self.stop_engine(engine)
+            raise RuntimeError(f'Engine in slot {engine.slot} (PID: {pid}) was not ready within {c.ENGINE_READY_TIMEOUT_SEC} sec') from error
+        except RuntimeError as error:
+            await self.stop_engine(engine)
+            raise RuntimeError(f'Engine in slot {engine.slot} failed to start: {error}') from error
+
+        print(f'PID: {engine.process.pid}, PORT: {engine.port}')
+        engine.gateway = Gateway(port=engine.port)
+
+    def record_rss(self, engine: Engine) -> None:
+        if not engine.is_alive:
+            return
+
+        engine.peak_rss_bytes = max(engine.peak_rss_bytes, get_process_tree_rss(engine.process.pid))
+        self.admission_controller.record_rss(engine.peak_rss_bytes)
+
+    async def stop_engine(self, engine: Engine) -> None:
+        if engine.process is not None:
+            self.record_rss(engine)
+            print(f'Engine in slot {engine.slot} (PID: {engine.process.pid}) peaked at {engine.peak_rss_bytes / 1e9:.2f} GB RSS')
+            f.kill_process(engine.process)
+            await engine.process.wait()
+            er.unregister_engine(engine.process.pid)
+
+        if engine.log_task is not None:
+            await asyncio.gather(engine.log_task, return_exceptions=True)
+
+        if engine.log_sink is not None:
+            await engine.log_sink.close()
+            st.sync_back(engine.log_path)
+
+        st.purge_engine_output(engine.workspace)
+
+        engine.process = None
+        engine.gateway = None
+        engine.port = None
+        engine.log_task = None
+        engine.log_sink = None
+        engine.log_path = None
+
+    async def restart_engine(self, engine: Engine) -> None:
+        print(f'Restarting engine in slot {engine.slot}')
+        await self.stop_engine(engine)
+        await self.start_engine(engine)
+
+    # None once every engine of the pool was retired, there is nothing left to wait for
+    async def acquire(self) -> Engine | None:
+        while len(self.engines) != 0:
+            if len(self.idle_engines) != 0:
+                return self.idle_engines.popleft()
+
+            self.engines_changed.clear()
+            await self.engines_changed.wait()
+
+        return None
+
+    def put_idle(self, engine: Engine) -> None:
+        self.idle_engines.append(engine)
+        self.engines_changed.set()
+
+    async def release(self, engine: Engine, healthy: bool = True) -> None:
+        if healthy and engine.is_alive:
+            self.put_idle(engine)
+            return
+
+        # An interrupted engine is still mid game, so it can't be trusted with the next one.
+        try:
+            await self.restart_engine(engine)
+        except RuntimeError as error:
+            print(f'Retiring engine slot {engine.slot}: {error}')
+            self.retire(engine)
+            return
+
+        self.put_idle(engine)
+
+    def retire(self, engine: Engine) -> None:
+        if engine in self.engines:
+            self.engines.remove(engine)
+        self.engines_changed.set()
+
+    # Only idle engines are stopped, the leased ones are back soon enough
+    async def shrink(self, size: int) -> None:
+        while len(self.engines) > size and len(self.idle_engines) != 0:
+            engine: Engine = self.idle_engines.popleft()
+            print(f'Stopping idle engine slot {engine.slot} of {self.pool_name}, {self.reserved_engines} engines are reserved')
+            self.retire(engine)
+            await self.stop_engine(engine)
+
+    async def load_motions(self, engine: Engine, motion_paths: list[str], motion_key: str) -> None:
+        if engine.motion_key == motion_key:
+            return
+
+        for source_path, engine_path in zip(motion_paths, engine.motion_paths, strict=True):
+            shutil.copyfile(source_path, engine_path)
+
+        if not c.ENGINE_HOT_RELOAD_MOTIONS:
+            await self.restart_engine(engine)
+
+        engine.motion_key = motion_key
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*(self.stop_engine(engine) for engine in self.engines))
+        self.engines.clear()
+        self.idle_engines.clear()
+        self.engines_changed.set()
+
+
+# The loop is only made the first time it is needed, the holder keeps it without a global statement
+class PoolLoopHolder:
+    def __init__(self) -> None:
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+
+_POOL_LOOP: PoolLoopHolder = PoolLoopHolder()
+_ENGINE_POOLS: dict[tuple[str, ...], EnginePool] = {}
+
+
+def get_pool_loop() -> asyncio.AbstractEventLoop:
+    # The engine processes are bound to the loop that spawned them, so every evaluation on this worker shares one loop.
+    with _POOL_LOOP.lock:
+        if _POOL_LOOP.loop is None:
+            _POOL_LOOP.loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_POOL_LOOP.loop.run_forever,
+                name='engine-pool-loop',
+                daemon=True,
+            ).start()
+            atexit.register(shutdown_engine_pools)
+            install_signal_handlers()
+            er.sweep_orphaned_engines()
+
+    return _POOL_LOOP.loop
+
+
+def run_in_pool_loop(coroutine: Coroutine[Any, Any, T]) -> T:
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_pool_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # Cancels the evaluation inside the loop, which recycles the engines it was holding
+        future.cancel()
+        raise
+
+
+# Must be called from inside the pool loop
+def get_engine_pool(common_commands: list[str]) -> EnginePool:
+    key: tuple[str, ...] = tuple(common_commands)
+    if key not in _ENGINE_POOLS:
+        _ENGINE_POOLS[key] = EnginePool(common_commands, pool_name=f'enginepool_{os.getpid()}_{len(_ENGINE_POOLS)}')
+
+    return _ENGINE_POOLS[key]
+
+
+# The idle engines of the other pools would otherwise keep their memory for as long as the worker lives,
+# and the admission controller holds the growing pool's launches back for it
+async def stop_unreserved_engines(growing_pool: EnginePool) -> None:
+    for pool in list(_ENGINE_POOLS.values()):
+        if pool is not growing_pool:
+            await pool.shrink(pool.reserved_engines)
+
+
+# Runs at interpreter exit, where the executors are already gone, so we only kill the processes.
+def shutdown_engine_pools() -> None:
+    for pool in list(_ENGINE_POOLS.values()):
+        for engine in pool.engines:
+            if engine.process is not None:
+                f.kill_process(engine.process)
+                er.unregister_engine(engine.process.pid)
+
+    _ENGINE_POOLS.clear()
+
+
+# atexit doesn't run when we are terminated by a signal, so the engines are reaped before the previous handler runs
+def install_signal_handlers() -> None:
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    for signal_name in ['SIGTERM', 'SIGHUP']:
+        if not hasattr(signal, signal_name):
+            continue
+
+        signal_number: int = getattr(signal, signal_name)
+        previous_handler = signal.getsignal(signal_number)
+
+        def reap_engines(signum: int, frame: FrameType | None, previous_handler: SignalHandler = previous_handler) -> None:
+            shutdown_engine_pools()
+            if previous_handler == signal.SIG_IGN:
+                return
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            else:
+                raise SystemExit(128 + signum)
+
+        signal.signal(signal_number, reap_engines)
+
+
+# Dask workers run evaluations off the main thread, so the reaping is tied to the worker's lifecycle instead
+class EngineReaperPlugin(WorkerPlugin):
+    def setup(self, _worker: Worker) -> None:
+        er.sweep_orphaned_engines()
+
+    def teardown(self, _worker: Worker) -> None:
+        shutdown_engine_pools()
@@ -0,0 +1,121 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+
+import psutil
+
+import constants as c
+
+"""
+    * Every engine is started in its own session, so the JVM and everything it spawns can be killed as one group.
+    * Every running engine has a registry file on the node, that names the engine and the worker that owns it.
+    * On a clean exit the registry file is removed with the engine, so whatever is left over belongs to a crashed worker.
+    * The startup sweep kills the engines whose worker is gone, that is what cleans up after SIGKILLs and node timeouts.
+    * The create times are stored as well, so a recycled PID is never mistaken for one of our engines.
+"""
+
+_REGISTRY_LOCK: threading.Lock = threading.Lock()
+
+
+def get_registry_path() -> str:
+    return (
+        os.path.join(tempfile.gettempdir(), 'fightingice_engines')  #
+        if c.ENGINE_REGISTRY_PATH is None
+        else c.ENGINE_REGISTRY_PATH
+    )
+
+
+def get_create_time(pid: int) -> float | None:
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
+
+
+def get_registry_file(engine_pid: int) -> str:
+    return os.path.join(get_registry_path(), f'{socket.gethostname()}_{os.getpid()}_{engine_pid}.json')
+
+
+def register_engine(engine_pid: int) -> None:
+    os.makedirs(get_registry_path(), exist_ok=True)
+    entry: dict[str, int | float | None] = {
+        'worker_pid': os.getpid(),
+        'worker_create_time': get_create_time(os.getpid()),
+        'engine_pid': engine_pid,
+        'engine_create_time': get_create_time(engine_pid),
+    }
+
+    with open(get_registry_file(engine_pid), 'w') as file:
+        json.dump(entry, file)
+
+
+def unregister_engine(engine_pid: int) -> None:
+    try:
+        os.remove(get_registry_file(engine_pid))
+    except FileNotFoundError:
+        pass
+
+
+def is_same_process(pid: int, create_time: float | None) -> bool:
+    return create_time is not None and get_create_time(pid) == create_time
+
+
+def kill_process_group(pid: int) -> None:
+    # Windows has no process groups, but taskkill can take down the whole tree
+    if os.name == 'nt':
+        subprocess.run(
+            ['taskkill', '/F', '/T', '/PID', str(pid)],
+            capture_output=True,
+            check=False,
+        )
+        return
+
+    try:
+        os.killpg(pid, signal.SIGKILL)
+        return
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    # The process isn't leading its own group, so the best we can do is the process itself
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def sweep_orphaned_engines() -> int:
+    registry_path: str = get_registry_path()
+    if not os.path.isdir(registry_path):
+        return 0
+
+    reaped: int = 0
+    with _REGISTRY_LOCK:
+        for entry_name in os.listdir(registry_path):
+            if not entry_name.startswith(f'{socket.gethostname()}_') or not entry_name.endswith('.json'):
+                continue
+
+            entry_path: str = os.path.join(registry_path, entry_name)
+            try:
+                with open(entry_path) as file:
+                    entry: dict[str, int | float | None] = json.load(file)
+            except (OSError, ValueError):
+                continue
+
+            if is_same_process(entry['worker_pid'], entry['worker_create_time']):
+                continue
+
+            if is_same_process(entry['engine_pid'], entry['engine_create_time']):
+                print(f'Reaping orphaned engine (PID: {entry["engine_pid"]}) left behind by worker {entry["worker_pid"]}')
+                kill_process_group(entry['engine_pid'])
+                reaped += 1
+
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+
+    return reaped
@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+import numpy as np
+
+import constants as c
+import functions as f
+from EngineClasses.EnginePool import Engine, EnginePool
+
+"""
+    * An evaluation is broken up into single games, one per (pairing, game) item.
+    * Every engine pulls the next item as soon as it is done with its current game.
+    * This way, an early KO frees up the engine for the next game instead of idling until the slowest engine is done.
+    * If an engine crashes or hangs, it is restarted in place and its game goes back in the queue, up to GAME_RETRY_LIMIT times.
+    * An engine is prepared (handed the motions) before its first game, outside the time limit of the games.
+      A restart can wait on admission and a slow JVM for much longer than a game takes.
+    * With adaptive allocation, the items are only tokens until an engine picks them up, see GeneticAlgorithm/Allocation.py.
+"""
+
+
+class MatchItem:
+    def __init__(self, pairing: int, game: int) -> None:
+        self.pairing: int = pairing
+        self.game: int = game
+        self.attempts: int = 0
+
+    # Keeps the instance % 3 -> pairing convention that the scoring relies on
+    @property
+    def instance(self) -> int:
+        return self.pairing + 3 * self.game
+
+    def __repr__(self) -> str:
+        return f'MatchItem(pairing={self.pairing}, game={self.game})'
+
+
+def create_match_items(games_per_pairing: int, no_pairings: int = 3) -> list[MatchItem]:
+    # Interleaved, so every pairing progresses at the same rate
+    return [
+        MatchItem(pairing, game)  #
+        for game in range(games_per_pairing)
+        for pairing in range(no_pairings)
+    ]
+
+
+# The same for every individual and on every node, so neighbouring genes are compared on the same games
+def get_game_seed(base_seed: int, pairing: int, game: int) -> int:
+    return int(np.random.SeedSequence([base_seed, pairing, game]).generate_state(1)[0])
+
+
+class MatchScheduler:
+    def __init__(
+        self,
+        pool: EnginePool,
+        play_item: Callable[[Engine, MatchItem], Awaitable[None]],
+        item_timeout_sec: float,
+        assign_item: Callable[[MatchItem], None] | None = None,
+        prepare_engine: Callable[[Engine], Awaitable[None]] | None = None,
+    ) -> None:
+        self.pool: EnginePool = pool
+        self.play_item: Callable[[Engine, MatchItem], Awaitable[None]] = play_item
+        self.item_timeout_sec: float = item_timeout_sec
+        # Picks the pairing and game of an item once an engine is free for it, a retried item keeps its own
+        self.assign_item: Callable[[MatchItem], None] | None = assign_item
+        self.prepare_engine: Callable[[Engine], Awaitable[None]] | None = prepare_engine
+
+        self.pending_items: deque[MatchItem] = deque()
+        self.completed_items: list[MatchItem] = []
+        self.failed_items: list[MatchItem] = []
+        self.active_items: dict[int, tuple[Engine, MatchItem]] = {}
+
+    async def run(self, items: list[MatchItem], no_engines: int) -> None:
+        self.pending_items.extend(items)
+
+        runners: list[asyncio.Task] = [
+            asyncio.create_task(self.run_engine())  #
+            for _ in range(min(no_engines, len(self.pool.engines), len(self.pending_items)))
+        ]
+
+        heartbeat: asyncio.Task | None = f.start_heartbeat(self.print_status)
+        try:
+            await asyncio.gather(*runners)
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+
+        # Items can only be left pending if every engine we had was retired
+        self.failed_items.extend(self.pending_items)
+        self.pending_items.clear()
+
+        if len(self.failed_items) != 0:
+            raise RuntimeError(f'{len(self.failed_items)} games could not be played after {c.GAME_RETRY_LIMIT} retries: {self.failed_items}')
+
+    async def run_engine(self) -> None:
+        engine: Engine | None = await self.pool.acquire()
+        # Every engine of the pool was retired while we waited
+        if engine is None:
+            return
+        healthy: bool = True
+
+        try:
+            if self.prepare_engine is not None and len(self.pending_items) != 0:
+                try:
+                    await self.prepare_engine(engine)
+                except RuntimeError as error:
+                    print(f'Retiring engine slot {engine.slot}: {error}')
+                    self.pool.retire(engine)
+                    engine = None
+                    return
+
+            while len(self.pending_items) != 0:
+                item: MatchItem = self.pending_items.popleft()
+                if self.assign_item is not None and item.attempts == 0:
+                    self.assign_item(item)
+                self.active_items[engine.slot] = (engine, item)
+                healthy = False
+                try:
+                    healthy = await self.play_on_engine(engine, item)
+                finally:
+                    self.active_items.pop(engine.slot, None)
+
+                if healthy and engine.is_alive:
+                    self.pool.record_rss(engine)
+                    self.completed_items.append(item)
+                    continue
+
+                self.requeue(item)
+                try:
+                    await self.pool.restart_engine(engine)
+                except RuntimeError as error:
+                    print(f'Retiring engine slot {engine.slot}: {error}')
+                    self.pool.retire(engine)
+                    engine = None
+                    return
+
+                healthy = True
+        except asyncio.CancelledError:
+            healthy = False
+            raise
+        finally:
+            if engine is not None:
+                await self.pool.release(engine, healthy=healthy)
+
+    def requeue(self, item: MatchItem) -> None:
+        item.attempts += 1
+        if item.attempts > c.GAME_RETRY_LIMIT:
+            print(f'Game {item} is out of retries')
+            self.failed_items.append(item)
+            return
+
+        print(f'Putting game {item} back in the queue (retry {item.attempts}/{c.GAME_RETRY_LIMIT})')
+        self.pending_items.append(item)
+
+    # Waits on the game and on the engine process, so a crashed engine is noticed straight away
+    async def play_on_engine(self, engine: Engine, item: MatchItem) -> bool:
+        game: asyncio.Task = asyncio.create_task(self.play_item(engine, item))
+        process_exit: asyncio.Task = asyncio.create_task(engine.process.wait())
+
+        try:
+            done, _ = await asyncio.wait(
+                [game, process_exit],
+                timeout=self.item_timeout_sec,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            process_exit.cancel()
+            if not game.done():
+                game.cancel()
+                await asyncio.gather(game, return_exceptions=True)
+
+        if len(done) == 0:
+            print(f'[CRITICAL] Game {item} exceeded time limit: {self.item_timeout_sec} sec. Recycling engine {engine.slot}.')
+            return False
+
+        if game not in done:
+            print(f'[CRITICAL] Engine {engine.slot} exited during game {item}')
+            return False
+
+        # A game that blew up (a missing or half written game file, a bad JSON, ...) is retried like a crashed engine
+        try:
+            game.result()
+        except Exception as error:
+            print(f'[CRITICAL] Game {item} failed on engine {engine.slot}: {error!r}. Recycling engine {engine.slot}.')
+            return False
+
+        return True
+
+    def print_status(self) -> None:
+        print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        for engine, item in list(self.active_items.values()):
+            pid: int | None = engine.process.pid if engine.process is not None else None
+            print(f'PID: {pid} - {"ACTIVE" if engine.is_alive else "DEAD  "} - {item} - peak RSS {engine.peak_rss_bytes / 1e9:.2f} GB')
+        print(f'Games pending: {len(self.pending_items)}, completed: {len(self.completed_items)}, failed: {len(self.failed_items)}')
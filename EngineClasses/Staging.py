@@ -0,0 +1,308 @@
+import atexit
+import os
+import pathlib
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import constants as c
+
+"""
+    * Disk writes over the cluster network are our bottleneck, so everything the engines produce is staged on the node itself.
+    * The staging root mirrors the project root (symlinks), so the engines can run from inside it and write their logs there.
+    * Finished artifacts are moved to shared storage in the background, or only when flush_sync_back is called.
+    * Without a scratch path, the work root is the shared root, and nothing has to be moved.
+    * Every engine runs in its own workspace, and every evaluation collects its games into its own workspace.
+    * This way, consolidation and scoring never have to look at files from other evaluations.
+"""
+
+ENGINE_WORKSPACES: str = 'engine_workspaces'
+EVALUATION_WORKSPACES: str = 'evaluation_workspaces'
+
+# These are written by the engines / evaluations, so they can't be links to shared storage
+UNMIRRORED_ENTRIES: set[str] = {'log', c.CUSTOM_MOTION_PATH, '.git', ENGINE_WORKSPACES, EVALUATION_WORKSPACES}
+
+# The log groups the engine itself writes to, the engine logs are ours
+ENGINE_OUTPUT_LOGS: list[str] = [log_group for log_group in c.LOGS.KNOWN_LOGS if log_group != c.LOGS.ENGINES]
+
+
+# The staging root and sync back of this worker process, both made the first time they are needed
+class StagingState:
+    def __init__(self) -> None:
+        self.root: str | None = None
+        self.sync_back: SyncBack | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+
+_STAGING: StagingState = StagingState()
+
+
+# Dask workers don't see the arguments parsed by main, so these are pushed to them with client.run
+def configure(
+    scratch_path: str | None,
+    base_path: str | None,
+    sync_mode: str,
+    measure_staging: bool,
+) -> None:
+    c.SCRATCH_PATH = scratch_path
+    c.BASE_PATH = base_path
+    c.STAGING_SYNC_MODE = sync_mode
+    c.MEASURE_STAGING = measure_staging
+
+
+def is_staging() -> bool:
+    return c.SCRATCH_PATH is not None
+
+
+def get_project_root() -> str:
+    return os.path.dirname(os.path.abspath(c.__file__))
+
+
+def get_shared_root() -> str:
+    return c.BASE_PATH if c.BASE_PATH is not None else ''
+
+
+def get_work_root() -> str:
+    if not is_staging():
+        return get_shared_root()
+
+    with _STAGING.lock:
+        if _STAGING.root is None:
+            # Every worker process gets its own root, there can be more than one worker on a node
+            staging_root: str = os.path.join(c.SCRATCH_PATH, f'fightingice_{socket.gethostname()}_{os.getpid()}')
+            os.makedirs(staging_root, exist_ok=True)
+            mirror_project_root(staging_root)
+            _STAGING.root = staging_root
+
+    return _STAGING.root
+
+
+def mirror_project_root(root: str) -> None:
+    project_root: str = get_project_root()
+    for entry in os.listdir(project_root):
+        link_path: str = os.path.join(root, entry)
+        if entry in UNMIRRORED_ENTRIES or os.path.lexists(link_path):
+            continue
+
+        os.symlink(os.path.join(project_root, entry), link_path)
+
+
+def get_engine_workspace(pool_name: str, slot: int) -> str:
+    engine_workspace: str = os.path.join(get_work_root(), ENGINE_WORKSPACES, pool_name, f'engine_{slot}')
+    if not os.path.exists(engine_workspace):
+        os.makedirs(engine_workspace)
+        mirror_project_root(engine_workspace)
+
+    return engine_workspace
+
+
+def get_evaluation_log_path(experiment_name: str, *parts: str) -> str:
+    return os.path.join(get_work_root(), EVALUATION_WORKSPACES, experiment_name, 'log', *parts)
+
+
+# The engine is only ever playing one game, so everything in its log groups belongs to the game that just finished
+def collect_engine_output(engine_workspace: str, experiment_name: str) -> dict[str, list[pathlib.Path]]:
+    collected_files: dict[str, list[pathlib.Path]] = {}
+    for log_group_name in ENGINE_OUTPUT_LOGS:
+        engine_log_group: str = os.path.join(engine_workspace, 'log', log_group_name)
+        if not os.path.isdir(engine_log_group):
+            continue
+
+        evaluation_log_group: str = get_evaluation_log_path(experiment_name, log_group_name)
+        os.makedirs(evaluation_log_group, exist_ok=True)
+        for entry in os.scandir(engine_log_group):
+            evaluation_file: str = os.path.join(evaluation_log_group, entry.name)
+            os.replace(entry.path, evaluation_file)
+            collected_files.setdefault(log_group_name, []).append(pathlib.Path(evaluation_file))
+
+    return collected_files
+
+
+# Whatever a crashed or interrupted engine left behind is half a game, we don't want it
+def purge_engine_output(engine_workspace: str) -> None:
+    for log_group_name in ENGINE_OUTPUT_LOGS:
+        engine_log_group: pathlib.Path = pathlib.Path(engine_workspace, 'log', log_group_name)
+        if engine_log_group.is_dir():
+            shutil.rmtree(engine_log_group)
+
+
+def finish_evaluation(experiment_name: str, keep_motions: bool = True) -> None:
+    evaluation_log_root: str = get_evaluation_log_path(experiment_name)
+
+    # The shared layout stays log/<group>/<file>, no matter where the evaluation was played
+    for log_group_name in c.LOGS.KNOWN_LOGS:
+        evaluation_log_group: str = os.path.join(evaluation_log_root, log_group_name)
+        if not os.path.isdir(evaluation_log_group):
+            continue
+
+        for entry in os.scandir(evaluation_log_group):
+            shared_path: str = os.path.join(get_shared_root(), 'log', log_group_name, entry.name)
+            if is_staging():
+                sync_back(entry.path, shared_path)
+            else:
+                os.makedirs(os.path.dirname(shared_path), exist_ok=True)
+                os.replace(entry.path, shared_path)
+
+    if not is_staging():
+        shutil.rmtree(os.path.dirname(evaluation_log_root), ignore_errors=True)
+
+    if keep_motions:
+        sync_back(get_custom_motion_path(experiment_name))
+    else:
+        shutil.rmtree(get_custom_motion_path(experiment_name), ignore_errors=True)
+
+
+def get_log_path(*parts: str) -> str:
+    return os.path.join(get_work_root(), 'log', *parts)
+
+
+def get_custom_motion_path(*parts: str) -> str:
+    return os.path.join(get_work_root(), c.CUSTOM_MOTION_PATH, *parts)
+
+
+def to_shared_path(local_path: str | pathlib.Path) -> str:
+    relative_path: str = os.path.relpath(local_path, get_work_root())
+    return os.path.join(get_shared_root(), relative_path)
+
+
+class SyncBack:
+    def __init__(self) -> None:
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='staging-sync')
+        self.futures: list[Future] = []
+        self.pending: list[tuple[str, str]] = []
+        self.lock: threading.Lock = threading.Lock()
+
+        self.transferred_bytes: int = 0
+        self.transferred_files: int = 0
+        self.transfer_time_sec: float = 0
+
+    def submit(self, local_path: str, shared_path: str) -> None:
+        with self.lock:
+            if c.STAGING_SYNC_MODE == c.STAGING_SYNC_MODES.ON_REQUEST:
+                self.pending.append((local_path, shared_path))
+            else:
+                self.futures.append(self.executor.submit(self.transfer, local_path, shared_path))
+
+    def transfer(self, local_path: str, shared_path: str) -> None:
+        if not os.path.lexists(local_path):
+            return
+
+        start_time: float = time.perf_counter()
+        size: int = get_size(local_path)
+
+        pathlib.Path(shared_path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.isdir(local_path) and os.path.isdir(shared_path):
+            shutil.copytree(local_path, shared_path, dirs_exist_ok=True)
+            shutil.rmtree(local_path)
+        else:
+            shutil.move(local_path, shared_path)
+
+        with self.lock:
+            self.transferred_bytes += size
+            self.transferred_files += 1
+            self.transfer_time_sec += time.perf_counter() - start_time
+
+    def flush(self) -> None:
+        with self.lock:
+            pending: list[tuple[str, str]] = self.pending
+            futures: list[Future] = self.futures
+            self.pending = []
+            self.futures = []
+
+        # Whoever asked for the flush is waiting on it anyway, and this also works once the executor is shut down at exit
+        for local_path, shared_path in pending:
+            try:
+                self.transfer(local_path, shared_path)
+            except OSError as error:
+                print(f'Failed to sync staged file back to shared storage: {error}')
+
+        for future in futures:
+            try:
+                future.result()
+            except OSError as error:
+                print(f'Failed to sync staged file back to shared storage: {error}')
+
+        if c.MEASURE_STAGING and self.transferred_files != 0:
+            print(
+                f'Staging: synced {self.transferred_files} files ({self.transferred_bytes / 1e6:.2f} MB) '
+                f'to shared storage in {self.transfer_time_sec:.3f} sec'
+            )
+
+
+def get_sync_back() -> SyncBack:
+    with _STAGING.lock:
+        if _STAGING.sync_back is None:
+            _STAGING.sync_back = SyncBack()
+            atexit.register(flush_sync_back)
+
+    return _STAGING.sync_back
+
+
+def sync_back(local_path: str | pathlib.Path, shared_path: str | None = None) -> None:
+    if not is_staging():
+        return
+
+    get_sync_back().submit(
+        str(local_path),
+        to_shared_path(local_path) if shared_path is None else shared_path,
+    )
+
+
+def flush_sync_back() -> None:
+    if _STAGING.sync_back is not None:
+        _STAGING.sync_back.flush()
+
+
+def get_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(file.stat().st_size for file in pathlib.Path(path).rglob('*') if file.is_file())
+
+
+def benchmark_staging(file_count: int = 50, file_size_bytes: int = 1024 * 1024) -> dict[str, float]:
+    """
+    Writes the same files straight to shared storage, and to scratch followed by a sync back.
+    This is the experiment for how much staging actually saves us on a node.
+    """
+    if not is_staging():
+        raise ValueError('Staging is off, pass a scratch path to measure it')
+
+    payload: bytes = os.urandom(file_size_bytes)
+    benchmark_name: str = f'staging_benchmark_{os.getpid()}'
+    direct_directory: str = os.path.join(get_shared_root(), 'log', benchmark_name)
+    staged_directory: str = get_log_path(benchmark_name)
+
+    os.makedirs(direct_directory, exist_ok=True)
+    start_time: float = time.perf_counter()
+    for index in range(file_count):
+        with open(os.path.join(direct_directory, f'{index}.bin'), 'wb') as file:
+            file.write(payload)
+    direct_sec: float = time.perf_counter() - start_time
+    shutil.rmtree(direct_directory)
+
+    os.makedirs(staged_directory, exist_ok=True)
+    start_time = time.perf_counter()
+    for index in range(file_count):
+        with open(os.path.join(staged_directory, f'{index}.bin'), 'wb') as file:
+            file.write(payload)
+    staged_write_sec: float = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    shutil.move(staged_directory, direct_directory)
+    staged_sync_sec: float = time.perf_counter() - start_time
+    shutil.rmtree(direct_directory)
+
+    timings: dict[str, float] = {
+        'direct_sec': direct_sec,
+        'staged_write_sec': staged_write_sec,
+        'staged_sync_sec': staged_sync_sec,
+    }
+    print(
+        f'Staging benchmark ({file_count} x {file_size_bytes / 1e6:.2f} MB): '
+        f'direct {direct_sec:.3f} sec | scratch {staged_write_sec:.3f} sec + sync back {staged_sync_sec:.3f} sec'
+    )
+
+    return timings
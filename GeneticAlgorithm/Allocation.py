@@ -0,0 +1,107 @@
+import numpy as np
+from scipy.stats import binom
+
+import functions as f
+from EngineClasses.MatchScheduler import MatchItem
+from GeneticAlgorithm.GameResult import GameResult, calculate_character_win_rates, count_pairing_wins
+
+"""
+    * Adaptive allocation keeps the games budget of an individual, but not the equal split over the pairings.
+    * The match items are only tokens, the pairing and game of an item are picked when an engine is free to play it.
+    * Every pairing first gets min_games, so every character has a win rate to work with.
+    * After that, the next game goes to the pairing that takes the most off the expected squared error of the competitive balance.
+      The error is taken over every way the games of every pairing can go, with the win rates of the pairings so far as the truth.
+    * It is the exact error and not a linearised variance on purpose: the transform is flat at a 0.5 win rate,
+      so a pairing near 50/50 has no slope there, but a few games can still throw its transformed win rate far off.
+    * Games that are still running count as played, they will shrink the error whatever the outcome.
+    * The competitive balance averages the win rates per pairing, so unequal games per pairing don't weigh one pairing over another.
+"""
+
+
+# The competitive balance for every outcome at once, the harmonic mean only runs over the character axis
+def calculate_balances(character_win_rates: np.ndarray, div_zero_slack: float = 1e-6) -> np.ndarray:
+    transforms: np.ndarray = f.transform_win_rate_array(character_win_rates)
+    return np.minimum(transforms.shape[0] / (1 / (transforms + div_zero_slack)).sum(axis=0), 1)
+
+
+def calculate_balance_error(pairing_win_rates: np.ndarray, games: np.ndarray) -> float:
+    # Wins of the first side, one axis per pairing
+    first_wins: list[np.ndarray] = np.meshgrid(*[np.arange(pairing_games + 1) for pairing_games in games], indexing='ij')
+    probabilities: np.ndarray = np.prod(
+        [
+            binom.pmf(pairing_wins, pairing_games, win_rate)  #
+            for pairing_wins, pairing_games, win_rate in zip(first_wins, games, pairing_win_rates, strict=True)
+        ],
+        axis=0,
+    )
+    side_wins: np.ndarray = np.stack(
+        [
+            np.stack([pairing_wins, pairing_games - pairing_wins])  #
+            for pairing_wins, pairing_games in zip(first_wins, games, strict=True)
+        ]
+    )
+
+    balances: np.ndarray = calculate_balances(calculate_character_win_rates(side_wins, games))
+    true_balance: float = float(
+        calculate_balances(
+            calculate_character_win_rates(np.stack([pairing_win_rates, 1 - pairing_win_rates], axis=1), np.ones(3, dtype=np.int64))
+        )
+    )
+    return float((probabilities * (balances - true_balance) ** 2).sum())
+
+
+def calculate_error_reductions(game_results: list[GameResult], running_pairings: list[int]) -> np.ndarray:
+    side_wins, games = count_pairing_wins(game_results)
+
+    # The posterior mean with a uniform prior, so a pairing that went 2-0 isn't taken as certain
+    pairing_win_rates: np.ndarray = (side_wins[:, 0] + 1) / (side_wins.sum(axis=1) + 2)
+    for pairing in running_pairings:
+        games[pairing] += 1
+
+    error: float = calculate_balance_error(pairing_win_rates, games)
+    return np.array(
+        [
+            error - calculate_balance_error(pairing_win_rates, games + np.eye(3, dtype=np.int64)[pairing])  #
+            for pairing in range(3)
+        ],
+        dtype=np.float64,
+    )
+
+
+def assign_match_item(
+    item: MatchItem,
+    game_results: list[GameResult],
+    allocated_items: list[MatchItem],
+    min_games: int,
+) -> None:
+    """
+    Points the item at the next pairing and its next unused game number, and adds it to the allocated items.
+    allocated_items are all the items of this evaluation that were handed out already, running or finished.
+    """
+    played_games: set[tuple[int, int]] = {(game_result.pairing, game_result.game) for game_result in game_results}
+    running_pairings: list[int] = [
+        allocated_item.pairing  #
+        for allocated_item in allocated_items
+        if (allocated_item.pairing, allocated_item.game) not in played_games
+    ]
+
+    pairing_games: np.ndarray = np.zeros(3, dtype=np.int64)
+    for pairing, _ in played_games:
+        pairing_games[pairing] += 1
+    for pairing in running_pairings:
+        pairing_games[pairing] += 1
+
+    pairing: int = (
+        int(np.argmin(pairing_games))  #
+        if pairing_games.min() < min_games
+        else int(np.argmax(calculate_error_reductions(game_results, running_pairings)))
+    )
+
+    used_games: list[int] = [game for game_pairing, game in played_games if game_pairing == pairing] + [
+        allocated_item.game  #
+        for allocated_item in allocated_items
+        if allocated_item.pairing == pairing
+    ]
+    item.pairing = pairing
+    item.game = max(used_games, default=-1) + 1
+    allocated_items.append(item)
@@ -0,0 +1,124 @@
+from collections.abc import Iterator
+
+import numpy as np
+from distributed import Client
+from pymoo.algorithms.moo.moead import MOEAD
+from pymoo.core.individual import Individual
+from pymoo.core.population import Population
+from pymoo.core.result import Result
+
+import constants as c
+from GeneticAlgorithm.FightingIceProblem import EvaluationQueue, FightingIceProblem
+
+"""
+    * Steady state MOEAD, the cluster never waits for the slowest individual of a generation.
+    * There are always max_in_flight offspring being played. As soon as one lands it goes through the neighbourhood update,
+      and a fresh offspring is bred from the current population and submitted in its place.
+    * Breeding and the replacement are MOEAD's own, only the order the offspring come back in changes.
+      An offspring can be bred from parents that got replaced while it was being played, that is the price of never waiting.
+    * Every pop_size landed offspring count as a generation, so the termination, display and history work like they do in minimize.
+    * The initial population is still played as a whole, through the problem. Offspring skip the surrogate screening.
+    * The fidelity ladder isn't supported, offspring would go straight to full fidelity, so main.py rejects -ufl with -uae.
+"""
+
+
+def get_cluster_cores(client: Client) -> int:
+    return sum(
+        worker['resources'].get('cores', 0)  #
+        for worker in client.scheduler_info()['workers'].values()
+    )
+
+
+def get_max_in_flight(client: Client, engine_multiplier: int) -> int:
+    # One more individual than the cores can take, so a core that frees up always has a game waiting
+    return max(1, get_cluster_cores(client) // (engine_multiplier * 3)) + 1
+
+
+def get_subproblems(algorithm: MOEAD) -> Iterator[int]:
+    while True:
+        yield from algorithm.random_state.permutation(algorithm.pop_size)
+
+
+# The same neighbourhood selection and mating as MOEAD._next
+def breed_offspring(algorithm: MOEAD, k: int) -> Individual:
+    parents = algorithm.selection.do(
+        algorithm.problem,
+        algorithm.pop,
+        1,
+        algorithm.mating.crossover.n_parents,
+        neighbors=[algorithm.neighbors[k]],
+        random_state=algorithm.random_state,
+    )
+
+    return algorithm.random_state.choice(
+        algorithm.mating.do(
+            algorithm.problem,
+            algorithm.pop,
+            1,
+            parents=parents,
+            n_max_iterations=1,
+            random_state=algorithm.random_state,
+        )
+    )
+
+
+def insert_offspring(algorithm: MOEAD, k: int, offspring: Individual, objectives: np.ndarray) -> None:
+    offspring.set('F', objectives)
+    offspring.set('surrogate', False)
+    offspring.evaluated.update(algorithm.evaluator.evaluate_values_of)
+    algorithm.evaluator.n_eval += 1
+
+    algorithm.ideal = np.min(np.vstack([algorithm.ideal, offspring.F]), axis=0)
+    algorithm._replace(k, offspring)
+
+    if algorithm.archive is not None:
+        algorithm.archive = algorithm.archive.add(Population.create(offspring))
+
+
+def run_async_moead(algorithm: MOEAD, problem: FightingIceProblem, max_in_flight: int | None = None) -> Result:
+    """
+    Expects an algorithm that was already set up with the problem, the termination and the seed.
+    """
+    if not algorithm.is_initialized:
+        algorithm.next()
+
+    if max_in_flight is None:
+        max_in_flight = (
+            get_max_in_flight(problem.client, problem.engine_multiplier)  #
+            if c.ASYNC_MAX_IN_FLIGHT is None
+            else c.ASYNC_MAX_IN_FLIGHT
+        )
+    print(f'Async evolution: keeping {max_in_flight} offspring in flight')
+
+    evaluation_queue: EvaluationQueue[tuple[int, Individual]] = EvaluationQueue(
+        problem.client, problem.get_individual_settings(), use_game_queue=c.USE_GAME_QUEUE
+    )
+    subproblems = get_subproblems(algorithm)
+
+    def submit_offspring() -> None:
+        k: int = next(subproblems)
+        offspring: Individual = breed_offspring(algorithm, k)
+        evaluation_queue.submit(offspring.X, tag=(k, offspring))
+
+    if not algorithm.termination.has_terminated():
+        for _ in range(max_in_flight):
+            submit_offspring()
+
+    landed: int = 0
+    for (k, offspring), objectives in evaluation_queue:
+        insert_offspring(algorithm, k, offspring, objectives)
+
+        landed += 1
+        if landed % algorithm.pop_size == 0 and not algorithm.termination.has_terminated():
+            algorithm._post_advance()
+
+        # Whatever is still in flight after the termination gets inserted anyway, those games are played already
+        if not algorithm.termination.has_terminated():
+            submit_offspring()
+
+    algorithm._set_optimum()
+    algorithm.finalize()
+
+    res = algorithm.result()
+    res.algorithm = algorithm
+    return res
@@ -0,0 +1,143 @@
+import math
+
+import numpy as np
+
+"""
+    * The excitement kernel of genetic_functions, for many games in one go.
+    * Games are ragged: their columns are back to back and offsets says where every game starts, like in a frame archive.
+      A list of games or a padded batch is turned into that first (get_ragged_columns, get_ragged_from_padded).
+    * It is bit for bit what the per frame loops gave, not just close:
+      - The win probabilities only add, subtract, multiply and divide, which NumPy rounds the same way as plain floats.
+      - The squares, logs and tanh of the costs go through math, the SIMD versions of NumPy can be an ulp off from libm.
+        That is one value per window (or game), not per frame.
+      - The costs of a game are added up front to back with a cumulative sum, np.sum would add them pairwise.
+    * Frame data kept at a stride gives the same results as all of it, as long as the stride divides the frame window.
+      Both only ever look at frames a whole frame window apart, and the game lengths are the ones from before the stride.
+"""
+
+
+def get_offsets(frame_counts: list[int] | np.ndarray) -> np.ndarray:
+    offsets: np.ndarray = np.zeros(len(frame_counts) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(frame_counts)
+    return offsets
+
+
+def get_ragged_columns(game_columns: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    if len(game_columns) == 0:
+        return np.zeros(0, dtype=np.float64), get_offsets([])
+
+    return np.concatenate(game_columns), get_offsets([len(column) for column in game_columns])
+
+
+# Frames past the frame count of a game are padding, and dropped
+def get_ragged_from_padded(padded_columns: np.ndarray, frame_counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    frame_mask: np.ndarray = np.arange(padded_columns.shape[1]) < np.asarray(frame_counts)[:, np.newaxis]
+    return padded_columns[frame_mask], get_offsets(frame_counts)
+
+
+# The rows that are frame_window frames apart, for every game
+def get_window_rows(frame_window: int, frame_strides: int | np.ndarray, game_count: int) -> np.ndarray:
+    frame_strides = np.broadcast_to(np.asarray(frame_strides, dtype=np.int64), (game_count,))
+    incompatible_strides: list[int] = sorted(set(frame_strides[frame_window % frame_strides != 0].tolist()))
+    if len(incompatible_strides) != 0:
+        raise ValueError(
+            f'A frame window of {frame_window} frames needs frame data with a stride that divides it, '
+            f'but some was kept at a stride of {", ".join(map(str, incompatible_strides))}'
+        )
+
+    return frame_window // frame_strides
+
+
+# Calculated at the POV of player 1, hit_points and energy are (frames, 2)
+def calculate_win_probabilities(
+    hit_points: np.ndarray,
+    energy: np.ndarray,
+    offsets: np.ndarray,
+    player_hp: int,
+    energy_weight: float = 0.5,
+    frame_window: int = 60,
+    projected_hp_weight: float = 0.5,
+    frame_strides: int | np.ndarray = 1,
+) -> np.ndarray:
+    frame_counts: np.ndarray = np.diff(offsets)
+    game_starts: np.ndarray = np.repeat(offsets[:-1], frame_counts)
+    frame_rows: np.ndarray = np.arange(len(hit_points))
+    window_rows: np.ndarray = np.repeat(get_window_rows(frame_window, frame_strides, len(frame_counts)), frame_counts)
+    past_frame_rows: np.ndarray = np.maximum(game_starts, frame_rows - window_rows)
+
+    # As floats the HP and energy are still exact, so every step rounds like it did on the ints of the JSON
+    projected_hp: list[np.ndarray] = []
+    for player in range(2):
+        player_hit_points: np.ndarray = hit_points[:, player].astype(np.float64)
+        effective_hp: np.ndarray = player_hit_points + (energy[:, player].astype(np.float64) * energy_weight)
+        hp_lost: np.ndarray = player_hit_points[past_frame_rows] - player_hit_points
+        projected_hp.append((effective_hp - (hp_lost * projected_hp_weight)) / player_hp)
+
+    p1_dead: np.ndarray = hit_points[:, 0] <= 0
+    p2_dead: np.ndarray = hit_points[:, 1] <= 0
+    # Rows that get picked by an earlier condition are never used, whatever they divide by
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.select(
+            [p1_dead & p2_dead | (frame_rows == game_starts), p1_dead, p2_dead],
+            [0.5, 0.0, 1.0],
+            default=projected_hp[0] / ((projected_hp[0] + projected_hp[1]) + 1e-6),
+        )
+
+
+# Scalar on purpose, np.log and the square of NumPy arrays run SIMD code that can land an ulp away from libm's log and pow,
+# which is what the loops used (and what bit compatibility is checked against). It is one call per window, not per frame.
+def calculate_window_cost(change: float, time_step_size: float, epsilon: float) -> float:
+    # Done just to enure we never pass o to log for errors
+    sigma_t: float = ((change**2) / time_step_size) + epsilon
+    return (sigma_t - math.log(sigma_t) - 1) * time_step_size
+
+
+def calculate_match_costs(
+    win_probabilities: np.ndarray,
+    offsets: np.ndarray,
+    game_duration_sec: int,
+    frame_window: int = 60,
+    epsilon: float = 1e-9,
+    tanh_scale: float = -1,
+    frame_strides: int | np.ndarray = 1,
+    game_lengths: np.ndarray | None = None,
+) -> np.ndarray:
+    invalid_range: float = 1e-2
+    # The frames the games lasted, the rows of games kept at a stride are fewer
+    total_frames: np.ndarray = np.diff(offsets) if game_lengths is None else np.asarray(game_lengths, dtype=np.int64)
+    window_rows: np.ndarray = get_window_rows(frame_window, frame_strides, len(total_frames))
+    normalized_match_durations: np.ndarray = total_frames / (game_duration_sec * 60)
+    # A game that is over within a single window is as dull as it gets, and not scaled by tanh
+    total_costs: np.ndarray = normalized_match_durations * invalid_range
+
+    scored_games: np.ndarray = np.flatnonzero(total_frames > frame_window)
+    if len(scored_games) == 0:
+        return total_costs
+
+    # Every frame_window frames of a game is compared to the frame_window frames before it
+    window_counts: np.ndarray = (total_frames[scored_games] - 1) // frame_window
+    time_step_sizes: np.ndarray = frame_window / total_frames[scored_games]
+    window_games: np.ndarray = np.repeat(np.arange(len(scored_games)), window_counts)
+    window_columns: np.ndarray = np.arange(window_counts.sum()) - np.repeat(get_offsets(window_counts)[:-1], window_counts)
+    scored_window_rows: np.ndarray = window_rows[scored_games][window_games]
+    rows: np.ndarray = offsets[scored_games][window_games] + (window_columns + 1) * scored_window_rows
+    changes: list[float] = (win_probabilities[rows] - win_probabilities[rows - scored_window_rows]).tolist()
+
+    window_costs: np.ndarray = np.zeros(shape=(len(scored_games), window_counts.max()), dtype=np.float64)
+    window_costs[window_games, window_columns] = [
+        calculate_window_cost(change, time_step_size, epsilon)  #
+        for change, time_step_size in zip(changes, time_step_sizes[window_games].tolist(), strict=True)
+    ]
+    # The padding adds 0 to the end of the shorter games
+    scored_costs: np.ndarray = np.cumsum(window_costs, axis=1)[:, -1]
+
+    normalizations: np.ndarray = (epsilon - math.log(epsilon) - 1) * window_counts * time_step_sizes
+    total_costs[scored_games] = 1 - np.maximum(invalid_range, np.minimum(scored_costs / normalizations, 1))
+
+    if tanh_scale != -1:
+        total_costs[scored_games] *= [
+            math.tanh(tanh_scale * normalized_match_duration)  #
+            for normalized_match_duration in normalized_match_durations[scored_games].tolist()
+        ]
+
+    return total_costs
@@ -0,0 +1,60 @@
+from typing import Any
+
+import numpy as np
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+
+import GeneticAlgorithm.Surrogate as su
+
+"""
+    * A fidelity is what a single evaluation costs: games per pairing (per engine), the game duration and the player HP.
+    * The screening fidelity cuts the duration and the HP by the same factor. The damage per second against the HP stays the same,
+      so about as many games end in a KO instead of on time as in the full games.
+    * The search budget of the MCTS agent is built into its jar, so that part can't be scaled down with the rest.
+    * Offspring are screened first, only the ones that end up on (or within the margin of) the front of the population are played at full fidelity.
+      The front's members are compared by their own screening objectives, a screening game is never held against a full one.
+    * Only full fidelity objectives go into selection. The screened out get infinite objectives, no decomposition of MOEAD ever
+      prefers those (PBI could prefer merely bad ones), so they never replace anyone in the population.
+    * Every game result records the HP and duration it was played at, and both are part of the fitness cache key.
+"""
+
+FULL_FIDELITY: str = 'full'
+SCREENING_FIDELITY: str = 'screening'
+SCREENED_OUT_OBJECTIVE: float = np.inf
+
+
+class Fidelity:
+    def __init__(self, name: str, no_matches: int, game_duration_sec: int, player_hp: int) -> None:
+        self.name: str = name
+        # Per engine, like the no_matches of the problem
+        self.no_matches: int = no_matches
+        self.game_duration_sec: int = game_duration_sec
+        self.player_hp: int = player_hp
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'no_matches': self.no_matches,
+            'game_duration_sec': self.game_duration_sec,
+            'player_hp': self.player_hp,
+        }
+
+    def __repr__(self) -> str:
+        return f'Fidelity({self.name}, matches={self.no_matches}, duration={self.game_duration_sec}s, hp={self.player_hp})'
+
+
+def get_screening_fidelity(full_fidelity: Fidelity, match_scale: float, duration_scale: float, min_duration_sec: int) -> Fidelity:
+    game_duration_sec: int = max(min_duration_sec, round(full_fidelity.game_duration_sec * duration_scale))
+
+    return Fidelity(
+        name=SCREENING_FIDELITY,
+        no_matches=max(1, round(full_fidelity.no_matches * match_scale)),
+        game_duration_sec=game_duration_sec,
+        # Scaled by the duration we actually ended up with, so the minimum duration doesn't break the ratio
+        player_hp=max(1, round(full_fidelity.player_hp * game_duration_sec / full_fidelity.game_duration_sec)),
+    )
+
+
+def select_for_promotion(screened_F: np.ndarray, front_screening_F: np.ndarray, margin: float) -> np.ndarray:
+    # Screening objectives are only ever compared to other screening objectives
+    front: np.ndarray = front_screening_F[NonDominatedSorting().do(front_screening_F, only_non_dominated_front=True)]
+    return ~su.is_dominated(screened_F - margin, front)
@@ -1,19 +1,33 @@
-import asyncio
+import os
 import pathlib
 import re
 import uuid
+from collections import deque
+from collections.abc import Iterator
 from datetime import datetime
-from typing import Any
-import os
+from typing import Any, Generic, TypeVar
 
 import numpy as np
-from distributed import Client
+from distributed import Client, Future, as_completed
+from pymoo.core.algorithm import Algorithm
 from pymoo.core.problem import Problem
 from pymoo.core.variable import Integer
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
 
 import constants as c
+import EngineClasses.EnginePool as ep
+import EngineClasses.MatchScheduler as ms
+import EngineClasses.Staging as st
 import functions as f
+import GeneticAlgorithm.Allocation as al
+import GeneticAlgorithm.Fidelity as fi
 import GeneticAlgorithm.genetic_functions as gf
+import GeneticAlgorithm.Racing as ra
+import GeneticAlgorithm.Surrogate as su
+from GeneticAlgorithm.Fidelity import Fidelity
+from GeneticAlgorithm.FitnessCache import FitnessCache, get_cache_key
+from GeneticAlgorithm.GameResult import GameResult
+from GeneticAlgorithm.Racing import RacingSettings
 from MotionClasses.MotionHeaders import MotionHeaders as headers
 from MotionClasses.MotionNames import MotionNames as motion_names
 
@@ -45,6 +59,12 @@ class IndividualSettings:
         engine_multiplier: int,
         game_duration_sec: int,
         visual: bool,
+        motion_adjustments: list[tuple[str, str]] | None = None,
+        fitness_cache_path: str | None = None,
+        racing_settings: RacingSettings | None = None,
+        common_random_numbers_base_seed: int | None = None,
+        player_hp: int | None = None,
+        adaptive_allocation: bool = False,
     ):
         self.motion_coordinates = motion_coordinates
         self.mapped_numerical_motion_coordinates = mapped_numerical_motion_coordinates
@@ -53,13 +73,29 @@ class IndividualSettings:
         self.engine_multiplier = engine_multiplier
         self.game_duration_sec = game_duration_sec
         self.visual = visual
+        self.motion_adjustments = motion_adjustments
+        # None turns the fitness cache off
+        self.fitness_cache_path = fitness_cache_path
+        # None plays every game
+        self.racing_settings = racing_settings
+        # None leaves the games unseeded
+        self.common_random_numbers_base_seed = common_random_numbers_base_seed
+        self.player_hp = c.PLAYER_HP if player_hp is None else player_hp
+        # Same number of games, split over the pairings by how much they reduce the competitive balance error
+        self.adaptive_allocation = adaptive_allocation
 
 
-def evaluate_individual(x: np.ndarray, settings: IndividualSettings) -> np.ndarray:
+EXCITEMENT_FRAME_WINDOW: int = 10
+# Whatever the caller of an EvaluationQueue needs to recognise the individual when it comes back
+Tag = TypeVar('Tag')
+
+
+# Doesn't need any games, so the surrogate never has to predict it
+def calculate_uniqueness(x: np.ndarray, settings: IndividualSettings) -> float:
     mutated_motions = gf.gene_to_motions(gene=x, motion_coordinates=settings.motion_coordinates)
 
     numerical_differences = np.stack([motion.select_dtypes('number') for motion in mutated_motions])
-    uniqueness_reward = gf.constraint_novelty_search(
+    return gf.constraint_novelty_search(
         numerical_motions=numerical_differences,
         motion_coordinates=settings.motion_coordinates,
         mapped_numerical_motion_coordinates=settings.mapped_numerical_motion_coordinates,
@@ -67,29 +103,247 @@ def evaluate_individual(x: np.ndarray, settings: IndividualSettings) -> np.ndarr
         boolean_motions=None,
     )
 
-    amended_experiment_name: str = f.append_time_uuid_experiment(settings.experiment_name)
 
-    competitive_balance = asyncio.run(
+class IndividualEvaluation:
+    """
+    The games and objectives of one individual.
+    Used on the worker when a whole individual is a task, and by the client when every game is its own task.
+    """
+
+    def __init__(self, x: np.ndarray, settings: IndividualSettings) -> None:
+        self.x: np.ndarray = x
+        self.settings: IndividualSettings = settings
+        self.games_per_pairing: int = settings.no_matches * settings.engine_multiplier
+        self.experiment_name: str = f.append_time_uuid_experiment(settings.experiment_name)
+
+        self.fitness_cache: FitnessCache | None = None
+        self.cache_key: str | None = None
+        self.game_results: list[GameResult] = []
+        self.cached_objectives: dict[str, list[float]] = {}
+        self.running_games: int = 0
+        self.allocated_items: list[ms.MatchItem] = []
+
+        if settings.fitness_cache_path is not None:
+            self.fitness_cache = FitnessCache(settings.fitness_cache_path)
+            self.cache_key = get_cache_key(
+                gene=x,
+                motion_adjustments=settings.motion_adjustments,
+                motion_coordinates=settings.motion_coordinates,
+                player_hp=settings.player_hp,
+                game_duration_sec=settings.game_duration_sec,
+                agent_names=[gf.MATCH_AGENT_NAME],
+                excitement_frame_window=EXCITEMENT_FRAME_WINDOW,
+                common_random_numbers_base_seed=settings.common_random_numbers_base_seed,
+                adaptive_allocation=settings.adaptive_allocation,
+            )
+            self.game_results, self.cached_objectives = self.fitness_cache.load(self.cache_key)
+
+        # Only the games the cache doesn't have yet are played
+        self.pending_items: list[ms.MatchItem] = (
+            []  #
+            if self.is_cached
+            else gf.get_missing_match_items(self.game_results, self.games_per_pairing)
+        )
+        # With adaptive allocation the items are only tokens for what is left of the budget
+        if settings.adaptive_allocation and not self.is_cached:
+            self.pending_items = ms.create_match_items(self.games_per_pairing)[len(self.game_results) :]
+        if len(self.pending_items) == 0:
+            print(f'Serving {settings.experiment_name} individual from the fitness cache')
+
+    @property
+    def is_cached(self) -> bool:
+        return str(self.games_per_pairing) in self.cached_objectives
+
+    def next_batch(self) -> list[ms.MatchItem]:
+        racing_settings: RacingSettings | None = self.settings.racing_settings
+        if self.settings.adaptive_allocation:
+            return self.next_adaptive_batch()
+
+        if racing_settings is None:
+            batch, self.pending_items = self.pending_items, []
+            return batch
+
+        if len(self.pending_items) == 0 or ra.is_settled(self.game_results, racing_settings):
+            self.pending_items = []
+            return []
+
+        batch_size: int = racing_settings.batch_games * 3
+        batch, self.pending_items = self.pending_items[:batch_size], self.pending_items[batch_size:]
+        return batch
+
+    # Tops the running games up to one per engine, every game is allocated on the results that are in so far
+    def next_adaptive_batch(self) -> list[ms.MatchItem]:
+        racing_settings: RacingSettings | None = self.settings.racing_settings
+        if racing_settings is not None and len(self.pending_items) != 0 and ra.is_settled(self.game_results, racing_settings):
+            self.pending_items = []
+
+        batch: list[ms.MatchItem] = []
+        while len(self.pending_items) != 0 and self.running_games + len(batch) < self.settings.engine_multiplier * 3:
+            match_item: ms.MatchItem = self.pending_items.pop(0)
+            al.assign_match_item(match_item, self.game_results, self.allocated_items, c.ALLOCATION_MIN_GAMES)
+            batch.append(match_item)
+
+        return batch
+
+    def get_objectives(self) -> np.ndarray:
+        if self.is_cached:
+            competitive_balance, excitement = self.cached_objectives[str(self.games_per_pairing)]
+        else:
+            # Adaptive games don't fill every pairing up to games_per_pairing, all of them are in the budget
+            selected_game_results: list[GameResult] = (
+                self.game_results  #
+                if self.settings.adaptive_allocation
+                else gf.select_game_results(self.game_results, self.games_per_pairing)
+            )
+            competitive_balance = gf.calculate_competitive_balance(selected_game_results)
+            excitement = gf.aggregate_entropy_score(
+                np.array([game_result.excitement_cost for game_result in selected_game_results], dtype=np.float64),
+            )
+
+            if self.fitness_cache is not None:
+                # Objectives of a raced individual are based on fewer games, so only the games are kept for those
+                if len(selected_game_results) == self.games_per_pairing * 3:
+                    self.cached_objectives[str(self.games_per_pairing)] = [float(competitive_balance), float(excitement)]
+                self.fitness_cache.save(self.cache_key, self.game_results, self.cached_objectives)
+
+        return np.array(
+            [
+                -competitive_balance,
+                -excitement,
+                -calculate_uniqueness(self.x, self.settings),
+            ],
+            dtype=np.float64,
+        )
+
+
+def evaluate_individual(x: np.ndarray, settings: IndividualSettings) -> np.ndarray:
+    evaluation = IndividualEvaluation(x, settings)
+
+    if len(evaluation.pending_items) != 0:
+        new_game_results: list[GameResult] = ep.run_in_pool_loop(
+            gf.orchestrate_matches(
+                mutated_motions=gf.gene_to_motions(gene=x, motion_coordinates=settings.motion_coordinates),
+                no_matches=settings.no_matches,
+                experiment_name=evaluation.experiment_name,
+                engine_multiplier=settings.engine_multiplier,
+                game_duration_sec=settings.game_duration_sec,
+                visual=settings.visual,
+                match_items=evaluation.pending_items,
+                racing_settings=settings.racing_settings,
+                prior_game_results=evaluation.game_results,
+                excitement_frame_window=EXCITEMENT_FRAME_WINDOW,
+                common_random_numbers_base_seed=settings.common_random_numbers_base_seed,
+                player_hp=settings.player_hp,
+                adaptive_allocation=settings.adaptive_allocation,
+            )
+        )
+        st.finish_evaluation(evaluation.experiment_name)
+
+        evaluation.game_results.extend(new_game_results)
+
+    return evaluation.get_objectives()
+
+
+# A single game of an individual, on whichever worker has a free core
+def evaluate_game(x: np.ndarray, settings: IndividualSettings, experiment_name: str, pairing: int, game: int) -> GameResult:
+    match_item = ms.MatchItem(pairing, game)
+    # Games of the same individual can land on the same worker, so every game gets its own workspace
+    game_experiment_name: str = f'{experiment_name}_i{match_item.instance}'
+
+    game_results: list[GameResult] = ep.run_in_pool_loop(
         gf.orchestrate_matches(
-            mutated_motions=mutated_motions,
+            mutated_motions=gf.gene_to_motions(gene=x, motion_coordinates=settings.motion_coordinates),
             no_matches=settings.no_matches,
-            experiment_name=amended_experiment_name,
+            experiment_name=game_experiment_name,
             engine_multiplier=settings.engine_multiplier,
             game_duration_sec=settings.game_duration_sec,
             visual=settings.visual,
+            match_items=[match_item],
+            no_engines=1,
+            excitement_frame_window=EXCITEMENT_FRAME_WINDOW,
+            common_random_numbers_base_seed=settings.common_random_numbers_base_seed,
+            player_hp=settings.player_hp,
+            # An engine that played another game of this individual already has its motions
+            motion_key=experiment_name,
         )
     )
-
-    excitement = asyncio.run(gf.calculate_excitement(amended_experiment_name, frame_window=10))
-
-    return np.array(
-        [
-            -competitive_balance,
-            -excitement,
-            -uniqueness_reward,
-        ],
-        dtype=np.float64,
-    )
+    # The gene is already in the results, we don't need a copy of the motions for every game
+    st.finish_evaluation(game_experiment_name, keep_motions=False)
+
+    return game_results[0]
+
+
+class EvaluationQueue(Generic[Tag]):
+    """
+    Keeps individuals running on the cluster, and hands every one back as soon as its last game is in.
+    With the game queue every game is its own single core task, so no core sits idle while a slow individual finishes.
+    Otherwise every individual is a single engine_multiplier * 3 core task.
+    """
+
+    def __init__(self, client: Client, settings: IndividualSettings, use_game_queue: bool) -> None:
+        self.client = client
+        self.settings = settings
+        self.use_game_queue = use_game_queue
+        self.futures = as_completed()
+        self.owners: dict[str, tuple[Tag, IndividualEvaluation | None]] = {}
+        self.finished: deque[tuple[Tag, np.ndarray]] = deque()
+
+    def submit(self, x: np.ndarray, tag: Tag) -> None:
+        if not self.use_game_queue:
+            future = self.client.submit(
+                evaluate_individual,
+                x,
+                self.settings,
+                resources={'cores': self.settings.engine_multiplier * 3},
+                pure=False,
+            )
+            self.owners[future.key] = (tag, None)
+            self.futures.add(future)
+            return
+
+        self.submit_next_batch(tag, IndividualEvaluation(x, self.settings))
+
+    def submit_next_batch(self, tag: Tag, evaluation: IndividualEvaluation) -> None:
+        for match_item in evaluation.next_batch():
+            future = self.client.submit(
+                evaluate_game,
+                evaluation.x,
+                self.settings,
+                evaluation.experiment_name,
+                match_item.pairing,
+                match_item.game,
+                resources={'cores': 1},
+                pure=False,
+            )
+            self.owners[future.key] = (tag, evaluation)
+            evaluation.running_games += 1
+            self.futures.add(future)
+
+        # Nothing left to play, either everything is in or it was all in the cache
+        if evaluation.running_games == 0:
+            self.finished.append((tag, evaluation.get_objectives()))
+
+    def collect(self, future: Future) -> None:
+        tag, evaluation = self.owners.pop(future.key)
+        if evaluation is None:
+            self.finished.append((tag, np.asarray(future.result(), dtype=np.float64)))
+            return
+
+        evaluation.running_games -= 1
+        evaluation.game_results.append(future.result())
+
+        # With racing, the next batch is only decided once the current one is in. Adaptive games are allocated one by one
+        if evaluation.running_games == 0 or self.settings.adaptive_allocation:
+            self.submit_next_batch(tag, evaluation)
+
+    # Individuals submitted while iterating are picked up as well
+    def __iter__(self) -> Iterator[tuple[Tag, np.ndarray]]:
+        while len(self.finished) != 0 or len(self.owners) != 0:
+            if len(self.finished) == 0:
+                self.collect(next(self.futures))
+                continue
+
+            yield self.finished.popleft()
 
 
 class FightingIceProblem(Problem):
@@ -101,6 +355,8 @@ class FightingIceProblem(Problem):
         engine_multiplier: int = 1,
         game_duration_sec: int = 60,
         visual: bool = False,
+        fitness_cache_path: str | None = None,
+        racing_settings: RacingSettings | None = None,
         **kwargs: Any,
     ) -> None:
 
@@ -110,6 +366,44 @@ class FightingIceProblem(Problem):
         self.engine_multiplier = engine_multiplier
         self.game_duration_sec = game_duration_sec
         self.client = dask_client
+        self.fitness_cache_path = (
+            os.path.join(st.get_shared_root(), c.FITNESS_CACHE_PATH)  #
+            if fitness_cache_path is None and c.USE_FITNESS_CACHE
+            else fitness_cache_path
+        )
+        # A batch is one game per engine, so racing never leaves engines idle
+        self.racing_settings = (
+            RacingSettings(
+                batch_games=engine_multiplier,
+                min_games=c.RACING_MIN_GAMES,
+                max_interval_width=c.RACING_MAX_INTERVAL_WIDTH,
+                balance_floor=c.RACING_BALANCE_FLOOR,
+            )  #
+            if racing_settings is None and c.USE_RACING
+            else racing_settings
+        )
+
+        # Promotion to the full fidelity is decided against the screening objectives of the population's front
+        self.use_fidelity_ladder = c.USE_FIDELITY_LADDER
+        self.full_fidelity = Fidelity(fi.FULL_FIDELITY, no_matches, game_duration_sec, c.PLAYER_HP)
+        self.screening_fidelity = fi.get_screening_fidelity(
+            self.full_fidelity,
+            match_scale=c.SCREENING_MATCH_SCALE,
+            duration_scale=c.SCREENING_DURATION_SCALE,
+            min_duration_sec=c.SCREENING_MIN_DURATION_SEC,
+        )
+        self.screening_objectives: dict[tuple[int, ...], np.ndarray] = {}
+        if self.use_fidelity_ladder:
+            print(f'Fidelity ladder: screening at {self.screening_fidelity}, promoting to {self.full_fidelity}')
+
+        self.adaptive_allocation = c.USE_ADAPTIVE_ALLOCATION
+
+        # Game k of pairing p gets the same seed for every individual
+        self.common_random_numbers_base_seed = (
+            c.COMMON_RANDOM_NUMBERS_BASE_SEED  #
+            if c.USE_COMMON_RANDOM_NUMBERS
+            else None
+        )
 
         # Going to adjust the experiment name if its already in use
         pathlib.Path(c.CUSTOM_MOTION_PATH).mkdir(parents=True, exist_ok=True)
@@ -165,6 +459,12 @@ class FightingIceProblem(Problem):
         self.motion_mapper = f.motion_cord_to_index_bulk(self.motion_coordinates)
 
         gene_count: int = len(self.motion_adjustments) * 3
+
+        # Only simulated individuals end up in the history the surrogate is trained on
+        self.use_surrogate = c.USE_SURROGATE
+        self.history_X = np.zeros(shape=(0, gene_count), dtype=np.int64)
+        self.history_F = np.zeros(shape=(0, 3), dtype=np.float64)
+
         xl = np.zeros(shape=gene_count, dtype=np.int64)
         xu = np.zeros(shape=gene_count, dtype=np.int64)
 
@@ -183,6 +483,39 @@ class FightingIceProblem(Problem):
             xu=xu,
             vtype=int,
             vars=prob_vars,
+            # Otherwise pymoo drops the algorithm before _evaluate, the fidelity ladder needs its population
+            requires_kwargs=True,
+        )
+
+    def get_individual_settings(self, fidelity: Fidelity | None = None) -> IndividualSettings:
+        # Problems pickled before the fidelity ladder only know the full games
+        if fidelity is None:
+            fidelity = getattr(
+                self,
+                'full_fidelity',
+                Fidelity(fi.FULL_FIDELITY, self.no_matches, self.game_duration_sec, c.PLAYER_HP),
+            )
+
+        return IndividualSettings(
+            motion_coordinates=self.motion_coordinates,
+            mapped_numerical_motion_coordinates=self.numerical_mapped_motion_coordinates,
+            no_matches=fidelity.no_matches,
+            # Screening games are kept apart from the full games in the logs
+            experiment_name=(
+                self.experiment_name  #
+                if fidelity.name == fi.FULL_FIDELITY
+                else f'{self.experiment_name}_{fidelity.name}'
+            ),
+            engine_multiplier=self.engine_multiplier,
+            game_duration_sec=fidelity.game_duration_sec,
+            visual=self.visual,
+            motion_adjustments=self.motion_adjustments,
+            # Problems pickled before the cache existed don't have it
+            fitness_cache_path=getattr(self, 'fitness_cache_path', None),
+            racing_settings=getattr(self, 'racing_settings', None),
+            common_random_numbers_base_seed=getattr(self, 'common_random_numbers_base_seed', None),
+            player_hp=fidelity.player_hp,
+            adaptive_allocation=getattr(self, 'adaptive_allocation', False),
         )
 
     def _evaluate(
@@ -192,26 +525,110 @@ class FightingIceProblem(Problem):
         *args: Any,
         **kwargs: Any,
     ) -> None:
-        eval_settings = IndividualSettings(
-            motion_coordinates=self.motion_coordinates,
-            mapped_numerical_motion_coordinates=self.numerical_mapped_motion_coordinates,
-            no_matches=self.no_matches,
-            experiment_name=self.experiment_name,
-            engine_multiplier=self.engine_multiplier,
-            game_duration_sec=self.game_duration_sec,
-            visual=self.visual,
+        eval_settings = self.get_individual_settings()
+
+        # Duplicates in the same population are only played once, they would all miss the cache at the same time
+        unique_X, inverse_index = np.unique(X, axis=0, return_inverse=True)
+        inverse_index = inverse_index.reshape(-1)
+
+        unique_F = np.zeros(shape=(len(unique_X), self.n_obj), dtype=np.float64)
+        unique_fidelity = np.full(shape=len(unique_X), fill_value=fi.FULL_FIDELITY, dtype=object)
+        simulate = self.screen_with_surrogate(unique_X, unique_F, eval_settings)
+
+        if len(unique_X[simulate]) != 0:
+            unique_F[simulate], unique_fidelity[simulate] = self.evaluate_with_ladder(unique_X[simulate], eval_settings, kwargs.get('algorithm'))
+
+        if getattr(self, 'use_surrogate', False):
+            # The surrogate only learns the full fidelity objectives
+            full_fidelity = simulate & (unique_fidelity == fi.FULL_FIDELITY)
+            self.history_X = np.concatenate([self.history_X, unique_X[full_fidelity]])
+            self.history_F = np.concatenate([self.history_F, unique_F[full_fidelity]])
+
+        out['F'] = unique_F[inverse_index]
+        # Individuals that were never played, their competitive balance and excitement are predictions
+        out['surrogate'] = ~simulate[inverse_index]
+        # The fidelity the objectives of every individual were played at
+        out['fidelity'] = unique_fidelity[inverse_index]
+
+    # pymoo hands the algorithm to the evaluation, its population is what the screened offspring have to compete with
+    def evaluate_with_ladder(
+        self, X: np.ndarray, eval_settings: IndividualSettings, algorithm: Algorithm | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        fidelity = np.full(shape=len(X), fill_value=fi.FULL_FIDELITY, dtype=object)
+        if not getattr(self, 'use_fidelity_ladder', False):
+            return self.evaluate_on_cluster(X, eval_settings), fidelity
+
+        F = self.evaluate_on_cluster(X, self.get_individual_settings(self.screening_fidelity))
+        for x, objectives in zip(X, F, strict=True):
+            self.screening_objectives[tuple(x.tolist())] = objectives
+
+        # Until there is a population (the initial one is being played) everyone is promoted, so its front has screening objectives too
+        front_screening_F = self.get_front_screening_objectives(algorithm)
+        promote = (
+            np.ones(shape=len(X), dtype=bool)  #
+            if front_screening_F is None
+            else fi.select_for_promotion(F[:, :2], front_screening_F[:, :2], margin=c.FIDELITY_PROMOTION_MARGIN)
         )
+        print(f'Fidelity ladder: promoting {promote.sum()} of {len(X)} individuals to full fidelity')
+
+        fidelity[~promote] = fi.SCREENING_FIDELITY
+        if promote.any():
+            F[promote] = self.evaluate_on_cluster(X[promote], eval_settings)
+        # Screening objectives never make it into selection
+        F[~promote] = fi.SCREENED_OUT_OBJECTIVE
+
+        return F, fidelity
+
+    # The screening objectives of the population's non dominated front, None when there is nothing to compare against
+    def get_front_screening_objectives(self, algorithm: Algorithm | None) -> np.ndarray | None:
+        population = getattr(algorithm, 'pop', None)
+        if population is None or len(population) == 0:
+            return None
+
+        front = population[NonDominatedSorting().do(population.get('F'), only_non_dominated_front=True)]
+        # Front members the surrogate predicted were never screened
+        front_screening_F = [
+            self.screening_objectives[tuple(x.tolist())]  #
+            for x in front.get('X')
+            if tuple(x.tolist()) in self.screening_objectives
+        ]
 
-        futures = self.client.map(
-            evaluate_individual,
-            X,
-            settings=eval_settings,
-            resources={'cores': self.engine_multiplier * 3},
+        return np.array(front_screening_F) if len(front_screening_F) != 0 else None
+
+    def evaluate_on_cluster(self, X: np.ndarray, eval_settings: IndividualSettings) -> np.ndarray:
+        evaluation_queue: EvaluationQueue[int] = EvaluationQueue(self.client, eval_settings, use_game_queue=c.USE_GAME_QUEUE)
+        for index, x in enumerate(X):
+            evaluation_queue.submit(x, tag=index)
+
+        F = np.zeros(shape=(len(X), self.n_obj), dtype=np.float64)
+        for index, objectives in evaluation_queue:
+            F[index] = objectives
+
+        return F
+
+    # Fills in the predictions of everyone that isn't simulated, and returns who should be
+    def screen_with_surrogate(self, unique_X: np.ndarray, unique_F: np.ndarray, eval_settings: IndividualSettings) -> np.ndarray:
+        simulate = np.ones(shape=len(unique_X), dtype=bool)
+        if not getattr(self, 'use_surrogate', False) or len(self.history_X) < c.SURROGATE_MIN_HISTORY:
+            return simulate
+
+        # Uniqueness is calculated for real, only the objectives that need games are predicted
+        model = su.fit_surrogate(self.history_X, self.history_F[:, :2], no_trees=c.SURROGATE_TREES, seed=c.GLOBAL_SEED)
+        mean, std = su.predict_objectives(model, unique_X)
+        simulate = su.select_for_simulation(
+            mean,
+            std,
+            self.history_F[:, :2],
+            kappa=c.SURROGATE_KAPPA,
+            uncertainty_threshold=c.SURROGATE_UNCERTAINTY,
+            min_simulated_fraction=c.SURROGATE_MIN_SIMULATED_FRACTION,
         )
 
-        results = self.client.gather(futures)
+        unique_F[~simulate, :2] = mean[~simulate]
+        unique_F[~simulate, 2] = [-calculate_uniqueness(x, eval_settings) for x in unique_X[~simulate]]
+        print(f'Surrogate: simulating {simulate.sum()} of {len(unique_X)} individuals')
 
-        out['F'] = np.array(results, dtype=np.float64)
+        return simulate
 
     # These 2 are for when pymoo makes a copy of this object.
     # It will try to copy the client, but thats an object that can't be copied.
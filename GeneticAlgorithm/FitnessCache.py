@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import uuid
+from typing import Any
+
+import numpy as np
+
+import constants as c
+from GeneticAlgorithm.GameResult import GameResult
+
+"""
+    * MOEAD regularly produces genes that were already played, so the games of every evaluation are kept on disk.
+    * The key is a hash of everything that changes the outcome of a game: the gene, what it adjusts, HP, duration, agents, the seed schedule and the engine jar.
+    * An entry holds the per-game results, so an evaluation that asks for more games only has to play the extra ones.
+    * Entries are written to a temporary file and renamed, so workers on other nodes never read half an entry.
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def get_engine_hash() -> str:
+    project_root: pathlib.Path = pathlib.Path(c.__file__).resolve().parent
+    engine_hash = hashlib.sha256()
+    for jar_path in sorted(project_root.glob('*.jar')):
+        engine_hash.update(jar_path.name.encode())
+        with jar_path.open('rb') as jar_file:
+            for chunk in iter(lambda: jar_file.read(1024 * 1024), b''):
+                engine_hash.update(chunk)
+
+    return engine_hash.hexdigest()
+
+
+def get_cache_key(
+    gene: np.ndarray,
+    motion_adjustments: list[tuple[str, str]] | None,
+    motion_coordinates: np.ndarray,
+    player_hp: int,
+    game_duration_sec: int,
+    agent_names: list[str],
+    excitement_frame_window: int,
+    common_random_numbers_base_seed: int | None = None,
+    adaptive_allocation: bool = False,
+) -> str:
+    key_data: dict[str, Any] = {
+        'gene': np.asarray(gene, dtype=np.int64).tolist(),
+        'motion_adjustments': None if motion_adjustments is None else [list(adjustment) for adjustment in motion_adjustments],
+        'motion_coordinates': np.asarray(motion_coordinates).tolist(),
+        'player_hp': player_hp,
+        'game_duration_sec': game_duration_sec,
+        'agent_names': agent_names,
+        'excitement_frame_window': excitement_frame_window,
+        'engine_hash': get_engine_hash(),
+    }
+    # Only part of the key when it is set, so the entries of unseeded runs keep their keys
+    if common_random_numbers_base_seed is not None:
+        key_data['common_random_numbers_base_seed'] = common_random_numbers_base_seed
+    # The games of an adaptive individual aren't the first games of every pairing, so they can't be mixed with the rest
+    if adaptive_allocation:
+        key_data['adaptive_allocation'] = True
+
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+
+class FitnessCache:
+    def __init__(self, cache_path: str) -> None:
+        self.cache_path: str = cache_path
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_path, key[:2], f'{key}.json')
+
+    def load(self, key: str) -> tuple[list[GameResult], dict[str, list[float]]]:
+        entry_path: str = self.get_entry_path(key)
+        if not os.path.exists(entry_path):
+            return [], {}
+
+        try:
+            with open(entry_path) as entry_file:
+                entry: dict[str, Any] = json.load(entry_file)
+        except (OSError, ValueError) as error:
+            print(f'Ignoring unreadable fitness cache entry {entry_path}: {error}')
+            return [], {}
+
+        return [GameResult.from_dict(game) for game in entry['games']], entry['objectives']
+
+    def save(self, key: str, game_results: list[GameResult], objectives: dict[str, list[float]]) -> None:
+        entry_path: str = self.get_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        temporary_path: str = f'{entry_path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary_path, 'w') as entry_file:
+            json.dump(
+                {
+                    'games': [game_result.to_dict() for game_result in game_results],
+                    'objectives': objectives,
+                },
+                entry_file,
+            )
+
+        os.replace(temporary_path, entry_path)
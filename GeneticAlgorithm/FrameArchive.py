@@ -0,0 +1,276 @@
+import pathlib
+from collections.abc import Callable, Iterator
+from types import TracebackType
+from typing import Any, Self
+
+import numpy as np
+
+"""
+    * The engine writes the frame data of a game as a JSON array, with every hitbox, speed and projectile of every frame.
+    * Scoring only needs the HP and energy, so every game is ingested into columns once (FrameParser.py), and its JSON is dropped.
+    * An archive is an uncompressed .npz. The columns of its games are stored back to back, offsets says where every game starts.
+      np.load only reads the arrays that are asked for, so whoever only needs the HP never reads the hitbox tables.
+    * Games are indexed by (instance, round), like the point files. A file name without a round gets round -1.
+    * The columns keep the names of the JSON fields, the same ones FrameData uses.
+    * Which fields are kept is up to FRAME_DATA_FIELDS, the hitbox tables (hitboxes, speeds and projectiles) are only there when asked for.
+      Projectiles are a ragged table, projectileFrames holds the frame row of every projectile.
+    * A game can keep only every stride-th frame (see FRAME_DATA_STRIDE). strides and lengths keep the stride of every game,
+      and how many frames it lasted before that, the scorer needs both.
+"""
+
+SCORING_COLUMNS: list[str] = ['hitPoints', 'energy']
+HIT_BOX_COLUMNS: list[str] = [
+    'characterHitBoxes',
+    'attackHitBoxes',
+    'attackHitBoxesPresent',
+    'characterSpeeds',
+    'projectileInformation',
+    'projectileFrames',
+]
+INDEX_ARRAYS: list[str] = ['names', 'instances', 'rounds', 'offsets', 'strides', 'lengths']
+
+HIT_BOX_FIELDS: list[str] = ['top', 'bottom', 'left', 'right']
+
+# The JSON fields that are a number or a flat list of numbers in every frame, with the dtype and width of their column
+FLAT_FIELDS: dict[str, tuple[type, int]] = {
+    'frame': (np.int32, 1),
+    'hitPoints': (np.int16, 2),
+    'energy': (np.int16, 2),
+}
+# The JSON fields behind the hitbox tables
+TABLE_FIELDS: list[str] = ['characterHitBoxes', 'attackHitBoxes', 'characterSpeeds', 'projectileInformation']
+
+
+class ArchivedGame:
+    def __init__(
+        self,
+        name: str,
+        instance: int,
+        round_number: int,
+        columns: dict[str, np.ndarray],
+        frame_stride: int = 1,
+        game_length: int | None = None,
+    ) -> None:
+        # The file name of the engine, like the keys of the old consolidated JSON
+        self.name: str = name
+        self.instance: int = instance
+        self.round_number: int = round_number
+        self.columns: dict[str, np.ndarray] = columns
+        # Row i of the columns is frame i * frame_stride of the game
+        self.frame_stride: int = frame_stride
+        # The frames the game lasted, not the rows that were kept of them
+        self.game_length: int = self.frame_count if game_length is None else game_length
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.columns['frame'])
+
+    def __repr__(self) -> str:
+        return (
+            f'ArchivedGame(instance={self.instance}, round={self.round_number}, frames={self.frame_count}, '
+            f'stride={self.frame_stride}, length={self.game_length})'
+        )
+
+
+def get_hit_box_row(box: dict[str, int] | None) -> list[int]:
+    return [0, 0, 0, 0] if not box else [box[field] for field in HIT_BOX_FIELDS]
+
+
+def get_player_rows(boxes: list[Any], width: int, get_row: Callable[[Any], list[Any]]) -> list[list[Any]]:
+    # The engine leaves the lists empty on some frames, both players always get a row
+    rows: list[list[Any]] = [get_row(box) for box in boxes[:2]]
+    return rows + [[0] * width] * (2 - len(rows))
+
+
+def get_flat_column(field_name: str, values: list[Any]) -> np.ndarray:
+    dtype, width = FLAT_FIELDS[field_name]
+    column: np.ndarray = np.array(values, dtype=dtype)
+    return column if width == 1 else column.reshape(-1, width)
+
+
+# One value per frame, an empty list for a frame that doesn't have the field
+def get_table_columns(field_name: str, values: list[list[Any]]) -> dict[str, np.ndarray]:
+    if field_name == 'characterHitBoxes':
+        return {
+            field_name: np.array([get_player_rows(boxes, 4, get_hit_box_row) for boxes in values], dtype=np.int16).reshape(-1, 2, 4),
+        }
+
+    if field_name == 'attackHitBoxes':
+        return {
+            field_name: np.array([get_player_rows(boxes, 4, get_hit_box_row) for boxes in values], dtype=np.int16).reshape(-1, 2, 4),
+            'attackHitBoxesPresent': np.array(
+                [get_player_rows(boxes, 1, lambda box: [bool(box)]) for boxes in values],
+                dtype=bool,
+            ).reshape(-1, 2),
+        }
+
+    if field_name == 'characterSpeeds':
+        return {
+            field_name: np.array(
+                [get_player_rows(speeds, 2, lambda speed: [speed['x'], speed['y']]) for speeds in values],
+                dtype=np.float32,
+            ).reshape(-1, 2, 2),
+        }
+
+    if field_name == 'projectileInformation':
+        # playerNumber, top, bottom, left, right, speed x, speed y
+        projectiles: list[tuple[int, list[float]]] = [
+            (
+                frame_row,
+                [
+                    float(projectile['playerNumber']),
+                    *get_hit_box_row(projectile['hitArea']),
+                    projectile['speed']['x'],
+                    projectile['speed']['y'],
+                ],
+            )  #
+            for frame_row, frame_projectiles in enumerate(values)
+            for projectile in frame_projectiles
+            if projectile is not None
+        ]
+        return {
+            'projectileFrames': np.array([frame_row for frame_row, _ in projectiles], dtype=np.int32),
+            field_name: np.array([row for _, row in projectiles], dtype=np.float32).reshape(-1, 7),
+        }
+
+    raise ValueError(f'{field_name} is not a frame data table, the tables are: {", ".join(TABLE_FIELDS)}')
+
+
+def get_frame_columns(raw_frame_data: list[dict[str, Any] | None], hit_boxes: bool = False) -> dict[str, np.ndarray]:
+    # Like parse_frame_data, the game ends at the first frame the engine didn't fill in
+    frame_count: int = next((frame_index for frame_index, frame in enumerate(raw_frame_data) if frame is None), len(raw_frame_data))
+    frames: list[dict[str, Any]] = raw_frame_data[:frame_count]
+
+    columns: dict[str, np.ndarray] = {
+        field_name: get_flat_column(field_name, [frame[field_name] for frame in frames])  #
+        for field_name in FLAT_FIELDS
+    }
+    if hit_boxes:
+        for field_name in TABLE_FIELDS:
+            columns.update(get_table_columns(field_name, [frame.get(field_name, []) for frame in frames]))
+
+    return columns
+
+
+def write_frame_archive(archive_path: pathlib.Path, games: list[ArchivedGame]) -> pathlib.Path:
+    # Only the columns every game has, an archive never has holes in a column
+    column_names: list[str] = (
+        [column_name for column_name in games[0].columns if all(column_name in game.columns for game in games)]  #
+        if len(games) != 0
+        else ['frame', *SCORING_COLUMNS]
+    )
+
+    offsets: np.ndarray = np.zeros(len(games) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([game.frame_count for game in games])
+
+    arrays: dict[str, np.ndarray] = {
+        'names': np.array([game.name for game in games], dtype=str),
+        'instances': np.array([game.instance for game in games], dtype=np.int32),
+        'rounds': np.array([game.round_number for game in games], dtype=np.int16),
+        'offsets': offsets,
+        'strides': np.array([game.frame_stride for game in games], dtype=np.int32),
+        'lengths': np.array([game.game_length for game in games], dtype=np.int32),
+    }
+    for column_name in column_names:
+        column_parts: list[np.ndarray] = [game.columns[column_name] for game in games]
+        # Projectile rows point at the frame rows of the archive, not of their game
+        if column_name == 'projectileFrames':
+            column_parts = [column_part + offset for column_part, offset in zip(column_parts, offsets[:-1], strict=True)]
+        arrays[column_name] = (
+            np.concatenate(column_parts)  #
+            if len(column_parts) != 0
+            else np.zeros(0, dtype=np.int16)
+        )
+
+    # Written with the final name in one go, np.savez would add .npz to a name without it
+    with archive_path.open(mode='wb') as archive_file:
+        np.savez(archive_file, **arrays)
+
+    return archive_path
+
+
+class FrameArchive:
+    """
+    Read side of an archive. Columns are only read the first time they are asked for, and then kept.
+    """
+
+    def __init__(self, archive_path: pathlib.Path) -> None:
+        self.archive_path: pathlib.Path = archive_path
+        self.archive = np.load(archive_path)
+        self.loaded_columns: dict[str, np.ndarray] = {}
+
+        self.names: np.ndarray = self.archive['names']
+        self.instances: np.ndarray = self.archive['instances']
+        self.rounds: np.ndarray = self.archive['rounds']
+        self.offsets: np.ndarray = self.archive['offsets']
+        # Archives from before the strides kept every frame
+        self.strides: np.ndarray = self.archive['strides'] if 'strides' in self.archive.files else np.ones(len(self.instances), dtype=np.int32)
+        self.lengths: np.ndarray = self.archive['lengths'] if 'lengths' in self.archive.files else np.diff(self.offsets)
+        self.index: dict[tuple[int, int], int] = {
+            (int(instance), int(round_number)): position  #
+            for position, (instance, round_number) in enumerate(zip(self.instances, self.rounds, strict=True))
+        }
+
+    def __len__(self) -> int:
+        return len(self.instances)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.archive.close()
+
+    @property
+    def column_names(self) -> list[str]:
+        return [column_name for column_name in self.archive.files if column_name not in INDEX_ARRAYS]
+
+    def get_column(self, column_name: str) -> np.ndarray:
+        if column_name not in self.loaded_columns:
+            self.loaded_columns[column_name] = self.archive[column_name]
+        return self.loaded_columns[column_name]
+
+    def get_game_at(self, position: int, column_names: list[str] | None = None) -> ArchivedGame:
+        if column_names is None:
+            column_names = SCORING_COLUMNS
+
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        columns: dict[str, np.ndarray] = {'frame': self.get_column('frame')[start:end]}
+        projectile_rows: slice | None = None
+        for column_name in column_names:
+            if column_name not in ('projectileInformation', 'projectileFrames'):
+                columns[column_name] = self.get_column(column_name)[start:end]
+                continue
+
+            if projectile_rows is None:
+                projectile_frames: np.ndarray = self.get_column('projectileFrames')
+                projectile_rows = slice(*np.searchsorted(projectile_frames, [start, end]))
+            columns[column_name] = self.get_column(column_name)[projectile_rows]
+            if column_name == 'projectileFrames':
+                columns[column_name] = columns[column_name] - start
+
+        return ArchivedGame(
+            str(self.names[position]),
+            int(self.instances[position]),
+            int(self.rounds[position]),
+            columns,
+            frame_stride=int(self.strides[position]),
+            game_length=int(self.lengths[position]),
+        )
+
+    def get_game(self, instance: int, round_number: int = -1, column_names: list[str] | None = None) -> ArchivedGame:
+        return self.get_game_at(self.index[(instance, round_number)], column_names)
+
+    def iter_games(self, column_names: list[str] | None = None) -> Iterator[ArchivedGame]:
+        for position in range(len(self)):
+            yield self.get_game_at(position, column_names)
+
+
+def read_frame_archive(archive_path: pathlib.Path, column_names: list[str] | None = None) -> list[ArchivedGame]:
+    # Every column is read when none are asked for, merging archives shouldn't lose anything
+    with FrameArchive(archive_path) as frame_archive:
+        if column_names is None:
+            column_names = frame_archive.column_names
+        return list(frame_archive.iter_games(column_names))
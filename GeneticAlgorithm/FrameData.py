@@ -1,13 +1,31 @@
+import pathlib
+from collections.abc import Iterator
 from dataclasses import dataclass
 
+import numpy as np
 
-@dataclass
+import GeneticAlgorithm.FrameArchive as fa
+import GeneticAlgorithm.FrameParser as fp
+
+"""
+    * parse_frame_data makes a slotted record for every frame, with every field as Python objects. Fine for a handful of frames.
+    * GameFrames holds a whole game as the columns of FrameArchive, one NumPy array per field with a row per frame.
+      The arrays have the names of the record fields, so game_frames.hitPoints[i] is frame.hitPoints of the i-th record.
+    * A record is only made when a frame is asked for (game_frames[i], or iterating), so code written against records still works.
+    * game_frames.players holds a view on the columns of each player, nothing is copied.
+    * Records made from the columns always have both players, the columns pad a player the engine left out.
+      Attack hitboxes that aren't there come back as None, speeds and projectiles come back as float32 values.
+      Null projectiles aren't kept in the columns, so a record only lists the projectiles that were there.
+"""
+
+
+@dataclass(slots=True)
 class Vector:
     x: float
     y: float
 
 
-@dataclass
+@dataclass(slots=True)
 class HitArea:
     top: int
     bottom: int
@@ -15,14 +33,14 @@ class HitArea:
     right: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Projectile:
     playerNumber: bool
     hitArea: HitArea
     speed: Vector
 
 
-@dataclass
+@dataclass(slots=True)
 class FrameData:
     frame: int
     hitPoints: list[int]
@@ -87,3 +105,107 @@ def parse_frame_data(raw_data: list[dict[str, any]]) -> tuple[list[FrameData | N
         )
 
     return frames, max_frame
+
+
+def get_player_column(columns: dict[str, np.ndarray], field_name: str, player: int) -> np.ndarray | None:
+    return columns[field_name][:, player] if field_name in columns else None
+
+
+class PlayerFrames:
+    __slots__ = ('player', 'hitPoints', 'energy', 'characterHitBoxes', 'attackHitBoxes', 'attackHitBoxesPresent', 'characterSpeeds')
+
+    def __init__(self, columns: dict[str, np.ndarray], player: int) -> None:
+        self.player: int = player
+        # (frames,) for the HP and energy, (frames, 4) for hitboxes and (frames, 2) for speeds
+        self.hitPoints: np.ndarray = get_player_column(columns, 'hitPoints', player)
+        self.energy: np.ndarray = get_player_column(columns, 'energy', player)
+        self.characterHitBoxes: np.ndarray | None = get_player_column(columns, 'characterHitBoxes', player)
+        self.attackHitBoxes: np.ndarray | None = get_player_column(columns, 'attackHitBoxes', player)
+        self.attackHitBoxesPresent: np.ndarray | None = get_player_column(columns, 'attackHitBoxesPresent', player)
+        self.characterSpeeds: np.ndarray | None = get_player_column(columns, 'characterSpeeds', player)
+
+
+class GameFrames:
+    __slots__ = (
+        'frame',
+        'hitPoints',
+        'energy',
+        'characterHitBoxes',
+        'attackHitBoxes',
+        'attackHitBoxesPresent',
+        'characterSpeeds',
+        'projectileInformation',
+        'projectileFrames',
+        'players',
+    )
+
+    def __init__(self, columns: dict[str, np.ndarray]) -> None:
+        self.frame: np.ndarray = columns['frame']
+        self.hitPoints: np.ndarray = columns['hitPoints']
+        self.energy: np.ndarray = columns['energy']
+        # The tables are only there if they were ingested, see FRAME_DATA_FIELDS
+        self.characterHitBoxes: np.ndarray | None = columns.get('characterHitBoxes')
+        self.attackHitBoxes: np.ndarray | None = columns.get('attackHitBoxes')
+        self.attackHitBoxesPresent: np.ndarray | None = columns.get('attackHitBoxesPresent')
+        self.characterSpeeds: np.ndarray | None = columns.get('characterSpeeds')
+        # playerNumber, top, bottom, left, right, speed x, speed y, and the frame row of every projectile
+        self.projectileInformation: np.ndarray | None = columns.get('projectileInformation')
+        self.projectileFrames: np.ndarray | None = columns.get('projectileFrames')
+        self.players: tuple[PlayerFrames, PlayerFrames] = (PlayerFrames(columns, 0), PlayerFrames(columns, 1))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __getitem__(self, frame_row: int) -> FrameData:
+        if not -len(self) <= frame_row < len(self):
+            raise IndexError(f'Frame row {frame_row} is out of range for a game of {len(self)} frames')
+        frame_row %= len(self)
+
+        return FrameData(
+            frame=int(self.frame[frame_row]),
+            hitPoints=self.hitPoints[frame_row].tolist(),
+            energy=self.energy[frame_row].tolist(),
+            attackHitBoxes=(
+                [
+                    HitArea(*box) if present else None  #
+                    for box, present in zip(self.attackHitBoxes[frame_row].tolist(), self.attackHitBoxesPresent[frame_row].tolist(), strict=True)
+                ]
+                if self.attackHitBoxes is not None
+                else []
+            ),
+            characterSpeeds=[Vector(*speed) for speed in self.characterSpeeds[frame_row].tolist()] if self.characterSpeeds is not None else [],
+            projectileInformation=self.get_projectiles(frame_row),
+            characterHitBoxes=[HitArea(*box) for box in self.characterHitBoxes[frame_row].tolist()] if self.characterHitBoxes is not None else [],
+        )
+
+    def __iter__(self) -> Iterator[FrameData]:
+        for frame_row in range(len(self)):
+            yield self[frame_row]
+
+    def get_projectiles(self, frame_row: int) -> list[Projectile | None]:
+        if self.projectileInformation is None:
+            return []
+
+        start, end = np.searchsorted(self.projectileFrames, [frame_row, frame_row + 1])
+        return [
+            Projectile(
+                playerNumber=bool(projectile[0]),
+                hitArea=HitArea(*[int(value) for value in projectile[1:5]]),
+                speed=Vector(projectile[5], projectile[6]),
+            )  #
+            for projectile in self.projectileInformation[start:end].tolist()
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field_name).nbytes for field_name in self.__slots__[:-1] if getattr(self, field_name) is not None)
+
+
+def get_game_frames(raw_data: list[dict[str, any] | None]) -> GameFrames:
+    return GameFrames(fa.get_frame_columns(raw_data, hit_boxes=True))
+
+
+# Straight from the engine's JSON, without ever holding the parsed JSON, see FrameParser.py
+def read_game_frames(frame_data_file: pathlib.Path, frame_stride: int = 1) -> GameFrames:
+    columns, _ = fp.parse_frame_fields(frame_data_file, [*fa.FLAT_FIELDS, *fa.TABLE_FIELDS], frame_stride=frame_stride)
+    return GameFrames(columns)
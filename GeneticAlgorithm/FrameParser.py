@@ -0,0 +1,244 @@
+import json
+import pathlib
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+import GeneticAlgorithm.FrameArchive as fa
+
+"""
+    * Streams a frame data JSON file in chunks, and only pulls out the fields the caller names.
+    * Nothing but the values of those fields is parsed, HP, energy and the frame number go straight from the text to NumPy.
+    * The depth of every bracket comes from a cumulative sum over the brackets of a chunk. That is how the frames are counted,
+      where a chunk can be cut (after the last complete frame) and where a null between the frames ends the game, like in parse_frame_data.
+    * Every field is found with a regex over the whole chunk, and only the keys at the depth of a frame are kept.
+      Objects nested in a frame (projectiles, hitboxes) can use the same names without being mistaken for it.
+      Only the values of the table fields go through the JSON decoder.
+    * Assumes there are no brackets in strings, the engine only writes keys, numbers and booleans.
+    * With a frame stride only every stride-th frame is kept, starting at the first. The tables of the other frames aren't even decoded.
+      The engine has no option to write fewer frames, so this is as early as the stride can be applied.
+    * When every field of every frame is needed, e.g. for debugging, FrameData.read_game_frames hands them over as a GameFrames.
+"""
+
+CHUNK_SIZE_BYTES: int = 256 * 1024
+
+OPENING_BRACKETS: tuple[int, int] = (ord('['), ord('{'))
+CLOSING_BRACKETS: tuple[int, int] = (ord(']'), ord('}'))
+# The depth right after the bracket that opens the list of frames, and the one that opens a frame
+FRAME_LIST_DEPTH: int = 1
+FRAME_DEPTH: int = 2
+JSON_DECODER: json.JSONDecoder = json.JSONDecoder()
+
+FLAT_VALUE_PATTERNS: dict[str, re.Pattern] = {
+    field_name: re.compile(rb'"' + field_name.encode() + rb'"\s*:\s*(\[[^\[\]{}]*\]|[^,\]}\s]+)')  #
+    for field_name in fa.FLAT_FIELDS
+}
+TABLE_KEY_PATTERNS: dict[str, re.Pattern] = {
+    field_name: re.compile(rb'"' + field_name.encode() + rb'"\s*:\s*')  #
+    for field_name in fa.TABLE_FIELDS
+}
+
+
+# The position of every bracket, and the depth right after it
+def find_brackets(segment: bytes, start_depth: int) -> tuple[np.ndarray, np.ndarray]:
+    data: np.ndarray = np.frombuffer(segment, dtype=np.uint8)
+    positions: np.ndarray = np.flatnonzero(
+        (data == OPENING_BRACKETS[0]) | (data == OPENING_BRACKETS[1]) | (data == CLOSING_BRACKETS[0]) | (data == CLOSING_BRACKETS[1])
+    )
+    brackets: np.ndarray = data[positions]
+    depths: np.ndarray = start_depth + np.cumsum(np.where((brackets == OPENING_BRACKETS[0]) | (brackets == OPENING_BRACKETS[1]), 1, -1))
+
+    return positions, depths
+
+
+@dataclass(slots=True)
+class FrameSegment:
+    # Only ever complete frames, the depths are the ones right after the bracket at the same index of positions
+    segment: bytes
+    positions: np.ndarray
+    depths: np.ndarray
+    start_depth: int
+    frame_starts: np.ndarray
+
+    # Whether a key at each of the text positions belongs to a frame, and not to an object nested in it
+    def is_frame_level(self, text_positions: np.ndarray) -> np.ndarray:
+        return get_depths_at(text_positions, self.positions, self.depths, self.start_depth) == FRAME_DEPTH
+
+
+def get_depths_at(text_positions: np.ndarray, positions: np.ndarray, depths: np.ndarray, start_depth: int) -> np.ndarray:
+    if len(depths) == 0:
+        return np.full(len(text_positions), start_depth)
+
+    bracket_index: np.ndarray = np.searchsorted(positions, text_positions) - 1
+    return np.where(bracket_index >= 0, depths[np.maximum(bracket_index, 0)], start_depth)
+
+
+def find_top_level_null(segment: bytes, positions: np.ndarray, depths: np.ndarray, start_depth: int) -> int | None:
+    # Between two frames there is only a comma, a longer gap in the list of frames is looked at
+    gap_starts: np.ndarray = np.concatenate([[0], positions + 1])
+    gap_ends: np.ndarray = np.concatenate([positions, [len(segment)]])
+    gap_depths: np.ndarray = np.concatenate([[start_depth], depths])
+
+    for gap in np.flatnonzero((gap_depths == FRAME_LIST_DEPTH) & (gap_ends - gap_starts >= len(b'null'))):
+        null_position: int = segment.find(b'null', int(gap_starts[gap]), int(gap_ends[gap]))
+        if null_position != -1:
+            return null_position
+
+    return None
+
+
+# The complete frames of a file, a chunk at a time, up to the null that ends the game
+def scan_frame_segments(frame_data_file: pathlib.Path, chunk_size_bytes: int = CHUNK_SIZE_BYTES) -> Iterator[FrameSegment]:
+    remainder: bytes = b''
+    start_depth: int = 0
+    with frame_data_file.open(mode='rb') as src_file:
+        while True:
+            chunk: bytes = src_file.read(chunk_size_bytes)
+            segment: bytes = remainder + chunk
+            positions, depths = find_brackets(segment, start_depth)
+
+            # Cut after the last complete frame, the rest goes with the next chunk
+            if len(chunk) != 0:
+                frame_ends: np.ndarray = np.flatnonzero(
+                    (depths == FRAME_LIST_DEPTH) & (np.frombuffer(segment, dtype=np.uint8)[positions] == CLOSING_BRACKETS[1])
+                )
+                if len(frame_ends) == 0:
+                    remainder = segment
+                    continue
+
+                cut: int = int(positions[frame_ends[-1]]) + 1
+                remainder, segment = segment[cut:], segment[:cut]
+                positions, depths = positions[: frame_ends[-1] + 1], depths[: frame_ends[-1] + 1]
+
+            null_position: int | None = find_top_level_null(segment, positions, depths, start_depth)
+            if null_position is not None:
+                segment = segment[:null_position]
+                depths = depths[positions < null_position]
+                positions = positions[positions < null_position]
+
+            frame_starts: np.ndarray = positions[(depths == FRAME_DEPTH) & (np.frombuffer(segment, dtype=np.uint8)[positions] == OPENING_BRACKETS[1])]
+            yield FrameSegment(segment, positions, depths, start_depth, frame_starts)
+
+            if null_position is not None or len(chunk) == 0:
+                return
+            start_depth = FRAME_LIST_DEPTH
+
+
+# The raw values of a flat field, one per frame
+def extract_flat_values(frame_segment: FrameSegment, field_name: str) -> list[bytes]:
+    matches: list[re.Match] = list(FLAT_VALUE_PATTERNS[field_name].finditer(frame_segment.segment))
+    frame_level: np.ndarray = frame_segment.is_frame_level(np.array([match.start() for match in matches], dtype=np.int64))
+
+    return [match.group(1) for match, is_frame_level in zip(matches, frame_level, strict=True) if is_frame_level]
+
+
+# The decoded values of a table field for every frame_stride-th frame, first_frame is the number of the first frame in the segment
+def extract_table_values(frame_segment: FrameSegment, text: str, field_name: str, first_frame: int, frame_stride: int) -> list[Any]:
+    # A frame without the field gets an empty list, like frame.get(field_name, []) does
+    frame_values: list[Any] = [[] for _ in range(len(frame_segment.frame_starts))]
+    matches: list[re.Match] = list(TABLE_KEY_PATTERNS[field_name].finditer(frame_segment.segment))
+    key_positions: np.ndarray = np.array([match.start() for match in matches], dtype=np.int64)
+    frame_level: np.ndarray = frame_segment.is_frame_level(key_positions)
+    frame_rows: np.ndarray = np.searchsorted(frame_segment.frame_starts, key_positions) - 1
+
+    for match, is_frame_level, frame_row in zip(matches, frame_level, frame_rows, strict=True):
+        if is_frame_level and (first_frame + frame_row) % frame_stride == 0:
+            frame_values[frame_row] = JSON_DECODER.raw_decode(text, match.end())[0]
+
+    return frame_values[-first_frame % frame_stride :: frame_stride]
+
+
+def parse_frame_fields(
+    frame_data_file: pathlib.Path,
+    field_names: list[str],
+    chunk_size_bytes: int = CHUNK_SIZE_BYTES,
+    frame_stride: int = 1,
+) -> tuple[dict[str, np.ndarray], int]:
+    """
+    The same columns fa.get_frame_columns makes, but only for the named fields and every frame_stride-th frame.
+    The frame number always comes along. Also returns how many frames the game has, before the stride.
+    """
+    if frame_stride < 1:
+        raise ValueError(f'The frame stride has to be at least 1, not {frame_stride}')
+
+    unknown_field_names: list[str] = [
+        field_name  #
+        for field_name in field_names
+        if field_name not in fa.FLAT_FIELDS and field_name not in fa.TABLE_FIELDS
+    ]
+    if len(unknown_field_names) != 0:
+        raise ValueError(f'Unknown frame data fields: {", ".join(unknown_field_names)}')
+
+    flat_field_names: list[str] = ['frame', *[field_name for field_name in field_names if field_name in fa.FLAT_FIELDS and field_name != 'frame']]
+    table_field_names: list[str] = [field_name for field_name in field_names if field_name in fa.TABLE_FIELDS]
+
+    flat_values: dict[str, list[bytes]] = {field_name: [] for field_name in flat_field_names}
+    table_values: dict[str, list[Any]] = {field_name: [] for field_name in table_field_names}
+    frame_count: int = 0
+    for frame_segment in scan_frame_segments(frame_data_file, chunk_size_bytes):
+        for field_name in flat_field_names:
+            values: list[bytes] = extract_flat_values(frame_segment, field_name)
+            if len(values) != len(frame_segment.frame_starts):
+                raise ValueError(f'{frame_data_file} has {len(frame_segment.frame_starts)} frames, but {len(values)} {field_name} values')
+            flat_values[field_name].extend(values)
+
+        if len(table_field_names) != 0:
+            text: str = frame_segment.segment.decode()
+            for field_name in table_field_names:
+                table_values[field_name].extend(extract_table_values(frame_segment, text, field_name, frame_count, frame_stride))
+
+        frame_count += len(frame_segment.frame_starts)
+
+    kept_frame_count: int = -(-frame_count // frame_stride)
+    columns: dict[str, np.ndarray] = {}
+    for field_name in flat_field_names:
+        _, width = fa.FLAT_FIELDS[field_name]
+        numbers: np.ndarray = (
+            np.fromstring(b','.join(flat_values[field_name][::frame_stride]).translate(None, b'[]').decode(), dtype=np.int64, sep=',')  #
+            if frame_count != 0
+            else np.zeros(0, dtype=np.int64)
+        )
+        if len(numbers) != kept_frame_count * width:
+            raise ValueError(f'{frame_data_file} has {kept_frame_count} frames, but {len(numbers)} numbers for {field_name}')
+        columns[field_name] = fa.get_flat_column(field_name, numbers)
+
+    for field_name in table_field_names:
+        columns.update(fa.get_table_columns(field_name, table_values[field_name]))
+
+    return columns, frame_count
+
+
+def read_frame_data_file(
+    frame_data_file: pathlib.Path,
+    instance: int,
+    round_number: int,
+    field_names: list[str] | None = None,
+    frame_stride: int = 1,
+) -> fa.ArchivedGame:
+    # The scoring columns are always kept, whatever else is asked for
+    if field_names is None:
+        field_names = []
+    field_names = list(dict.fromkeys([*fa.SCORING_COLUMNS, *field_names]))
+
+    columns, game_length = parse_frame_fields(frame_data_file, field_names, frame_stride=frame_stride)
+    return fa.ArchivedGame(frame_data_file.name, instance, round_number, columns, frame_stride=frame_stride, game_length=game_length)
+
+
+def ingest_frame_data_file(
+    frame_data_file: pathlib.Path,
+    instance: int,
+    round_number: int,
+    field_names: list[str] | None = None,
+    frame_stride: int = 1,
+) -> fa.ArchivedGame:
+    """
+    Turns the JSON of a single game into a single game archive next to it, and removes the JSON.
+    """
+    game: fa.ArchivedGame = read_frame_data_file(frame_data_file, instance, round_number, field_names=field_names, frame_stride=frame_stride)
+    fa.write_frame_archive(frame_data_file.with_suffix('.npz'), [game])
+    frame_data_file.unlink(missing_ok=True)
+
+    return game
@@ -0,0 +1,133 @@
+from typing import Any
+
+import numpy as np
+
+"""
+    * The outcome of a single game, this is what gets cached and what the objectives are calculated from.
+    * The seed is kept with the result, so a seeded evaluation can be played again game for game.
+    * The pairing follows the instance % 3 convention of the match items: 0 -> zen vs garnet, 1 -> zen vs lud, 2 -> garnet vs lud.
+"""
+
+
+class GameResult:
+    def __init__(
+        self,
+        pairing: int,
+        game: int,
+        hp_one: int,
+        hp_two: int,
+        excitement_cost: float | None = None,
+        seed: int | None = None,
+        player_hp: int | None = None,
+        game_duration_sec: int | None = None,
+    ) -> None:
+        self.pairing: int = pairing
+        self.game: int = game
+        self.hp_one: int = hp_one
+        self.hp_two: int = hp_two
+        self.excitement_cost: float | None = excitement_cost
+        # The common random numbers seed the game was played with, None if it wasn't seeded
+        self.seed: int | None = seed
+        # The fidelity the game was played at, None for games from before the fidelity ladder
+        self.player_hp: int | None = player_hp
+        self.game_duration_sec: int | None = game_duration_sec
+
+    @property
+    def instance(self) -> int:
+        return self.pairing + 3 * self.game
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'pairing': self.pairing,
+            'game': self.game,
+            'hp_one': self.hp_one,
+            'hp_two': self.hp_two,
+            'excitement_cost': self.excitement_cost,
+            'seed': self.seed,
+            'player_hp': self.player_hp,
+            'game_duration_sec': self.game_duration_sec,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'GameResult':
+        return cls(
+            pairing=data['pairing'],
+            game=data['game'],
+            hp_one=data['hp_one'],
+            hp_two=data['hp_two'],
+            excitement_cost=data['excitement_cost'],
+            seed=data.get('seed'),
+            player_hp=data.get('player_hp'),
+            game_duration_sec=data.get('game_duration_sec'),
+        )
+
+    def __repr__(self) -> str:
+        return f'GameResult(pairing={self.pairing}, game={self.game}, hp=({self.hp_one}, {self.hp_two}))'
+
+
+# Wins and games per character, in the zen, garnet, lud order. A draw is a win for neither.
+def count_character_wins(game_results: list['GameResult']) -> tuple[np.ndarray, np.ndarray]:
+    hp_results: np.ndarray = np.array(
+        [[game_result.hp_one, game_result.hp_two] for game_result in game_results],
+        dtype=np.int16,
+    ).reshape(-1, 2)
+    pairing_index: np.ndarray = np.array([game_result.pairing for game_result in game_results], dtype=np.int16)
+
+    hp_diff_zen_garnet = hp_results[pairing_index == 0]
+    hp_diff_zen_lud = hp_results[pairing_index == 1]
+    hp_diff_garnet_lud = hp_results[pairing_index == 2]
+
+    # Think about this more, if we have z-g and z-l, do we need to add g-z again?
+    wins: np.ndarray = np.array(
+        [
+            (hp_diff_zen_garnet[:, 0] > hp_diff_zen_garnet[:, 1]).sum() + (hp_diff_zen_lud[:, 0] > hp_diff_zen_lud[:, 1]).sum(),
+            (hp_diff_zen_garnet[:, 0] < hp_diff_zen_garnet[:, 1]).sum() + (hp_diff_garnet_lud[:, 0] > hp_diff_garnet_lud[:, 1]).sum(),
+            (hp_diff_zen_lud[:, 0] < hp_diff_zen_lud[:, 1]).sum() + (hp_diff_garnet_lud[:, 0] < hp_diff_garnet_lud[:, 1]).sum(),
+        ],
+        dtype=np.int64,
+    )
+    games: np.ndarray = np.array(
+        [
+            len(hp_diff_zen_garnet) + len(hp_diff_zen_lud),
+            len(hp_diff_zen_garnet) + len(hp_diff_garnet_lud),
+            len(hp_diff_zen_lud) + len(hp_diff_garnet_lud),
+        ],
+        dtype=np.int64,
+    )
+
+    return wins, games
+
+
+# The pairing and side of every character's games, in the zen, garnet, lud order
+CHARACTER_SIDES: list[list[tuple[int, int]]] = [[(0, 0), (1, 0)], [(0, 1), (2, 0)], [(1, 1), (2, 1)]]
+
+
+# Wins of both sides and the games, per pairing. A draw is a win for neither.
+def count_pairing_wins(game_results: list['GameResult']) -> tuple[np.ndarray, np.ndarray]:
+    side_wins: np.ndarray = np.zeros(shape=(3, 2), dtype=np.int64)
+    games: np.ndarray = np.zeros(3, dtype=np.int64)
+    for game_result in game_results:
+        games[game_result.pairing] += 1
+        side_wins[game_result.pairing, 0] += game_result.hp_one > game_result.hp_two
+        side_wins[game_result.pairing, 1] += game_result.hp_one < game_result.hp_two
+
+    return side_wins, games
+
+
+def calculate_character_win_rates(side_wins: np.ndarray, games: np.ndarray) -> np.ndarray:
+    """
+    Every pairing a character played weighs the same in its win rate, however many games the pairing got.
+    With equal games per pairing this is the same as wins / games, with unequal games the pairing with more games would take over.
+    side_wins can have trailing axes of outcomes (3, 2, ...), games is always (3,).
+    A character that played no games is treated like one that never won.
+    """
+    side_win_rates: np.ndarray = side_wins / np.maximum(games, 1).reshape(3, 1, *[1] * (side_wins.ndim - 2))
+    played: np.ndarray = games > 0
+
+    return np.stack(
+        [
+            sum(side_win_rates[pairing, side] for pairing, side in sides)  #
+            / np.maximum(sum(played[pairing] for pairing, _ in sides), 1)
+            for sides in CHARACTER_SIDES
+        ]
+    )
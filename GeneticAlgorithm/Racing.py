@@ -0,0 +1,102 @@
+import numpy as np
+
+import functions as f
+from EngineClasses.MatchScheduler import MatchItem
+from GeneticAlgorithm.GameResult import GameResult, calculate_character_win_rates, count_pairing_wins
+
+"""
+    * Racing plays an individual's games in small batches, and stops as soon as its verdict is settled.
+    * Every side of every pairing gets a Wilson score interval. A character's bounds are the averages of its sides' bounds,
+      per pairing like calculate_competitive_balance does, so a pairing with more games doesn't take over.
+      The average grows with every side's win rate, so the averaged bounds hold the averaged win rate.
+    * Those bounds are pushed through the transform and the harmonic mean.
+    * The transform peaks at a 0.5 win rate, so its bounds over an interval are the ends, or 1 if the interval holds 0.5.
+    * The harmonic mean grows with every value, so the competitive balance bounds are the harmonic means of the transform bounds.
+    * Play stops once the competitive balance interval is narrow enough, or its upper bound is below the balance_floor.
+      The floor is a fixed competitive balance bar, not a dominance check, excitement and the population play no part in it.
+"""
+
+# Where the transform peaks
+EVEN_WIN_RATE: float = 0.5
+
+
+class RacingSettings:
+    def __init__(
+        self,
+        batch_games: int,
+        min_games: int,
+        max_interval_width: float,
+        balance_floor: float,
+        z: float = 1.96,
+    ) -> None:
+        # Per pairing
+        self.batch_games: int = batch_games
+        self.min_games: int = min_games
+        self.max_interval_width: float = max_interval_width
+        self.balance_floor: float = balance_floor
+        self.z: float = z
+
+
+def calculate_wilson_interval(wins: np.ndarray, games: np.ndarray, z: float) -> tuple[np.ndarray, np.ndarray]:
+    games = np.maximum(games, 1)
+    win_rates: np.ndarray = wins / games
+
+    denominator: np.ndarray = 1 + z**2 / games
+    centre: np.ndarray = (win_rates + z**2 / (2 * games)) / denominator
+    margin: np.ndarray = z * np.sqrt(win_rates * (1 - win_rates) / games + z**2 / (4 * games**2)) / denominator
+
+    return np.clip(centre - margin, 0, 1), np.clip(centre + margin, 0, 1)
+
+
+# The bounds of every character's win rate, in the zen, garnet, lud order
+def calculate_win_rate_interval(game_results: list[GameResult], z: float) -> tuple[np.ndarray, np.ndarray]:
+    side_wins, games = count_pairing_wins(game_results)
+    lower_side_rates, upper_side_rates = calculate_wilson_interval(side_wins, games[:, np.newaxis], z)
+
+    # Back to wins, with the two bounds as the outcomes axis calculate_character_win_rates averages over
+    bound_wins: np.ndarray = np.stack([lower_side_rates, upper_side_rates], axis=-1) * games.reshape(3, 1, 1)
+    win_rates: np.ndarray = calculate_character_win_rates(bound_wins, games)
+
+    return win_rates[:, 0], win_rates[:, 1]
+
+
+def calculate_competitive_balance_interval(game_results: list[GameResult], z: float) -> tuple[float, float]:
+    lower_win_rates, upper_win_rates = calculate_win_rate_interval(game_results, z)
+
+    lower_transforms: np.ndarray = f.transform_win_rate_array(lower_win_rates)
+    upper_transforms: np.ndarray = f.transform_win_rate_array(upper_win_rates)
+    holds_even: np.ndarray = (lower_win_rates <= EVEN_WIN_RATE) & (upper_win_rates >= EVEN_WIN_RATE)
+
+    lowest_transforms: np.ndarray = np.minimum(lower_transforms, upper_transforms)
+    highest_transforms: np.ndarray = np.where(holds_even, 1.0, np.maximum(lower_transforms, upper_transforms))
+
+    return (
+        min(f.calculate_harmonic_mean(values=lowest_transforms), 1),
+        min(f.calculate_harmonic_mean(values=highest_transforms), 1),
+    )
+
+
+def is_settled(game_results: list[GameResult], racing_settings: RacingSettings) -> bool:
+    games_per_pairing: int = min(
+        sum(game_result.pairing == pairing for game_result in game_results)  #
+        for pairing in range(3)
+    )
+    if games_per_pairing < racing_settings.min_games:
+        return False
+
+    lower_bound, upper_bound = calculate_competitive_balance_interval(game_results, racing_settings.z)
+    if upper_bound < racing_settings.balance_floor:
+        print(f'Racing: under the floor after {games_per_pairing} games per pairing, competitive balance in [{lower_bound:.3f}, {upper_bound:.3f}]')
+        return True
+
+    if upper_bound - lower_bound <= racing_settings.max_interval_width:
+        print(f'Racing: settled after {games_per_pairing} games per pairing, competitive balance in [{lower_bound:.3f}, {upper_bound:.3f}]')
+        return True
+
+    return False
+
+
+def get_batches(match_items: list[MatchItem], batch_games: int) -> list[list[MatchItem]]:
+    # The match items are interleaved per pairing, so a batch covers every pairing equally
+    batch_size: int = max(1, batch_games) * 3
+    return [match_items[index : index + batch_size] for index in range(0, len(match_items), batch_size)]
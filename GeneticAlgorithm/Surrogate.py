@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+from sklearn.ensemble import RandomForestRegressor
+
+"""
+    * Every simulated individual is a (gene -> objectives) sample, the surrogate is a random forest trained on those.
+    * The spread of the individual trees is used as the uncertainty of a prediction.
+    * Offspring are only simulated if they are promising (their optimistic prediction isn't dominated by anything simulated so far),
+      or if the forest is unsure about them. Everyone else keeps the predicted objectives.
+    * Everything here works on plain X / F arrays, so it can be tried offline on the populations of earlier runs.
+"""
+
+
+def fit_surrogate(X: np.ndarray, F: np.ndarray, no_trees: int = 100, seed: int | None = None) -> RandomForestRegressor:
+    model = RandomForestRegressor(n_estimators=no_trees, random_state=seed, n_jobs=-1)
+    model.fit(X, F)
+    return model
+
+
+def predict_objectives(model: RandomForestRegressor, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    tree_predictions: np.ndarray = np.stack([tree.predict(X) for tree in model.estimators_])
+    # A single objective comes out of the trees without the objective axis
+    if model.n_outputs_ == 1:
+        tree_predictions = tree_predictions[:, :, np.newaxis]
+
+    return tree_predictions.mean(axis=0), tree_predictions.std(axis=0)
+
+
+def is_dominated(F: np.ndarray, front: np.ndarray) -> np.ndarray:
+    # We are minimizing, like pymoo
+    return np.array(
+        [
+            np.any(np.all(front <= objectives, axis=1) & np.any(front < objectives, axis=1))  #
+            for objectives in F
+        ],
+        dtype=bool,
+    )
+
+
+def select_for_simulation(
+    mean: np.ndarray,
+    std: np.ndarray,
+    history_F: np.ndarray,
+    kappa: float,
+    uncertainty_threshold: float,
+    min_simulated_fraction: float,
+) -> np.ndarray:
+    front: np.ndarray = history_F[NonDominatedSorting().do(history_F, only_non_dominated_front=True)]
+
+    promising: np.ndarray = ~is_dominated(mean - kappa * std, front)
+    uncertain: np.ndarray = std.max(axis=1) > uncertainty_threshold
+    simulate: np.ndarray = promising | uncertain
+
+    # Keep feeding the surrogate, the most uncertain of the rest are simulated to make up the minimum
+    min_simulated: int = min(len(mean), math.ceil(min_simulated_fraction * len(mean)))
+    if simulate.sum() < min_simulated:
+        remaining_index: np.ndarray = np.flatnonzero(~simulate)
+        by_uncertainty: np.ndarray = remaining_index[np.argsort(-std[remaining_index].max(axis=1), kind='stable')]
+        simulate[by_uncertainty[: min_simulated - simulate.sum()]] = True
+
+    return simulate
+
+
+def evaluate_surrogate_offline(
+    X: np.ndarray,
+    F: np.ndarray,
+    train_fraction: float = 0.7,
+    kappa: float = 1.0,
+    uncertainty_threshold: float = 0.1,
+    min_simulated_fraction: float = 0.25,
+    seed: int | None = None,
+) -> dict[str, float | np.ndarray]:
+    """
+    Trains on part of a stored population, and checks the predictions and the screening on the rest.
+    missed_front counts the held out individuals on the true front that the screening would not have simulated.
+    """
+    random_generator = np.random.default_rng(seed)
+    order: np.ndarray = random_generator.permutation(len(X))
+    train_count: int = max(1, int(len(X) * train_fraction))
+    train_index, test_index = order[:train_count], order[train_count:]
+
+    model = fit_surrogate(X[train_index], F[train_index], seed=seed)
+    mean, std = predict_objectives(model, X[test_index])
+    simulate = select_for_simulation(mean, std, F[train_index], kappa, uncertainty_threshold, min_simulated_fraction)
+
+    true_front: np.ndarray = np.zeros(len(X), dtype=bool)
+    true_front[NonDominatedSorting().do(F, only_non_dominated_front=True)] = True
+
+    return {
+        'rmse': np.sqrt(((mean - F[test_index]) ** 2).mean(axis=0)),
+        'simulated_fraction': float(simulate.mean()) if len(simulate) != 0 else 0.0,
+        'missed_front': int((true_front[test_index] & ~simulate).sum()),
+    }
@@ -1,21 +1,35 @@
 import asyncio
 import json
-import math
 import os
 import pathlib
 import time
-from datetime import datetime
 from itertools import combinations
 
 import numpy as np
 import pandas
 
 import constants as c
+import EngineClasses.EnginePool as ep
+import EngineClasses.MatchScheduler as ms
+import EngineClasses.Staging as st
 import functions as f
+import GeneticAlgorithm.Allocation as al
+import GeneticAlgorithm.Excitement as ex
+import GeneticAlgorithm.FrameArchive as fa
+import GeneticAlgorithm.FrameParser as fp
+import GeneticAlgorithm.Racing as ra
 import MotionClasses.MotionEditor as me
 import MotionClasses.MotionHeaders as mh
 import MotionClasses.MotionNames as mn
-from GeneticAlgorithm.FrameData import parse_frame_data
+from GeneticAlgorithm.GameResult import GameResult, calculate_character_win_rates, count_pairing_wins
+
+# In requirements.txt, the import is still guarded so a bare environment polls the engine's log directory instead
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+MATCH_AGENT_NAME: str = c.AgentNames.CONSISTENT_MCTS_AGENT
 
 
 # According to research, its just euclid distance between objects
@@ -106,44 +120,45 @@ def constraint_novelty_search(
     ) / 1
 
 
-async def wait_for_file(
-    experiment_name: str,
-    log_group: str,
-    extension: str,
-    timeout: int = 10,
-) -> pathlib.Path | None:
-    if c.BASE_PATH is not None:
-        file_path: pathlib.Path = pathlib.Path(os.path.join(c.BASE_PATH, 'log', log_group))
-    else:
-        file_path: pathlib.Path = pathlib.Path(os.path.join('log', log_group))
-
-    start_poll = time.time()
-    time_str = datetime.now().strftime('%H:%M:%S')
+def has_game_files(game_files: dict[str, list[pathlib.Path]]) -> bool:
+    return all(len(game_files.get(log_group_name, [])) != 0 for log_group_name in [c.LOGS.POINT, c.LOGS.FRAME_DATA])
 
-    print(f'looking for {experiment_name} at {time_str}')
-    while time.time() - start_poll < timeout:
-        file: pathlib.Path | None = next(file_path.glob(f'*{experiment_name}*.{extension}'), None)
-        if file is not None:
-            return file
 
-        await asyncio.sleep(1)
+# Only a fallback, the engine has normally written its files by the time the game returns
+async def wait_for_engine_output(engine_workspace: str, timeout: float = 10) -> bool:
+    engine_log_root: pathlib.Path = pathlib.Path(engine_workspace, 'log')
 
-    time_str = datetime.now().strftime('%H:%M:%S')
-    print(f'Failed at {time_str}')
-    return None
+    def has_engine_files() -> bool:
+        return all(
+            any(pathlib.Path(engine_log_root, log_group_name).glob('*'))  #
+            for log_group_name in [c.LOGS.POINT, c.LOGS.FRAME_DATA]
+        )
 
+    if has_engine_files():
+        return True
 
-async def wait_for_point_file(experiment_name: str, timeout: int = 10) -> pathlib.Path | None:
-    return await wait_for_file(experiment_name, c.LOGS.POINT, 'csv', timeout=timeout)
+    print(f'Waiting on the game files in {engine_log_root}')
+    try:
+        async with asyncio.timeout(timeout):
+            # Without watchfiles, the engine's own (small) log directory is checked instead
+            if awatch is None or not engine_log_root.is_dir():
+                while not has_engine_files():
+                    await asyncio.sleep(c.ENGINE_OUTPUT_POLL_SEC)
+                return True
 
+            async for _ in awatch(engine_log_root, recursive=True):
+                if has_engine_files():
+                    return True
+    except TimeoutError:
+        pass
 
-async def wait_for_df_file(experiment_name: str, timeout: int = 10) -> pathlib.Path | None:
-    return await wait_for_file(experiment_name, c.LOGS.FRAME_DATA, 'json', timeout=timeout)
+    return has_engine_files()
 
 
 """
 * TODO: Think about scaling at a later stage
 * For now, we will have 3 engines to handle the different matches against the MCTS agents
+* The engines come from the worker's engine pool, so they stay alive between individuals
 """
 
 
@@ -154,14 +169,27 @@ async def orchestrate_matches(
     engine_multiplier: int,
     game_duration_sec: int = 60,
     visual: bool = False,
-) -> float:
+    match_items: list[ms.MatchItem] | None = None,
+    racing_settings: ra.RacingSettings | None = None,
+    prior_game_results: list[GameResult] | None = None,
+    no_engines: int | None = None,
+    excitement_frame_window: int = 300,
+    excitement_tanh_scale: float = 3,
+    common_random_numbers_base_seed: int | None = None,
+    player_hp: int | None = None,
+    adaptive_allocation: bool = False,
+    motion_key: str | None = None,
+) -> list[GameResult]:
     c.NO_GAMES = no_matches
-    c.POLL_INTERVAL_SEC = 0
     c.GAME_DURATION_SEC = game_duration_sec
+    if player_hp is None:
+        player_hp = c.PLAYER_HP
+
+    if '-' in experiment_name:
+        raise ValueError('Please avoid using experiment names with -, it will mess up the data consolidator')
 
     custom_motion_paths: list[str] = [
-        os.path.join(
-            c.CUSTOM_MOTION_PATH,
+        st.get_custom_motion_path(
             experiment_name,
             f'{character_name.lower()}.csv',
         )  #
@@ -174,24 +202,12 @@ async def orchestrate_matches(
             path=path,
         )
 
-    argument_for_custom_motions: np.ndarray = np.full(shape=(3, 6), dtype=object, fill_value='')
     character_order_combinations: list[tuple[int, int]] = list(combinations([0, 1, 2], 2))
     # character_order_combinations: list[tuple[int, int]] = [
     #     (0, 2),
     #     (0, 2),
     #     (0, 2),
     # ]
-    for index, combination in enumerate(character_order_combinations):
-        argument_for_custom_motions[index, :] = np.array(
-            [
-                '--config-path',
-                '2',
-                c.CHARACTER_ORDER_REVERSE[combination[0]],
-                custom_motion_paths[combination[0]],
-                c.CHARACTER_ORDER_REVERSE[combination[1]],
-                custom_motion_paths[combination[1]],
-            ]
-        )
 
     common_commands = [
         'java',
@@ -199,13 +215,13 @@ async def orchestrate_matches(
         os.pathsep.join(['dare.jar', '.']),
         'Main',
         '--limithp',
-        str(c.PLAYER_HP),
-        str(c.PLAYER_HP),
+        str(player_hp),
+        str(player_hp),
         '-df',
         '-r',
         '1',
         '-f',
-        str(c.GAME_DURATION_SEC * 60),
+        str(game_duration_sec * 60),
         '--time-stamp',
         c.GAME_TIME,
         *(['--headless-mode'] if not visual else []),
@@ -216,8 +232,6 @@ async def orchestrate_matches(
         '2',
     ]
 
-    os.makedirs(os.path.join('log', 'engines'), exist_ok=True)
-
     characters = [
         character_name  #
         for combination in character_order_combinations
@@ -225,62 +239,203 @@ async def orchestrate_matches(
     ]
     characters = np.array(characters).reshape(3, -1)
 
-    agents = np.full(shape=(3, 2), fill_value=c.AgentNames.CONSISTENT_MCTS_AGENT)
-
-    await f.start_simulators(
-        engine_multiplier * 3,
-        common_commands,
-        characters,
-        mutated_motions,
-        agents,
-        experiment_name,
-        # deterministic=deterministic, really dont care
-        extra_commands=argument_for_custom_motions,
+    agents = np.full(shape=(3, 2), fill_value=MATCH_AGENT_NAME)
+
+    # Without items, it's a full evaluation. With them, only those games are played (e.g. to top up cached games)
+    if match_items is None:
+        match_items = ms.create_match_items(games_per_pairing=c.NO_GAMES * engine_multiplier)
+
+    if no_engines is None:
+        no_engines = engine_multiplier * 3
+    pool: ep.EnginePool = ep.get_engine_pool(common_commands)
+    loop = asyncio.get_running_loop()
+    scoring_games: list[asyncio.Future] = []
+
+    # The motions belong to the individual, a game of the game queue has its own experiment name only for its files
+    if motion_key is None:
+        motion_key = experiment_name
+
+    async def load_motions(engine: ep.Engine) -> None:
+        await pool.load_motions(engine, custom_motion_paths, motion_key)
+
+    async def play_item(engine: ep.Engine, item: ms.MatchItem) -> None:
+        seed: int | None = (
+            ms.get_game_seed(common_random_numbers_base_seed, item.pairing, item.game)  #
+            if common_random_numbers_base_seed is not None
+            else None
+        )
+
+        character_duo = characters[item.pairing, :]
+        agent_1_name, agent_2_name = f.register_match_agents(
+            engine.gateway,
+            character_duo,
+            agents[item.pairing, :],
+            mutated_motions,
+            seed=seed,
+        )
+
+        game_name = f'{experiment_name}-instance-{item.instance}-{agent_1_name}-vs-{agent_2_name}'
+        await engine.gateway.run_game(
+            [f'{game_name}<name>{character_duo[0]}', character_duo[1]],
+            [agent_1_name, agent_2_name],
+            1,
+        )
+        game_files: dict[str, list[pathlib.Path]] = st.collect_engine_output(engine.workspace, experiment_name)
+        if not has_game_files(game_files) and await wait_for_engine_output(engine.workspace, timeout=c.ENGINE_OUTPUT_TIMEOUT_SEC):
+            for log_group_name, files in st.collect_engine_output(engine.workspace, experiment_name).items():
+                game_files.setdefault(log_group_name, []).extend(files)
+
+        if not has_game_files(game_files):
+            raise FileNotFoundError(f'Game {item} finished without its point and frame data files')
+
+        # Scored off the loop, the engine goes straight on to its next game
+        scoring_games.append(
+            loop.run_in_executor(
+                None,
+                score_game,
+                item,
+                game_files[c.LOGS.POINT][0],
+                game_files[c.LOGS.FRAME_DATA][0],
+                excitement_frame_window,
+                excitement_tanh_scale,
+                seed,
+                player_hp,
+                game_duration_sec,
+            )
+        )
+
+    # Without racing, everything is a single batch
+    batches: list[list[ms.MatchItem]] = (
+        [match_items]  #
+        if racing_settings is None
+        else ra.get_batches(match_items, racing_settings.batch_games)
+    )
+    if prior_game_results is None:
+        prior_game_results = []
+
+    game_results: list[GameResult] = []
+    allocated_items: list[ms.MatchItem] = []
+
+    # A game that is still being scored counts as running
+    def assign_item(item: ms.MatchItem) -> None:
+        scored_results: list[GameResult] = [
+            scoring_game.result()  #
+            for scoring_game in scoring_games
+            if scoring_game.done() and scoring_game.exception() is None
+        ]
+        al.assign_match_item(item, prior_game_results + game_results + scored_results, allocated_items, c.ALLOCATION_MIN_GAMES)
+
+    async with pool.reserve(no_engines):
+        for batch in batches:
+            if racing_settings is not None and ra.is_settled(prior_game_results + game_results, racing_settings):
+                break
+
+            # Kill a game if it takes too long to finish
+            scheduler = ms.MatchScheduler(
+                pool,
+                play_item,
+                item_timeout_sec=game_duration_sec * 1.5,
+                assign_item=assign_item if adaptive_allocation else None,
+                prepare_engine=load_motions,
+            )
+            try:
+                await scheduler.run(batch, no_engines)
+            finally:
+                # Even when the batch failed, nothing may still be reading the files once we return
+                batch_results = await asyncio.gather(*scoring_games, return_exceptions=True)
+                scoring_games.clear()
+
+            for game_result in batch_results:
+                if isinstance(game_result, BaseException):
+                    raise game_result
+                game_results.append(game_result)
+    c.end_time = time.perf_counter()
+
+    if len(game_results) != 0:
+        f.consolidate_data(experiment_name, log_list=[c.LOGS.POINT, c.LOGS.FRAME_DATA], log_root=st.get_evaluation_log_path(experiment_name))
+
+    return game_results
+
+
+# Runs in the executor, so the CPU heavy part never holds up the engines
+def score_game(
+    item: ms.MatchItem,
+    point_file: pathlib.Path,
+    frame_data_file: pathlib.Path,
+    frame_window: int,
+    tanh_scale: float,
+    seed: int | None = None,
+    player_hp: int | None = None,
+    game_duration_sec: int | None = None,
+) -> GameResult:
+    with point_file.open(mode='r') as src_file:
+        _, _, match_result = f.parse_point_file(point_file.name, src_file.readline())
+
+    # Only the columns are parsed out of the JSON, once, consolidation only merges them
+    archived_game: fa.ArchivedGame = fp.ingest_frame_data_file(
+        frame_data_file,
+        item.instance,
+        f.get_number_from_file_name(frame_data_file.name, 'round'),
+        field_names=c.FRAME_DATA_FIELDS,
+        frame_stride=get_frame_data_stride(frame_window),
+    )
+
+    match_costs: np.ndarray = calculate_match_costs(
+        [
+            calculate_game_win_probabilities(
+                archived_game.columns['hitPoints'],
+                archived_game.columns['energy'],
+                frame_window=frame_window,
+                player_hp=player_hp,
+                frame_stride=archived_game.frame_stride,
+            )
+        ],
+        frame_window=frame_window,
+        tanh_scale=tanh_scale,
+        game_duration_sec=game_duration_sec,
+        frame_strides=archived_game.frame_stride,
+        game_lengths=[archived_game.game_length],
+    )
+
+    return GameResult(
+        pairing=item.pairing,
+        game=item.game,
+        hp_one=int(match_result[0]),
+        hp_two=int(match_result[1]),
+        excitement_cost=float(match_costs[0]),
+        seed=seed,
+        player_hp=player_hp,
+        game_duration_sec=game_duration_sec,
     )
 
-    f.consolidate_data(experiment_name, log_list=[c.LOGS.POINT, c.LOGS.FRAME_DATA])
 
+# The first games_per_pairing games of every pairing, in a fixed order, so cached and fresh games score the same
+def select_game_results(game_results: list[GameResult], games_per_pairing: int) -> list[GameResult]:
+    return [
+        game_result  #
+        for game_result in sorted(game_results, key=lambda game_result: (game_result.pairing, game_result.game))
+        if game_result.game < games_per_pairing
+    ]
+
+
+def get_missing_match_items(game_results: list[GameResult], games_per_pairing: int) -> list[ms.MatchItem]:
+    played_games: set[tuple[int, int]] = {(game_result.pairing, game_result.game) for game_result in game_results}
+    return [
+        match_item  #
+        for match_item in ms.create_match_items(games_per_pairing=games_per_pairing)
+        if (match_item.pairing, match_item.game) not in played_games
+    ]
+
+
+def calculate_competitive_balance(game_results: list[GameResult]) -> float:
     # To get the game results, we are going to get the HP differences in each game.
     # The first implementation of this is going to be rather crude.
-    # We will assume that:
+    # Every game is its own instance, and we will assume that:
     #   x % 3 == 0 -> zen vd garnet
     #   x % 3 == 1 -> zen vd lud
     #   x % 3 == 2 -> garnet vd lud
-
-    point_csv: pathlib.Path | None = await wait_for_point_file(experiment_name)
-    if point_csv is None:
-        raise FileExistsError(f'Glob failed to fined experiment | {point_csv} | in folder')
-    if not point_csv.exists():
-        raise FileExistsError(f"Point file | {point_csv} | doesn't exist folder")
-
-    point_df: pandas.DataFrame = f.read_match_results(point_csv)
-    pairing_index = point_df[[c.PointHeaderNames.INSTANCE]].to_numpy()
-
-    hp_diff_zen_garnet = point_df[pairing_index % 3 == 0][[c.PointHeaderNames.HP_ONE, c.PointHeaderNames.HP_TWO]].to_numpy().astype(np.int16)
-    hp_diff_zen_lud = point_df[pairing_index % 3 == 1][[c.PointHeaderNames.HP_ONE, c.PointHeaderNames.HP_TWO]].to_numpy().astype(np.int16)
-    hp_diff_garnet_lud = point_df[pairing_index % 3 == 2][[c.PointHeaderNames.HP_ONE, c.PointHeaderNames.HP_TWO]].to_numpy().astype(np.int16)
-
-    # Think about this more, if we have z-g and z-l, do we need to add g-z again?
-    zen_win_rate = (
-        (hp_diff_zen_garnet[:, 0] > hp_diff_zen_garnet[:, 1]).sum()  #
-        + (hp_diff_zen_lud[:, 0] > hp_diff_zen_lud[:, 1]).sum()
-    ) / (no_matches * engine_multiplier * 2)
-    garnet_win_rate = (
-        (hp_diff_zen_garnet[:, 0] < hp_diff_zen_garnet[:, 1]).sum()  #
-        + (hp_diff_garnet_lud[:, 0] > hp_diff_garnet_lud[:, 1]).sum()
-    ) / (no_matches * engine_multiplier * 2)
-    lud_win_rate = (
-        (hp_diff_zen_lud[:, 0] < hp_diff_zen_lud[:, 1]).sum()  #
-        + (hp_diff_garnet_lud[:, 0] < hp_diff_garnet_lud[:, 1]).sum()
-    ) / (no_matches * engine_multiplier * 2)
-
-    win_rates: np.ndarray = np.array(
-        [
-            zen_win_rate,
-            garnet_win_rate,
-            lud_win_rate,
-        ]
-    )
+    # Adaptive allocation gives the pairings unequal games, so the win rates are averaged per pairing
+    win_rates: np.ndarray = calculate_character_win_rates(*count_pairing_wins(game_results))
 
     win_rates: np.ndarray = f.transform_win_rate_array(win_rates)
 
@@ -351,22 +506,8 @@ def generate_random_gene(motion_adjustments: list[tuple[str, str]]) -> np.ndarra
     return np.stack(header_limits_container).T.flatten()
 
 
-# TODO, can be vectorized and sped up, but really, not the slow point in your code
-# Calculated at the POV of player 1
-def calculate_win_probabilities(
-    data_frame_file_name: str,
-    energy_weight: float = 0.5,
-    frame_window: int = 60,
-    projected_hp_weight: float = 0.5,
-) -> list[np.ndarray]:
-    full_file_path: pathlib.Path = pathlib.Path(
-        os.path.join(
-            'log',
-            c.LOGS.FRAME_DATA,
-            data_frame_file_name,
-        )
-    )
-
+# Consolidated frame data from before the frame archives, a list of {game file name: frames} rows
+def load_frame_data_games(full_file_path: pathlib.Path) -> list[tuple[str, list[dict[str, any]]]]:
     if not full_file_path.exists():
         raise FileNotFoundError(f"File: {str(full_file_path)} doesn't exist")
 
@@ -374,55 +515,90 @@ def calculate_win_probabilities(
     with open(str(full_file_path)) as file:
         frame_data_json = json.load(file)
 
-    row_count: int = -1
-    if isinstance(frame_data_json, list):
-        row_count = len(frame_data_json)
-
-    collected_win_probabilities: list[np.ndarray] = []
+    if not isinstance(frame_data_json, list):
+        return []
 
-    for row in range(row_count):
-        if row_count == -1:
-            frame_data, max_frame = parse_frame_data(frame_data_json)
-            win_probabilities = np.zeros(dtype=np.float64, shape=(max_frame))
-        else:
-            key_name: str = list(frame_data_json[row].keys())[0]
-            frame_data, max_frame = parse_frame_data(frame_data_json[row][key_name])
-            win_probabilities = np.zeros(dtype=np.float64, shape=(max_frame))
+    frame_data_games: list[tuple[str, list[dict[str, any]]]] = []
+    for row in frame_data_json:
+        key_name: str = list(row.keys())[0]
+        frame_data_games.append((key_name, row[key_name]))
 
-        for index, frame in enumerate(frame_data):
-            p1_hp, p2_hp = frame.hitPoints
-            p1_energy, p2_energy = frame.energy
+    return frame_data_games
 
-            if p1_hp <= 0 and p2_hp <= 0 or index == 0:
-                win_probabilities[index] = 0.5
-                continue
-            elif p1_hp <= 0:
-                win_probabilities[index] = 0
-                continue
-            elif p2_hp <= 0:
-                win_probabilities[index] = 1
-                continue
 
-            p1_effective_hp = p1_hp + (p1_energy * energy_weight)
-            p2_effective_hp = p2_hp + (p2_energy * energy_weight)
+# The stride a game's frame data is kept at, checked against the frame window before the JSON is thrown away
+def get_frame_data_stride(frame_window: int) -> int:
+    frame_stride: int = frame_window if c.FRAME_DATA_STRIDE is None else c.FRAME_DATA_STRIDE
+    ex.get_window_rows(frame_window, frame_stride, 1)
+    return frame_stride
 
-            past_frame = frame_data[max(0, index - frame_window)]
 
-            p1_hp_lost = past_frame.hitPoints[0] - p1_hp
-            p2_hp_lost = past_frame.hitPoints[1] - p2_hp
+# HP, energy, offsets, strides and lengths of every game in the file, back to back
+def load_scoring_columns(full_file_path: pathlib.Path) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if full_file_path.suffix == '.npz':
+        with fa.FrameArchive(full_file_path) as frame_archive:
+            return (
+                frame_archive.get_column('hitPoints'),
+                frame_archive.get_column('energy'),
+                frame_archive.offsets,
+                frame_archive.strides,
+                frame_archive.lengths,
+            )
 
-            p1_projected_hp = p1_effective_hp - (p1_hp_lost * projected_hp_weight)
-            p2_projected_hp = p2_effective_hp - (p2_hp_lost * projected_hp_weight)
+    # The JSON from before the frame archives always has every frame
+    games_columns: list[dict[str, np.ndarray]] = [
+        fa.get_frame_columns(raw_frame_data)  #
+        for _, raw_frame_data in load_frame_data_games(full_file_path)
+    ]
+    hit_points, offsets = ex.get_ragged_columns([columns['hitPoints'] for columns in games_columns])
+    energy, _ = ex.get_ragged_columns([columns['energy'] for columns in games_columns])
+    return hit_points.reshape(-1, 2), energy.reshape(-1, 2), offsets, np.ones(len(games_columns), dtype=np.int32), np.diff(offsets)
 
-            p1_projected_hp = p1_projected_hp / c.PLAYER_HP
-            p2_projected_hp = p2_projected_hp / c.PLAYER_HP
 
-            total_projected = p1_projected_hp + p2_projected_hp
-            win_probabilities[index] = p1_projected_hp / (total_projected + 1e-6)
+def calculate_win_probabilities(
+    full_file_path: pathlib.Path,
+    energy_weight: float = 0.5,
+    frame_window: int = 60,
+    projected_hp_weight: float = 0.5,
+) -> list[np.ndarray]:
+    # The games are already back to back, they are all done in one go
+    hit_points, energy, offsets, frame_strides, _ = load_scoring_columns(full_file_path)
+    win_probabilities: np.ndarray = ex.calculate_win_probabilities(
+        hit_points,
+        energy,
+        offsets,
+        c.PLAYER_HP,
+        energy_weight=energy_weight,
+        frame_window=frame_window,
+        projected_hp_weight=projected_hp_weight,
+        frame_strides=frame_strides,
+    )
+    return np.split(win_probabilities, offsets[1:-1])
 
-        collected_win_probabilities.append(win_probabilities)
 
-    return collected_win_probabilities
+# Calculated at the POV of player 1
+def calculate_game_win_probabilities(
+    hit_points: np.ndarray,
+    energy: np.ndarray,
+    energy_weight: float = 0.5,
+    frame_window: int = 60,
+    projected_hp_weight: float = 0.5,
+    player_hp: int | None = None,
+    frame_stride: int = 1,
+) -> np.ndarray:
+    if player_hp is None:
+        player_hp = c.PLAYER_HP
+
+    return ex.calculate_win_probabilities(
+        hit_points.reshape(-1, 2),
+        energy.reshape(-1, 2),
+        ex.get_offsets([len(hit_points)]),
+        player_hp,
+        energy_weight=energy_weight,
+        frame_window=frame_window,
+        projected_hp_weight=projected_hp_weight,
+        frame_strides=frame_stride,
+    )
 
 
 # We are going to function under the assumption that the data has already been split
@@ -433,59 +609,74 @@ def calculate_entropy_score(
     gamma_scale: float = 0.75,
     tanh_scale: float = -1,
 ) -> float:
-    invalid_range: float = 1e-2
-    total_costs = np.zeros(
-        shape=len(win_probabilities_list),
-        dtype=np.float64,
+    total_costs: np.ndarray = calculate_match_costs(
+        win_probabilities_list,
+        frame_window=frame_window,
+        epsilon=epsilon,
+        tanh_scale=tanh_scale,
     )
-    averages = []
-
-    for match_index, win_probabilities in enumerate(win_probabilities_list):
-        total_frames = win_probabilities.shape[0]
-
-        normalized_match_duration = total_frames / (c.GAME_DURATION_SEC * 60)
-        averages.append(normalized_match_duration)
-        if total_frames <= frame_window:
-            total_costs[match_index] = normalized_match_duration * invalid_range
-            continue
-
-        # TODO: We can speed this up very easily
-        time_step_size = frame_window / total_frames
-
-        total_cost = 0.0
 
-        for frame_index in range(frame_window, total_frames, frame_window):
-            current_win_probability = win_probabilities[frame_index]
-            previous_win_probability = win_probabilities[frame_index - frame_window]
+    return aggregate_entropy_score(total_costs, gamma_scale=gamma_scale)
 
-            # Done just to enure we never pass o to log for errors
-            sigma_t = (((current_win_probability - previous_win_probability) ** 2) / time_step_size) + epsilon
 
-            # 4. Integrate (multiply by dt and add to the running total)
-            total_cost += (sigma_t - math.log(sigma_t) - 1) * time_step_size
-
-        normalization: float = (epsilon - math.log(epsilon) - 1) * ((total_frames - 1) // frame_window) * time_step_size
-        total_costs[match_index] = 1 - max(invalid_range, min(total_cost / normalization, 1))
+# The excitement of every game on its own, these are what get cached per game
+def calculate_match_costs(
+    win_probabilities_list: list[np.ndarray],
+    frame_window: int = 60,
+    epsilon: float = 1e-9,
+    tanh_scale: float = -1,
+    game_duration_sec: int | None = None,
+    frame_strides: int | list[int] = 1,
+    game_lengths: list[int] | None = None,
+) -> np.ndarray:
+    # Screening games are shorter, their durations are normalized by their own length
+    if game_duration_sec is None:
+        game_duration_sec = c.GAME_DURATION_SEC
+
+    win_probabilities, offsets = ex.get_ragged_columns(win_probabilities_list)
+    return ex.calculate_match_costs(
+        win_probabilities,
+        offsets,
+        game_duration_sec,
+        frame_window=frame_window,
+        epsilon=epsilon,
+        tanh_scale=tanh_scale,
+        frame_strides=frame_strides,
+        game_lengths=game_lengths,
+    )
 
-        if tanh_scale != -1:
-            if total_costs[match_index] != 0:
-                t = 1
-            total_costs[match_index] *= math.tanh(tanh_scale * (total_frames / (c.GAME_DURATION_SEC * 60)))
 
+def aggregate_entropy_score(total_costs: np.ndarray, gamma_scale: float = 0.75) -> float:
     # TODO: Can look into using harmonic mean here or sum
     entropy_score = np.average(total_costs)
-    # print('Ave time:', np.average(np.array(averages)))
 
     return pow(entropy_score, gamma_scale)
 
 
-async def calculate_excitement(experiment_name: str, tanh_scale: float = 3, frame_window: int = 300) -> float:
-    frame_data_file: pathlib.Path | None = await wait_for_df_file(experiment_name)
-
-    if frame_data_file is None or not frame_data_file.exists():
-        raise FileNotFoundError(f'cant find the consolidated point file: *{experiment_name}*.json')
-
-    win_probabilities = calculate_win_probabilities(frame_data_file.name, frame_window=frame_window)
-    overall_excitement: float = calculate_entropy_score(win_probabilities, frame_window=frame_window, tanh_scale=tanh_scale)
+# Takes the frame data file that consolidate_data returned
+def calculate_excitement(frame_data_file: pathlib.Path, tanh_scale: float = 3, frame_window: int = 300) -> float:
+    if not frame_data_file.exists():
+        raise FileNotFoundError(f'cant find the consolidated frame data file: {frame_data_file}')
+
+    # Straight on the columns, the strides and lengths of the games are needed for the costs too
+    hit_points, energy, offsets, frame_strides, game_lengths = load_scoring_columns(frame_data_file)
+    win_probabilities: np.ndarray = ex.calculate_win_probabilities(
+        hit_points,
+        energy,
+        offsets,
+        c.PLAYER_HP,
+        frame_window=frame_window,
+        frame_strides=frame_strides,
+    )
+    total_costs: np.ndarray = ex.calculate_match_costs(
+        win_probabilities,
+        offsets,
+        c.GAME_DURATION_SEC,
+        frame_window=frame_window,
+        tanh_scale=tanh_scale,
+        frame_strides=frame_strides,
+        game_lengths=game_lengths,
+    )
+    overall_excitement: float = aggregate_entropy_score(total_costs)
 
     return overall_excitement
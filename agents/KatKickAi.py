@@ -24,6 +24,7 @@ class KatKickAi(AIInterface):
         interval: float = 1,
         character_name: str | None = None,
         deterministic: bool = True,
+        seed: int | None = None,
     ) -> None:
         super().__init__()
         self.blind_flag: bool = False
@@ -34,6 +35,7 @@ class KatKickAi(AIInterface):
         self.character_name: str = character_name
         self.motion: pandas.DataFrame = motion
         self.deterministic: bool = deterministic
+        self.random_generator: random.Random = random.Random(seed)
 
         self.reset_interval()
 
@@ -41,7 +43,7 @@ class KatKickAi(AIInterface):
         self.interval_frames_current: float = (
             self.interval_frames  #
             if self.deterministic
-            else random.uniform(1, self.interval_frames)
+            else self.random_generator.uniform(1, self.interval_frames)
         )
 
     def name(self) -> str:
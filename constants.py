@@ -8,18 +8,115 @@ NO_GAMES: int = 1
 NO_ENGINES: int = 1
 PLAYER_HP: int = 400
 PLAYER_MAX_ENERGY: int = 300
+# Seconds between status heartbeats, 0 turns them off (cluster runs pass -i 0)
 POLL_INTERVAL_SEC: int = 1
 GAME_DURATION_SEC: int = 60
 EXPERIMENT_NAME: str = 'adhoc'
 ZIP_FILES: bool = True
 
+# Engines are kept alive between evaluations, and are handed new motions through their config files.
+# The engine builds a new Fighting for every game, and Character.initialize opens the motion CSV again each time (no cache),
+# dare.jar's --config-path only changes which file that is. Off restarts an engine whenever it gets new motions.
+ENGINE_HOT_RELOAD_MOTIONS: bool = True
+ENGINE_READY_TIMEOUT_SEC: int = 30
+ENGINE_START_RETRY_LIMIT: int = 2
+# Node-local directory that tracks the running engines, None uses the temp directory
+ENGINE_REGISTRY_PATH: str | None = None
+
+
+class ENGINE_LOG_LEVELS:
+    ALL: str = 'all'
+    ERRORS: str = 'errors'
+
+
+ENGINE_LOG_LEVEL: str = ENGINE_LOG_LEVELS.ALL
+ENGINE_LOG_BUFFER_BYTES: int = 64 * 1024
+ENGINE_LOG_FLUSH_SEC: float = 5
+ENGINE_LOG_TAIL_LINES: int = 50
+# Only used when an engine's game files aren't there yet once the game has returned
+ENGINE_OUTPUT_TIMEOUT_SEC: float = 10
+ENGINE_OUTPUT_POLL_SEC: float = 0.1
+
+# Per-game results of every gene, relative to the base path, so duplicates are never played twice
+USE_FITNESS_CACHE: bool = True
+FITNESS_CACHE_PATH: str = 'fitness_cache'
+
+# Racing stops playing an individual's games once its competitive balance interval is narrow, or entirely below the floor.
+# The floor is a fixed competitive balance bar, it doesn't look at excitement or the rest of the population
+USE_RACING: bool = False
+RACING_MIN_GAMES: int = 2
+RACING_MAX_INTERVAL_WIDTH: float = 0.25
+RACING_BALANCE_FLOOR: float = 0.6
+
+# The surrogate predicts competitive balance and excitement, only promising or uncertain offspring are simulated
+USE_SURROGATE: bool = False
+SURROGATE_MIN_HISTORY: int = 30
+SURROGATE_TREES: int = 100
+# How optimistic the prediction is, in standard deviations of the trees
+SURROGATE_KAPPA: float = 1.0
+SURROGATE_UNCERTAINTY: float = 0.1
+SURROGATE_MIN_SIMULATED_FRACTION: float = 0.25
+
+# Every game is a single core Dask task, instead of every individual being an engine_multiplier * 3 core task
+USE_GAME_QUEUE: bool = False
+
+# Offspring are played at a cheap fidelity first, only the promising ones get the full games
+USE_FIDELITY_LADDER: bool = False
+# Duration and HP are scaled by the same factor
+SCREENING_MATCH_SCALE: float = 0.25
+SCREENING_DURATION_SCALE: float = 0.5
+SCREENING_MIN_DURATION_SEC: int = 10
+# How far behind the screening front an offspring can be and still be promoted
+FIDELITY_PROMOTION_MARGIN: float = 0.05
+
+# Common random numbers, game k of pairing p gets the same seed for every individual.
+# Only the Python agents take a seed, the engine has no seed option and the MCTS agent always seeds itself with 42.
+USE_COMMON_RANDOM_NUMBERS: bool = False
+COMMON_RANDOM_NUMBERS_BASE_SEED: int = GLOBAL_SEED
+
+# Steady state MOEAD, every offspring is inserted as soon as it is played and replaced by a fresh one
+USE_ASYNC_EVOLUTION: bool = False
+# None keeps one more individual in flight than the cluster has cores for
+ASYNC_MAX_IN_FLIGHT: int | None = None
+
+# The games budget stays the same, but the next game goes to the pairing that most reduces the competitive balance error
+USE_ADAPTIVE_ALLOCATION: bool = False
+# Every pairing gets these first
+ALLOCATION_MIN_GAMES: int = 2
+
+# Frame data is ingested into columns (GeneticAlgorithm/FrameArchive.py), only these fields are kept (HP and energy always are).
+# Add 'characterHitBoxes', 'attackHitBoxes', 'characterSpeeds' and/or 'projectileInformation' for the hitbox, speed and projectile tables
+FRAME_DATA_FIELDS: list[str] = ['hitPoints', 'energy']
+# Only every FRAME_DATA_STRIDE-th frame is kept. None keeps one frame per excitement frame window, which is all the scorer looks at.
+# Whatever the stride, the excitement frame window has to be a multiple of it
+FRAME_DATA_STRIDE: int | None = None
+
+# How many times a game is put back in the queue after its engine crashed or hung
+GAME_RETRY_LIMIT: int = 2
+
 NODES: int = 1
 # We actually have 20, but wanna say 15 to align to cluster
 CORES: int = 20
 EST_RAM_PER_ENGINE_GB: int = 2
+# Engine launches wait until the node has room for them, instead of pushing it into swap
+ADMISSION_MEMORY_HEADROOM_GB: float = 1
+ADMISSION_MAX_LOAD_PER_CORE: float = 1.5
+ADMISSION_POLL_SEC: float = 1
+ADMISSION_TIMEOUT_SEC: int = 300
 PARTITION: str = 'regular'
 SCHEDULER_FILE: str | None = None
 BASE_PATH: str | None = None
+# Node-local disk for staging engine output, None writes straight to the shared base path
+SCRATCH_PATH: str | None = None
+
+
+class STAGING_SYNC_MODES:
+    BACKGROUND: str = 'background'
+    ON_REQUEST: str = 'on_request'
+
+
+STAGING_SYNC_MODE: str = STAGING_SYNC_MODES.BACKGROUND
+MEASURE_STAGING: bool = False
 
 DEFAULT_MOTIONS_PATH: str = os.path.join('data', 'characters')
 MOTIONS_FILE_NAME: str = 'Motion.csv'
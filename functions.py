@@ -7,14 +7,12 @@ import pathlib
 import random
 import re
 import shutil
-import subprocess
 import time
 import uuid
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 from contextlib import contextmanager
-from itertools import islice
+from typing import Any
 
-import aiofiles
 import dill
 import numpy as np
 import pandas
@@ -23,8 +21,11 @@ from pymoo.core.algorithm import Algorithm
 from pymoo.core.result import Result
 
 import constants as c
-import functions as f
+import EngineClasses.EngineRegistry as er
+import GeneticAlgorithm.FrameArchive as fa
+import GeneticAlgorithm.FrameParser as fp
 from agents.KatKickAi import KatKickAi
+from EngineClasses.EngineLogSink import EngineLogSink
 from MotionClasses.MotionEditor import MotionEditor
 
 
@@ -58,7 +59,7 @@ def arg_parser() -> str:
         '--poll_interval_sec',
         type=int,
         default=-1,
-        help='Time lag for updating console log',
+        help='Time lag for updating console log, 0 turns it off',
     )
     parser.add_argument(
         '-e',
@@ -123,6 +124,97 @@ def arg_parser() -> str:
         default=None,
         help='Multiprocessing: Config file for scheduler',
     )
+    parser.add_argument(
+        '-sp',
+        '--scratch_path',
+        type=str,
+        default=None,
+        help='Multiprocessing: Node-local directory to stage engine output in',
+    )
+    parser.add_argument(
+        '-ssm',
+        '--staging_sync_mode',
+        type=str,
+        default=None,
+        help=f'Multiprocessing: When staged files go back to shared storage: {c.STAGING_SYNC_MODES.BACKGROUND} or {c.STAGING_SYNC_MODES.ON_REQUEST}',
+    )
+    parser.add_argument(
+        '-ms',
+        '--measure_staging',
+        type=str,
+        default='False',
+        help='Multiprocessing: Flag to time staging against writing to shared storage directly',
+    )
+    parser.add_argument(
+        '-ell',
+        '--engine_log_level',
+        type=str,
+        default=None,
+        help=f'Engine transcript to keep: {c.ENGINE_LOG_LEVELS.ALL} or {c.ENGINE_LOG_LEVELS.ERRORS} (errors plus the last lines)',
+    )
+    parser.add_argument(
+        '-ufc',
+        '--use_fitness_cache',
+        type=str,
+        default='True',
+        help='Flag to reuse the games of genes that were already evaluated, in this or earlier runs',
+    )
+    parser.add_argument(
+        '-ur',
+        '--use_racing',
+        type=str,
+        default='False',
+        help='Flag to stop playing an individual once its competitive balance is settled',
+    )
+    parser.add_argument(
+        '-us',
+        '--use_surrogate',
+        type=str,
+        default='False',
+        help='Flag to only simulate offspring the surrogate model finds promising or is unsure about',
+    )
+    parser.add_argument(
+        '-ugq',
+        '--use_game_queue',
+        type=str,
+        default='False',
+        help='Multiprocessing: Flag to schedule single games across the cluster, instead of whole individuals',
+    )
+    parser.add_argument(
+        '-ufl',
+        '--use_fidelity_ladder',
+        type=str,
+        default='False',
+        help='Flag to screen offspring with short, low HP games, and only play the promising ones at full fidelity (not with -uae)',
+    )
+    parser.add_argument(
+        '-ucrn',
+        '--use_common_random_numbers',
+        type=str,
+        default='False',
+        help='Flag to give game k of pairing p the same seed for every individual',
+    )
+    parser.add_argument(
+        '-uae',
+        '--use_async_evolution',
+        type=str,
+        default='False',
+        help='Flag to insert every offspring as soon as it is played, instead of waiting for a generation',
+    )
+    parser.add_argument(
+        '-uaa',
+        '--use_adaptive_allocation',
+        type=str,
+        default='False',
+        help='Flag to send the next game to the pairing that most reduces the competitive balance error',
+    )
+    parser.add_argument(
+        '-fds',
+        '--frame_data_stride',
+        type=int,
+        default=-1,
+        help='Keep every n-th frame of the frame data, 0 keeps one frame per excitement frame window',
+    )
     parser.add_argument(
         '-bp',
         '--base_path',
@@ -197,10 +289,89 @@ def arg_parser() -> str:
         if args.base_path == 'None' or args.base_path is None
         else args.base_path
     )
+    c.SCRATCH_PATH = (
+        c.SCRATCH_PATH  #
+        if args.scratch_path == 'None' or args.scratch_path is None
+        else args.scratch_path
+    )
+    c.STAGING_SYNC_MODE = (
+        c.STAGING_SYNC_MODE  #
+        if args.staging_sync_mode is None
+        else args.staging_sync_mode
+    )
+    c.MEASURE_STAGING = (
+        c.MEASURE_STAGING  #
+        if args.measure_staging != 'True'
+        else True
+    )
+    c.ENGINE_LOG_LEVEL = (
+        c.ENGINE_LOG_LEVEL  #
+        if args.engine_log_level is None
+        else args.engine_log_level
+    )
+    c.USE_RACING = (
+        c.USE_RACING  #
+        if args.use_racing != 'True'
+        else True
+    )
+    c.USE_GAME_QUEUE = (
+        c.USE_GAME_QUEUE  #
+        if args.use_game_queue != 'True'
+        else True
+    )
+    c.USE_FIDELITY_LADDER = (
+        c.USE_FIDELITY_LADDER  #
+        if args.use_fidelity_ladder != 'True'
+        else True
+    )
+    c.USE_COMMON_RANDOM_NUMBERS = (
+        c.USE_COMMON_RANDOM_NUMBERS  #
+        if args.use_common_random_numbers != 'True'
+        else True
+    )
+    c.USE_ASYNC_EVOLUTION = (
+        c.USE_ASYNC_EVOLUTION  #
+        if args.use_async_evolution != 'True'
+        else True
+    )
+    c.USE_ADAPTIVE_ALLOCATION = (
+        c.USE_ADAPTIVE_ALLOCATION  #
+        if args.use_adaptive_allocation != 'True'
+        else True
+    )
+    c.FRAME_DATA_STRIDE = (
+        c.FRAME_DATA_STRIDE  #
+        if args.frame_data_stride == -1
+        else args.frame_data_stride or None
+    )
+    c.USE_SURROGATE = (
+        c.USE_SURROGATE  #
+        if args.use_surrogate != 'True'
+        else True
+    )
+    c.USE_FITNESS_CACHE = (
+        c.USE_FITNESS_CACHE  #
+        if args.use_fitness_cache == 'True'
+        else False
+    )
 
     return args.game_name
 
 
+# The constants arg_parser sets that are read on the Dask workers, which never run arg_parser themselves
+WORKER_CONSTANT_NAMES: list[str] = ['ENGINE_LOG_LEVEL', 'FRAME_DATA_STRIDE', 'FRAME_DATA_FIELDS']
+
+
+def get_worker_constants() -> dict[str, Any]:
+    return {constant_name: getattr(c, constant_name) for constant_name in WORKER_CONSTANT_NAMES}
+
+
+# Pushed to every worker with client.run, like Staging.configure
+def set_worker_constants(worker_constants: dict[str, Any]) -> None:
+    for constant_name, value in worker_constants.items():
+        setattr(c, constant_name, value)
+
+
 """
 	We currently have so many logs in the root folders.
 	We need to consolidate everything into a single file, and maybe format it as well
@@ -215,16 +386,19 @@ def get_number_from_file_name(file_name: str, string_to_find: str) -> int:
     return -1
 
 
+# Returns the files it produced per log group, so nobody has to go looking for them afterwards
 def consolidate_data(
     experiment_name: str,
     log_list: list[str] | None = None,
     exclude_list: list[str] | None = None,
-) -> None:
+    log_root: str = 'log',
+) -> dict[str, list[pathlib.Path]]:
     if exclude_list is None:
         exclude_list = []
+    consolidated_files: dict[str, list[pathlib.Path]] = {}
 
     # We will first throw an error if you add a folder to the logs that we are not aware of
-    directory: pathlib.Path = pathlib.Path('log')
+    directory: pathlib.Path = pathlib.Path(log_root)
     unknown_directories: list[str] = []
 
     use_default_log_list: bool = log_list is None
@@ -273,13 +447,13 @@ def consolidate_data(
 
             if log_group_name == c.LOGS.REPLAY:
                 experiment_folder_name: str = f'{experiment_name}-{c.GAME_TIME}'
-                log_group_path: str = os.path.join('log', log_group_name)
+                log_group_path: str = os.path.join(log_root, log_group_name)
                 experiment_folder_path: str = os.path.join(log_group_path, experiment_folder_name)
                 os.makedirs(experiment_folder_path, exist_ok=True)
                 for experiment_file in experiment_files:
                     experiment_file.rename(
                         os.path.join(
-                            'log',
+                            log_root,
                             log_group_name,
                             experiment_folder_name,
                             experiment_file.name,
@@ -288,75 +462,90 @@ def consolidate_data(
 
                 if c.ZIP_FILES:
                     experiment_folder = os.path.join(log_group_path, experiment_folder_name)
-                    shutil.make_archive(
+                    archive_path: str = shutil.make_archive(
                         experiment_folder,
                         'zip',
                         experiment_folder_path,
                     )
 
                     purge_directory(experiment_folder, True)
+                    consolidated_files.setdefault(log_group_name, []).append(pathlib.Path(archive_path))
+                else:
+                    consolidated_files.setdefault(log_group_name, []).append(pathlib.Path(experiment_folder_path))
+            elif log_group_name == c.LOGS.FRAME_DATA:
+                # Games that were scored already are single game archives, the rest is still the engine's JSON
+                consolidated_file_name = consolidated_file_name.with_suffix('.npz')
+                archived_games: list[fa.ArchivedGame] = []
+                for experiment_file in experiment_files:
+                    if experiment_file.name == consolidated_file_name.name:
+                        continue
+
+                    if experiment_file.suffix == '.npz':
+                        archived_games.extend(fa.read_frame_archive(experiment_file))
+                    else:
+                        archived_games.append(
+                            fp.read_frame_data_file(
+                                experiment_file,
+                                get_number_from_file_name(experiment_file.name, 'instance'),
+                                get_number_from_file_name(experiment_file.name, 'round'),
+                                field_names=c.FRAME_DATA_FIELDS,
+                                # The frame window isn't known here, so without a set stride every frame is kept
+                                frame_stride=c.FRAME_DATA_STRIDE or 1,
+                            )
+                        )
+
+                    experiment_file.unlink(missing_ok=True)
+
+                fa.write_frame_archive(consolidated_file_name, archived_games)
+                consolidated_files.setdefault(log_group_name, []).append(consolidated_file_name)
             else:
                 """
 					we will handle the points and the frame data differently.
 				"""
                 with consolidated_file_name.open(mode='w') as consolidated_file:
-                    if log_group_name == c.LOGS.FRAME_DATA:
-                        consolidated_file.write('[')
 
-                    for experiment_file_index, experiment_file in enumerate(experiment_files):
+                    for experiment_file in experiment_files:
                         if experiment_file.name == consolidated_file_name.name:
                             continue
 
-                        if log_group_name == c.LOGS.FRAME_DATA:
-                            consolidated_file.write(f'{{"{experiment_file.name}":')
-                        elif log_group_name != c.LOGS.POINT:
+                        if log_group_name != c.LOGS.POINT:
                             consolidated_file.write(f'{experiment_file}\n')
 
                         with experiment_file.open(mode='r') as src_file:
                             if log_group_name == c.LOGS.POINT:
-                                instance_number: int = get_number_from_file_name(experiment_file.name, 'instance')
-                                round_number: int = get_number_from_file_name(experiment_file.name, 'round')
-                                match_result: list[str] = src_file.readline().split(',')
-                                # Remove the round count from the engine
-                                match_result.pop(0)
-                                match_result[-1] = match_result[-1].replace('\n', '')
+                                instance_number, round_number, match_result = parse_point_file(experiment_file.name, src_file.readline())
                                 winner: int = (match_result[0] > match_result[1]) - (match_result[1] > match_result[0])
                                 consolidated_file.write(f'{instance_number},{round_number},{",".join(match_result)},{winner}')
                             else:
                                 shutil.copyfileobj(src_file, consolidated_file)
 
-                        if log_group_name == c.LOGS.FRAME_DATA:
-                            if experiment_file_index == len(experiment_files) - 1:
-                                consolidated_file.write('}\n')
-                            else:
-                                consolidated_file.write('},\n')
-                        else:
-                            consolidated_file.write('\n')
+                        consolidated_file.write('\n')
 
                         experiment_file.unlink(missing_ok=True)
 
-                    if log_group_name == c.LOGS.FRAME_DATA:
-                        consolidated_file.write(']')
+                consolidated_files.setdefault(log_group_name, []).append(consolidated_file_name)
+
+    return consolidated_files
+
+
+def parse_point_file(file_name: str, line: str) -> tuple[int, int, list[str]]:
+    instance_number: int = get_number_from_file_name(file_name, 'instance')
+    round_number: int = get_number_from_file_name(file_name, 'round')
+    match_result: list[str] = line.split(',')
+    # Remove the round count from the engine
+    match_result.pop(0)
+    match_result[-1] = match_result[-1].replace('\n', '')
+
+    return instance_number, round_number, match_result
 
 
 def kill_process(process: asyncio.subprocess.Process) -> None:
     if process.returncode is None:
         print(f'Forcefully killing process tree for PID {process.pid}...')
-
-        # Windows
-        if os.name == 'nt':
-            subprocess.run(
-                ['taskkill', '/F', '/T', '/PID', str(process.pid)],
-                capture_output=True,
-                # check=True,
-                check=False,
-            )
-        # Linux/Mac
-        else:
-            process.kill()
+        er.kill_process_group(process.pid)
 
 
-async def close_files(log_files: list[aiofiles.threadpool.text.AsyncTextIOWrapper]) -> None:
+async def close_files(log_files: list[EngineLogSink]) -> None:
     for file in log_files:
         await file.close()
 
@@ -373,70 +562,136 @@ def kill_processes(
         consolidate_data(experiment_name)
 
 
+ENGINE_PORT_PATTERN: re.Pattern = re.compile(rb'<PORT>:(\d+)')
+ENGINE_READY_MARKER: bytes = b'Waiting to launch a game'
+ENGINE_ERROR_MARKERS: tuple[bytes, ...] = (b'Exception', b'Error', b'SEVERE')
+
+
 async def process_simulator_logs(
     subprocess: list[asyncio.subprocess.Process],
-    log_file: aiofiles.threadpool.text.AsyncTextIOWrapper,
+    log_sink: EngineLogSink,
     process_id: int,
-    ready_event: asyncio.Event,
+    ready_future: asyncio.Future[int],
 ) -> None:
-    while True:
-        line_bytes = await subprocess.stdout.readline()
-        if not line_bytes:
-            break
+    # The port and the readiness come straight off the stream, and are handed over through the future
+    port: int | None = None
 
-        line: str = line_bytes.decode().strip()
-        await log_file.write(line + '\n')
+    try:
+        while True:
+            line_bytes = await subprocess.stdout.readline()
+            if not line_bytes:
+                break
+
+            # Markers are matched on the raw bytes, we only decode a line when we have to print it
+            is_error: bool = any(marker in line_bytes for marker in ENGINE_ERROR_MARKERS)
+            await log_sink.write(line_bytes, is_error=is_error)
+
+            if port is None:
+                port_match = ENGINE_PORT_PATTERN.search(line_bytes)
+                if port_match:
+                    port = int(port_match.group(1))
+
+            if ENGINE_READY_MARKER in line_bytes and not ready_future.done():
+                await log_sink.flush()
+                if port is None:
+                    ready_future.set_exception(RuntimeError(f'Engine PID {process_id} is ready, but never reported its port'))
+                else:
+                    ready_future.set_result(port)
+
+            if is_error:
+                print(f'!!! CRITICAL ERROR ON PROCESS {process_id} !!!\n{line_bytes.decode(errors="replace").strip()}')
+                kill_process(subprocess)
+                break
+    finally:
+        if not ready_future.done():
+            ready_future.set_exception(RuntimeError(f'Engine PID {process_id} exited before it was ready'))
+
+
+def register_match_agents(
+    gateway: Gateway,
+    character_duo: np.ndarray,
+    agent_duo: np.ndarray,
+    motions: list[MotionEditor],
+    deterministic: bool = False,
+    seed: int | None = None,
+) -> tuple[str | None, str | None]:
+    agent_names: list[str | None] = [None, None]
 
-        if 'Waiting to launch a game' in line:
-            await log_file.flush()
-            ready_event.set()
+    for player_index in range(2):
+        match agent_duo[player_index]:
+            case c.AgentNames.KAT_KICK_AI:
+                agent = KatKickAi(
+                    use_kick=True,
+                    interval=(0.5 if not deterministic else 0),
+                    character_name=character_duo[player_index],
+                    motion=motions[c.CHARACTER_ORDER[character_duo[player_index]]],
+                    deterministic=deterministic,
+                    seed=seed,
+                )
+                gateway.register_ai(agent.name(), agent)
+                agent_names[player_index] = agent.name()
+            case c.AgentNames.CONSISTENT_MCTS_AGENT:
+                agent_names[player_index] = c.AgentNames.CONSISTENT_MCTS_AGENT
 
-        if any(err in line for err in ['Exception', 'Error', 'SEVERE']):
-            print(f'!!! CRITICAL ERROR ON PROCESS {process_id} !!!\n{line}')
-            await log_file.flush()
-            kill_process(subprocess)
-            break
+    return agent_names[0], agent_names[1]
 
 
-async def monitor_matches(
+def print_match_status(
     simulators: list[asyncio.subprocess.Process],
     matches: list[asyncio.Task],
 ) -> None:
-    last_heartbeat: float = time.time() + c.POLL_INTERVAL_SEC
+    print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    line: str = ''
+    for simulator, match in zip(simulators, matches, strict=True):
+        is_active: bool = simulator.returncode is None and not match.done()
+        line += f'PID: {simulator.pid} - {"ACTIVE" if is_active else "DEAD  "}'
+    print(line)
+    for match in matches:
+        print(f'Match {"playing" if not match.done() else "finished"}')
+        print(match._state)
+
+
+async def report_heartbeat(report_status: Callable[[], None], interval_sec: float) -> None:
     while True:
-        active_simulators: np.ndarray = np.full(
-            shape=len(simulators),
-            fill_value=False,
-            dtype=bool,
-        )
+        await asyncio.sleep(interval_sec)
+        report_status()
+
 
-        for index, (simulator, match) in enumerate(zip(simulators, matches, strict=True)):
-            active_simulators[index] = simulator.returncode is None and not match.done()
-
-        if not np.any(active_simulators):
-            print('Simulation Completed Successfully (Maybe)')
-            break
-
-        if c.POLL_INTERVAL_SEC != 0 and time.time() - last_heartbeat >= c.POLL_INTERVAL_SEC:
-            last_heartbeat: float = time.time()
-            print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            line: str = ''
-            for index, is_active in enumerate(active_simulators):
-                line += f'PID: {simulators[index].pid} - {"ACTIVE" if is_active else "DEAD  "}'
-            print(line)
-            for match in matches:
-                print(f'Match {"playing" if not match.done() else "finished"}')
-                print(match._state)
-            # print(f"\033[{len(active_simulators) + 2}F", end="", flush=True)
-            # print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "\n")
-            # line = ""
-            # for index, is_active in enumerate(active_simulators):
-            #     line += f"Port: {gateways[index].port} - {"ACTIVE" if is_active else "DEAD  "}\n"
-            # print(line, end="")
-            # print(f"\033[{len(active_simulators) + 2}F", end="", flush=True)
-
-        await asyncio.sleep(c.POLL_INTERVAL_SEC)
+def start_heartbeat(report_status: Callable[[], None]) -> asyncio.Task | None:
+    # Heartbeats are only for interactive use, batch runs leave the poll interval at 0
+    if c.POLL_INTERVAL_SEC <= 0:
+        return None
+
+    return asyncio.create_task(report_heartbeat(report_status, c.POLL_INTERVAL_SEC))
 
+
+async def monitor_matches(
+    simulators: list[asyncio.subprocess.Process],
+    matches: list[asyncio.Task],
+) -> None:
+    heartbeat: asyncio.Task | None = start_heartbeat(lambda: print_match_status(simulators, matches))
+    process_exits: list[asyncio.Task] = [asyncio.create_task(simulator.wait()) for simulator in simulators]
+
+    try:
+        # An engine is done once its match finishes or its process exits, whichever comes first
+        active_engines: set[int] = set(range(len(simulators)))
+        while len(active_engines) != 0:
+            await asyncio.wait(
+                [matches[index] for index in active_engines] + [process_exits[index] for index in active_engines],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            active_engines = {
+                index  #
+                for index in active_engines
+                if not matches[index].done() and not process_exits[index].done()
+            }
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        for process_exit in process_exits:
+            process_exit.cancel()
+
+    print('Simulation Completed Successfully (Maybe)')
     print('All executions are closed')
     for simulator in simulators:
         print(f'PID: {simulator.pid} - {simulator.returncode}')
@@ -446,7 +701,7 @@ async def stop_orchestration(
     simulators: list[asyncio.subprocess.Process],
     experiment_name: str,
     task_containers: list[asyncio.Task],
-    log_files: list[aiofiles.threadpool.text.AsyncTextIOWrapper],
+    log_files: list[EngineLogSink],
 ) -> None:
     kill_processes(simulators, experiment_name)
     await asyncio.gather(*task_containers, return_exceptions=True)
@@ -458,8 +713,8 @@ async def orchestrate_matches(
     no_engines: int,
     task_containers: list[asyncio.Task],
     simulators: list[asyncio.subprocess.Process],
-    simulator_ready_events: list[asyncio.Event],
-    log_files: list[aiofiles.threadpool.text.AsyncTextIOWrapper],
+    simulator_ready_futures: list[asyncio.Future[int]],
+    log_files: list[EngineLogSink],
     character_names: np.ndarray,
     motions: list[MotionEditor],
     agent_names: np.ndarray,
@@ -468,69 +723,45 @@ async def orchestrate_matches(
 ) -> None:
     matches: list[asyncio.Task] = []
 
+    ports: list[int] = []
     try:
         print('Waiting for all engines to be ready')
-        await asyncio.wait_for(
-            asyncio.gather(*(event.wait() for event in simulator_ready_events)),
-            timeout=30.0,
+        ports = await asyncio.wait_for(
+            asyncio.gather(*simulator_ready_futures),
+            timeout=c.ENGINE_READY_TIMEOUT_SEC,
         )
         print('All engines are ready')
-    except asyncio.TimeoutError:
-        print('One or more engines failed to start in time!')
+    except (asyncio.TimeoutError, RuntimeError) as error:
+        not_ready_pids: list[int] = [
+            simulator.pid  #
+            for simulator, ready_future in zip(simulators, simulator_ready_futures, strict=True)
+            if not ready_future.done() or ready_future.cancelled() or ready_future.exception() is not None
+        ]
+        print(f'Engines failed to start in time! PIDs: {not_ready_pids}')
         await stop_orchestration(
             simulators,
             experiment_name,
             task_containers,
             log_files,
         )
+        raise RuntimeError(f'Engines {not_ready_pids} failed to start in time, ABORT ALL') from error
 
     for index in range(no_engines):
-        port: int | None = f.get_port_number_from_engine_logs(experiment_name, simulators[index].pid)
+        port: int = ports[index]
         print(f'PID: {simulators[index].pid}, PORT: {port}')
 
-        if port is None:
-            raise RuntimeError('FAILED TO GET PORT NUMBER FROM FILE, ABORT ALL')
-
         gateway = Gateway(port=port)
 
-        agent1 = None
-        agent2 = None
-        agent_1_name = None
-        agent_2_name = None
-
         character_duo = character_names[index % 3, :]
         agent_duo = agent_names[index % 3, :]
 
-        agent_1_motion = motions[c.CHARACTER_ORDER[character_duo[0]]]
-        agent_2_motion = motions[c.CHARACTER_ORDER[character_duo[1]]]
-
-        match agent_duo[0]:
-            case c.AgentNames.KAT_KICK_AI:
-                agent1 = KatKickAi(
-                    use_kick=True,
-                    interval=(0.5 if not deterministic else 0),
-                    character_name=character_duo[0],
-                    motion=agent_1_motion,
-                    deterministic=deterministic,
-                )
-                gateway.register_ai(agent1.name(), agent1)
-                agent_1_name = agent1.name()
-            case c.AgentNames.CONSISTENT_MCTS_AGENT:
-                agent_1_name = c.AgentNames.CONSISTENT_MCTS_AGENT
-
-        match agent_duo[1]:
-            case c.AgentNames.KAT_KICK_AI:
-                agent2 = KatKickAi(
-                    use_kick=True,
-                    interval=(0.5 if not deterministic else 0),
-                    character_name=character_duo[1],
-                    motion=agent_2_motion,
-                    deterministic=deterministic,
-                )
-                gateway.register_ai(agent2.name(), agent2)
-                agent_2_name = agent2.name()
-            case c.AgentNames.CONSISTENT_MCTS_AGENT:
-                agent_2_name = c.AgentNames.CONSISTENT_MCTS_AGENT
+        agent_1_name, agent_2_name = register_match_agents(
+            gateway,
+            character_duo,
+            agent_duo,
+            motions,
+            deterministic=deterministic,
+        )
 
         game_name = f'{experiment_name}-instance-{index}-{agent_1_name}-vs-{agent_2_name}'
 
@@ -589,8 +820,8 @@ async def start_simulators(
         is_extra_commands_empty = True
 
     simulators: list[asyncio.subprocess.Process] = []
-    log_files: list[aiofiles.threadpool.text.AsyncTextIOWrapper] = []
-    simulator_ready_events: list[asyncio.Event] = [asyncio.Event() for _ in range(no_engines)]
+    log_files: list[EngineLogSink] = []
+    simulator_ready_futures: list[asyncio.Future[int]] = [asyncio.get_running_loop().create_future() for _ in range(no_engines)]
 
     task_containers: list[asyncio.Task] = []
 
@@ -604,14 +835,14 @@ async def start_simulators(
             ),
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
+            start_new_session=os.name != 'nt',
         )
         simulators.append(proc)
 
         log_files.append(
-            await aiofiles.open(
+            await EngineLogSink.open(
                 # f'log/engines/{experiment_name}-instance-{gateway.port}-{c.GAME_TIME}.log',
                 f'log/engines/{experiment_name}-pid-{proc.pid}-{c.GAME_TIME}.log',
-                'w',
             )
         )
 
@@ -621,7 +852,7 @@ async def start_simulators(
                     proc,
                     log_files[index],
                     proc.pid,
-                    simulator_ready_events[index],
+                    simulator_ready_futures[index],
                 )
             )
         )
@@ -632,7 +863,7 @@ async def start_simulators(
         no_engines,
         task_containers,
         simulators,
-        simulator_ready_events,
+        simulator_ready_futures,
         log_files,
         characters,
         motions,
@@ -722,25 +953,6 @@ def transform_win_rate(win_rate: float, sigma: float = 0.20) -> np.ndarray:
     return math.exp(-(pow(0.5 - win_rate, 2)) / (2 * pow(sigma, 2)))
 
 
-def get_port_number_from_engine_logs(experiment_name: str, pid: int) -> int | None:
-    try:
-        engine_logs_path = pathlib.Path(os.path.join('log', 'engines', f'{experiment_name}-pid-{pid}-{c.GAME_TIME}.log'))
-        with open(engine_logs_path) as file:
-            content: str = ''.join(list(islice(file, 10)))
-            pattern: re.Pattern = re.compile(r'<PORT>:(\d+)')
-
-            match = pattern.search(content)
-
-            if match:
-                return int(match.group(1))
-    except FileNotFoundError:
-        print(f'FILE NOT FOUND: {engine_logs_path}')
-    except Exception as e:
-        print(f'An error occured when trying to get port from {engine_logs_path}\n{e}')
-
-    return None
-
-
 def numpy_2d_to_tuple(numpy_array: np.ndarray) -> tuple:
     return tuple(map(tuple, numpy_array))
 
@@ -22,6 +22,7 @@
 # print('t', t)
 
 # Experiment to determine the point at which running more engines is bad for the system and should rather run more rounds
+import os
 import pathlib
 import time
 
@@ -38,8 +39,12 @@ from pymoo.termination import get_termination
 from pymoo.util.ref_dirs import get_reference_directions
 
 import constants as c
+import EngineClasses.EnginePool as ep
+import EngineClasses.Staging as st
 import functions as f
-from GeneticAlgorithm.FightingIceProblem import FightingIceProblem
+import GeneticAlgorithm.genetic_functions as gf
+from GeneticAlgorithm.AsyncMOEAD import run_async_moead
+from GeneticAlgorithm.FightingIceProblem import EXCITEMENT_FRAME_WINDOW, FightingIceProblem
 
 # async def run_games(no_engines: int):
 #     common_commands = [
@@ -143,6 +148,10 @@ if __name__ == '__main__':
     f.set_random_seeds(c.GLOBAL_SEED)
     f.arg_parser()
 
+    # The async driver plays its offspring straight at full fidelity, and never hands pymoo the objectives of a whole generation
+    if c.USE_ASYNC_EVOLUTION and c.USE_FIDELITY_LADDER:
+        raise ValueError('The fidelity ladder (-ufl) only works with the generational driver, it can not be combined with -uae')
+
     if c.SCHEDULER_FILE is not None:
         if not pathlib.Path(c.SCHEDULER_FILE).exists():
             raise FileNotFoundError(f'Missing file: {c.SCHEDULER_FILE}.\nCannot start job at all')
@@ -166,6 +175,14 @@ if __name__ == '__main__':
         client = Client(cluster)
 
     print(f'Dask Dashboard available at: {client.dashboard_link}')
+    client.run(st.configure, c.SCRATCH_PATH, c.BASE_PATH, c.STAGING_SYNC_MODE, c.MEASURE_STAGING)
+    # A stride the scorer can't use would fail every game on the workers, so it is checked once up front
+    gf.get_frame_data_stride(EXCITEMENT_FRAME_WINDOW)
+    client.run(f.set_worker_constants, f.get_worker_constants())
+    client.register_plugin(ep.EngineReaperPlugin())
+
+    if c.MEASURE_STAGING and st.is_staging():
+        st.benchmark_staging()
     # experiment_name: str = 'cb_ex_uq_p10_n5_e4_g8_energy'
     experiment_name: str = 'fitness_over_time_test'
 
@@ -186,36 +203,49 @@ if __name__ == '__main__':
                 save_fitness=True,
             )
 
-            res = minimize(
-                problem=problem,
-                algorithm=MOEAD(
-                    # N = n_partitions + 1 (for n_obj == 2)
-                    # Must be greater than n_neighbors
-                    ref_dirs=get_reference_directions(
-                        c.pymoo.MOEAD.SpreadType.DAS_DENNIS,
-                        # n_dim=3,
-                        # n_partitions=10,
-                        n_dim=2,
-                        n_partitions=49,
-                    ),
-                    # Magic number is 20
-                    n_neighbors=15,
-                    decomposition=PBI(theta=10),
-                    sampling=IntegerRandomSampling(seed=c.GLOBAL_SEED),
-                    crossover=SBX(prob=1.0, eta=20, vtype=int),
-                    mutation=PolynomialMutation(prob=1.0, eta=20, vtype=int),
+            algorithm = MOEAD(
+                # N = n_partitions + 1 (for n_obj == 2)
+                # Must be greater than n_neighbors
+                ref_dirs=get_reference_directions(
+                    c.pymoo.MOEAD.SpreadType.DAS_DENNIS,
+                    # n_dim=3,
+                    # n_partitions=10,
+                    n_dim=2,
+                    n_partitions=49,
                 ),
-                termination=get_termination(
-                    c.pymoo.TERMINATION.DEFAULT_MOO_TERMINATION,
-                    n_max_gen=20,
-                    ftol=1e-6,
-                    period=6,
-                ),
-                copy_algorithm=previous_result is None,
-                seed=c.GLOBAL_SEED,
-                save_history=True,
-                verbose=True,
+                # Magic number is 20
+                n_neighbors=15,
+                decomposition=PBI(theta=10),
+                sampling=IntegerRandomSampling(seed=c.GLOBAL_SEED),
+                crossover=SBX(prob=1.0, eta=20, vtype=int),
+                mutation=PolynomialMutation(prob=1.0, eta=20, vtype=int),
+            )
+            termination = get_termination(
+                c.pymoo.TERMINATION.DEFAULT_MOO_TERMINATION,
+                n_max_gen=20,
+                ftol=1e-6,
+                period=6,
             )
+
+            if c.USE_ASYNC_EVOLUTION:
+                algorithm.setup(
+                    problem,
+                    termination=termination,
+                    seed=c.GLOBAL_SEED,
+                    save_history=True,
+                    verbose=True,
+                )
+                res = run_async_moead(algorithm, problem)
+            else:
+                res = minimize(
+                    problem=problem,
+                    algorithm=algorithm,
+                    termination=termination,
+                    copy_algorithm=previous_result is None,
+                    seed=c.GLOBAL_SEED,
+                    save_history=True,
+                    verbose=True,
+                )
         else:
             print('Continuing experiment')
             problem: FightingIceProblem = previous_result.problem
@@ -238,12 +268,15 @@ if __name__ == '__main__':
 
             res = algorithm.result()
 
+        # Everything staged on the workers has to be on shared storage before we consolidate it
+        client.run(st.flush_sync_back)
         f.consolidate_data(
             problem.experiment_name,
             exclude_list=[
                 c.LOGS.POINT,
                 c.LOGS.FRAME_DATA,
             ],
+            log_root=os.path.join(st.get_shared_root(), 'log'),
         )
 
         end_time = time.perf_counter()
@@ -11,6 +11,7 @@ import pathlib
 import pandas
 
 import constants as c
+import EngineClasses.Staging as st
 import functions as f
 from itertools import combinations
 
@@ -179,6 +180,7 @@ setting = fp.IndividualSettings(
 fitness: np.ndarray = fp.evaluate_individual(gene, setting)
 print(fitness)
 
+st.flush_sync_back()
 f.consolidate_data(
     experiment_name,
     exclude_list=[
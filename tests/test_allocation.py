@@ -0,0 +1,57 @@
+import GeneticAlgorithm.Allocation as al
+from EngineClasses.MatchScheduler import MatchItem
+from GeneticAlgorithm.GameResult import GameResult
+
+"""
+    * Adaptive allocation hands out the first min_games evenly, never reuses a game number, and sends the next game where the error drops most.
+"""
+
+PLAYER_HP: int = 400
+MIN_GAMES: int = 2
+
+
+def make_games(pairing: int, wins: int, losses: int, first_game: int = 0) -> list[GameResult]:
+    outcomes: list[bool] = [True] * wins + [False] * losses
+    return [
+        GameResult(pairing, first_game + game, PLAYER_HP if won else 0, 0 if won else PLAYER_HP)  #
+        for game, won in enumerate(outcomes)
+    ]
+
+
+def test_min_games_go_to_the_least_played_pairing() -> None:
+    game_results: list[GameResult] = make_games(0, wins=1, losses=1)
+    # One game of pairing 1 is still running
+    allocated_items: list[MatchItem] = [MatchItem(0, 0), MatchItem(0, 1), MatchItem(1, 0)]
+
+    for _ in range(3):
+        al.assign_match_item(MatchItem(0, 0), game_results, allocated_items, MIN_GAMES)
+
+    # Ties go to the first pairing
+    assert [(item.pairing, item.game) for item in allocated_items[-3:]] == [(2, 0), (1, 1), (2, 1)]
+
+
+def test_game_numbers_are_never_reused() -> None:
+    # From the cache, with a gap in the numbers of pairing 0
+    game_results: list[GameResult] = [*make_games(0, wins=1, losses=1), *make_games(0, wins=1, losses=0, first_game=5), *make_games(1, 2, 2)]
+    allocated_items: list[MatchItem] = [MatchItem(2, 0), MatchItem(2, 1)]
+
+    for _ in range(12):
+        al.assign_match_item(MatchItem(0, 0), game_results, allocated_items, MIN_GAMES)
+
+    used: list[tuple[int, int]] = [
+        *[(game_result.pairing, game_result.game) for game_result in game_results],
+        *[(item.pairing, item.game) for item in allocated_items],
+    ]
+    assert len(set(used)) == len(used)
+
+
+def test_near_even_pairing_gets_the_next_game() -> None:
+    # As many games as the lopsided pairing, and a pairing that is settled already
+    game_results: list[GameResult] = [*make_games(0, wins=2, losses=2), *make_games(1, wins=4, losses=0), *make_games(2, wins=10, losses=10)]
+
+    error_reductions = al.calculate_error_reductions(game_results, running_pairings=[])
+    item = MatchItem(0, 0)
+    al.assign_match_item(item, game_results, [], MIN_GAMES)
+
+    assert error_reductions[0] > error_reductions[1] > error_reductions[2]
+    assert (item.pairing, item.game) == (0, 4)
@@ -0,0 +1,81 @@
+from collections.abc import Iterator
+from typing import Any, Generic, TypeVar
+
+import numpy as np
+import pytest
+from pymoo.algorithms.moo.moead import MOEAD
+from pymoo.core.problem import Problem
+from pymoo.termination import get_termination
+from pymoo.util.ref_dirs import get_reference_directions
+
+import GeneticAlgorithm.AsyncMOEAD as am
+
+"""
+    * Steady state MOEAD on a toy problem, with an evaluation queue that answers on the spot and hands the newest offspring back first.
+    * Leans on the pymoo privates _replace, _post_advance and _set_optimum, this is what notices when an upgrade moves them.
+"""
+
+Tag = TypeVar('Tag')
+GENERATIONS: int = 4
+MAX_IN_FLIGHT: int = 3
+
+
+# Two objectives pulling x in opposite directions, the front is everything between 0 and 1
+class ToyProblem(Problem):
+    def __init__(self) -> None:
+        super().__init__(n_var=2, n_obj=2, xl=-1.0, xu=2.0)
+        self.client = None
+        self.engine_multiplier = 1
+
+    def get_individual_settings(self) -> None:
+        return None
+
+    def _evaluate(self, X: np.ndarray, out: dict[str, np.ndarray], *_args: Any, **_kwargs: Any) -> None:
+        out['F'] = evaluate_toy(X)
+
+
+def evaluate_toy(X: np.ndarray) -> np.ndarray:
+    return np.column_stack([(X**2).sum(axis=-1), ((X - 1) ** 2).sum(axis=-1)])
+
+
+class StubEvaluationQueue(Generic[Tag]):
+    submitted: int = 0
+
+    def __init__(self, _client: None, _settings: None, use_game_queue: bool) -> None:
+        self.use_game_queue: bool = use_game_queue
+        self.running: list[tuple[Tag, np.ndarray]] = []
+
+    def submit(self, x: np.ndarray, tag: Tag) -> None:
+        StubEvaluationQueue.submitted += 1
+        self.running.append((tag, evaluate_toy(x[np.newaxis])[0]))
+        assert len(self.running) <= MAX_IN_FLIGHT
+
+    def __iter__(self) -> Iterator[tuple[Tag, np.ndarray]]:
+        while len(self.running) != 0:
+            yield self.running.pop()
+
+
+@pytest.fixture(autouse=True)
+def stub_evaluation_queue(monkeypatch: pytest.MonkeyPatch) -> None:
+    StubEvaluationQueue.submitted = 0
+    monkeypatch.setattr(am, 'EvaluationQueue', StubEvaluationQueue)
+
+
+def test_generations_advance_and_evaluations_are_counted() -> None:
+    problem = ToyProblem()
+    algorithm = MOEAD(ref_dirs=get_reference_directions('uniform', 2, n_partitions=11), n_neighbors=4)
+    algorithm.setup(problem, termination=get_termination('n_gen', GENERATIONS), seed=1)
+
+    res = am.run_async_moead(algorithm, problem, max_in_flight=MAX_IN_FLIGHT)
+
+    pop_size: int = algorithm.pop_size
+    # The initial population is one generation, every pop_size landed offspring another
+    assert algorithm.n_gen - 1 == GENERATIONS
+    # What is still in flight when the termination hits lands as well
+    assert StubEvaluationQueue.submitted == (GENERATIONS - 1) * pop_size + MAX_IN_FLIGHT - 1
+    assert algorithm.evaluator.n_eval == pop_size + StubEvaluationQueue.submitted
+
+    # Every member's objectives belong to its own gene, the replacement never mixes them up
+    np.testing.assert_allclose(res.pop.get('F'), evaluate_toy(res.pop.get('X')))
+    assert len(res.opt) != 0
+    assert not res.pop.get('surrogate').any()
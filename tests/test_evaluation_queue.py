@@ -0,0 +1,172 @@
+import pathlib
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+
+import GeneticAlgorithm.FightingIceProblem as fip
+import GeneticAlgorithm.genetic_functions as gf
+import GeneticAlgorithm.Racing as ra
+from GeneticAlgorithm.GameResult import GameResult
+from MotionClasses.MotionHeaders import MotionHeaders as headers
+from MotionClasses.MotionNames import MotionNames as motion_names
+
+"""
+    * The evaluation queue against a client that answers every task on the spot, and futures that complete newest first,
+      so the games of different individuals come back interleaved.
+"""
+
+PLAYER_HP: int = 400
+MOTION_ADJUSTMENTS: list[tuple[str, str]] = [
+    (motion_names.STAND_A, headers.ATTACK_HIT_ADD_ENERGY),
+    (motion_names.STAND_B, headers.ATTACK_GIVE_ENERGY),
+]
+
+
+# Who wins flips with the game and the first gene, so every individual gets its own objectives
+def play_game(x: np.ndarray, pairing: int, game: int) -> GameResult:
+    zen_side_wins: bool = (game + int(x[0]) + pairing) % 3 != 0
+    return GameResult(
+        pairing,
+        game,
+        hp_one=PLAYER_HP if zen_side_wins else 0,
+        hp_two=0 if zen_side_wins else PLAYER_HP,
+        excitement_cost=0.1 * (pairing + 1) + 0.01 * game,
+    )
+
+
+class FakeFuture:
+    def __init__(self, key: str, result: GameResult | np.ndarray) -> None:
+        self.key: str = key
+        self.fake_result: GameResult | np.ndarray = result
+
+    def result(self) -> GameResult | np.ndarray:
+        return self.fake_result
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.submitted: list[tuple[str, tuple]] = []
+
+    def submit(self, function: Callable, *args: object, resources: dict[str, int], pure: bool) -> FakeFuture:
+        assert not pure
+        self.submitted.append((function.__name__, args))
+        key: str = f'{function.__name__}-{len(self.submitted)}'
+
+        if function is fip.evaluate_individual:
+            x, settings = args
+            assert resources == {'cores': settings.engine_multiplier * 3}
+            return FakeFuture(key, evaluate_played(x, settings, list(range(settings.no_matches * settings.engine_multiplier))))
+
+        x, _, _, pairing, game = args
+        assert resources == {'cores': 1}
+        return FakeFuture(key, play_game(x, pairing, game))
+
+
+class FakeAsCompleted:
+    def __init__(self) -> None:
+        self.futures: list[FakeFuture] = []
+        self.max_running: int = 0
+
+    def add(self, future: FakeFuture) -> None:
+        self.futures.append(future)
+        self.max_running = max(self.max_running, len(self.futures))
+
+    def __next__(self) -> FakeFuture:
+        return self.futures.pop()
+
+
+def evaluate_played(x: np.ndarray, settings: fip.IndividualSettings, games: list[int]) -> np.ndarray:
+    evaluation = fip.IndividualEvaluation(x, settings)
+    evaluation.game_results = [play_game(x, pairing, game) for game in games for pairing in range(3)]
+    return evaluation.get_objectives()
+
+
+def make_settings(no_matches: int = 2, **kwargs: object) -> fip.IndividualSettings:
+    return fip.IndividualSettings(
+        motion_coordinates=gf.get_motion_coordinates(MOTION_ADJUSTMENTS),
+        mapped_numerical_motion_coordinates=gf.map_numerical_motion_coordinates(MOTION_ADJUSTMENTS),
+        no_matches=no_matches,
+        experiment_name='queue_test',
+        engine_multiplier=1,
+        game_duration_sec=60,
+        visual=False,
+        motion_adjustments=MOTION_ADJUSTMENTS,
+        player_hp=PLAYER_HP,
+        **kwargs,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fake_as_completed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(fip, 'as_completed', FakeAsCompleted)
+
+
+def run_queue(
+    settings: fip.IndividualSettings, genes: dict[str, np.ndarray], use_game_queue: bool = True
+) -> tuple[dict[str, np.ndarray], FakeClient, fip.EvaluationQueue[str]]:
+    client = FakeClient()
+    evaluation_queue: fip.EvaluationQueue[str] = fip.EvaluationQueue(client, settings, use_game_queue=use_game_queue)
+    for tag, x in genes.items():
+        evaluation_queue.submit(x, tag=tag)
+
+    objectives: dict[str, np.ndarray] = {}
+    for tag, individual_objectives in evaluation_queue:
+        assert tag not in objectives
+        objectives[tag] = individual_objectives
+
+    return objectives, client, evaluation_queue
+
+
+@pytest.mark.parametrize('use_game_queue', [True, False])
+def test_owners_hand_every_individual_back(use_game_queue: bool) -> None:
+    settings = make_settings()
+    genes: dict[str, np.ndarray] = {'first': np.array([0, 1, 2, 3, 4, 5]), 'second': np.array([1, 1, 2, 3, 4, 5])}
+
+    objectives, client, evaluation_queue = run_queue(settings, genes, use_game_queue)
+
+    assert len(client.submitted) == (len(genes) * settings.no_matches * 3 if use_game_queue else len(genes))
+    assert len(evaluation_queue.owners) == 0
+    assert len(evaluation_queue.finished) == 0
+    assert not np.array_equal(objectives['first'], objectives['second'])
+    for tag, x in genes.items():
+        np.testing.assert_allclose(objectives[tag], evaluate_played(x, settings, list(range(settings.no_matches))))
+
+
+def test_cached_individual_is_not_played(tmp_path: pathlib.Path) -> None:
+    settings = make_settings(fitness_cache_path=str(tmp_path))
+    genes: dict[str, np.ndarray] = {'cached': np.array([2, 1, 2, 3, 4, 5])}
+
+    played_objectives, _, _ = run_queue(settings, genes)
+    cached_objectives, client, _ = run_queue(settings, genes)
+
+    assert len(client.submitted) == 0
+    np.testing.assert_array_equal(cached_objectives['cached'], played_objectives['cached'])
+
+
+def test_racing_resubmits_once_the_batch_is_in() -> None:
+    # Any interval is narrow enough, so the race is over once every pairing has min_games
+    racing_settings = ra.RacingSettings(batch_games=1, min_games=2, max_interval_width=1.0, balance_floor=0.0)
+    settings = make_settings(no_matches=6, racing_settings=racing_settings)
+    genes: dict[str, np.ndarray] = {'raced': np.array([0, 1, 2, 3, 4, 5])}
+
+    objectives, client, evaluation_queue = run_queue(settings, genes)
+
+    played: list[tuple[int, int]] = [(args[3], args[4]) for _, args in client.submitted]
+    assert played == [(pairing, game) for game in range(racing_settings.min_games) for pairing in range(3)]
+    # A batch at a time, the next one is only decided once the last one is in
+    assert evaluation_queue.futures.max_running == racing_settings.batch_games * 3
+    np.testing.assert_allclose(objectives['raced'], evaluate_played(genes['raced'], settings, list(range(racing_settings.min_games))))
+
+
+def test_adaptive_games_are_allocated_one_by_one() -> None:
+    settings = make_settings(no_matches=4, adaptive_allocation=True)
+    genes: dict[str, np.ndarray] = {'adaptive': np.array([0, 1, 2, 3, 4, 5])}
+
+    _, client, evaluation_queue = run_queue(settings, genes)
+
+    played: list[tuple[int, int]] = [(args[3], args[4]) for _, args in client.submitted]
+    assert len(played) == settings.no_matches * 3
+    assert len(set(played)) == len(played)
+    # Never more games running than the individual has engines
+    assert evaluation_queue.futures.max_running == settings.engine_multiplier * 3
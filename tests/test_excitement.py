@@ -0,0 +1,232 @@
+import math
+import pathlib
+
+import numpy as np
+import pytest
+
+import GeneticAlgorithm.Excitement as ex
+import GeneticAlgorithm.FrameArchive as fa
+import GeneticAlgorithm.genetic_functions as gf
+
+"""
+    * The per game loops the excitement kernel replaced, kept as they were, and the kernel checked against them bit for bit.
+    * Archives kept at a stride checked against the same games at the full rate.
+"""
+
+PLAYER_HP: int = 400
+GAME_DURATION_SEC: int = 60
+# The chance a player is hit on a frame
+HIT_CHANCE: float = 0.05
+
+
+def calculate_loop_win_probabilities(hit_points: np.ndarray, energy: np.ndarray, frame_window: int, player_hp: int) -> np.ndarray:
+    hit_points_list: list[list[int]] = hit_points.tolist()
+    energy_list: list[list[int]] = energy.tolist()
+    win_probabilities = np.zeros(dtype=np.float64, shape=(len(hit_points_list)))
+
+    for index, (p1_hp, p2_hp) in enumerate(hit_points_list):
+        p1_energy, p2_energy = energy_list[index]
+
+        if p1_hp <= 0 and p2_hp <= 0 or index == 0:
+            win_probabilities[index] = 0.5
+            continue
+        elif p1_hp <= 0:
+            win_probabilities[index] = 0
+            continue
+        elif p2_hp <= 0:
+            win_probabilities[index] = 1
+            continue
+
+        past_hit_points = hit_points_list[max(0, index - frame_window)]
+        p1_projected_hp = (p1_hp + (p1_energy * 0.5) - ((past_hit_points[0] - p1_hp) * 0.5)) / player_hp
+        p2_projected_hp = (p2_hp + (p2_energy * 0.5) - ((past_hit_points[1] - p2_hp) * 0.5)) / player_hp
+        win_probabilities[index] = p1_projected_hp / ((p1_projected_hp + p2_projected_hp) + 1e-6)
+
+    return win_probabilities
+
+
+def calculate_loop_match_costs(
+    win_probabilities_list: list[np.ndarray],
+    frame_window: int,
+    tanh_scale: float,
+    game_duration_sec: int,
+    epsilon: float = 1e-9,
+) -> np.ndarray:
+    invalid_range: float = 1e-2
+    total_costs = np.zeros(shape=len(win_probabilities_list), dtype=np.float64)
+
+    for match_index, win_probabilities in enumerate(win_probabilities_list):
+        total_frames = win_probabilities.shape[0]
+        if total_frames <= frame_window:
+            total_costs[match_index] = total_frames / (game_duration_sec * 60) * invalid_range
+            continue
+
+        time_step_size = frame_window / total_frames
+        total_cost = 0.0
+        for frame_index in range(frame_window, total_frames, frame_window):
+            # NumPy scalars, like the loop had them
+            sigma_t = (((win_probabilities[frame_index] - win_probabilities[frame_index - frame_window]) ** 2) / time_step_size) + epsilon
+            total_cost += (sigma_t - math.log(sigma_t) - 1) * time_step_size
+
+        normalization: float = (epsilon - math.log(epsilon) - 1) * ((total_frames - 1) // frame_window) * time_step_size
+        total_costs[match_index] = 1 - max(invalid_range, min(total_cost / normalization, 1))
+        if tanh_scale != -1:
+            total_costs[match_index] *= math.tanh(tanh_scale * (total_frames / (game_duration_sec * 60)))
+
+    return total_costs
+
+
+def make_game(rng: np.random.Generator, frame_count: int, ko_frame: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    damage: np.ndarray = rng.integers(1, 30, size=(frame_count, 2)) * (rng.random((frame_count, 2)) < HIT_CHANCE)
+    hit_points: np.ndarray = PLAYER_HP - np.cumsum(damage, axis=0)
+    hit_points[:1] = PLAYER_HP
+    if ko_frame is not None:
+        # Player 2 goes down and stays down, the engine keeps counting HP below 0
+        hit_points[ko_frame:, 1] = np.minimum(hit_points[ko_frame:, 1], 0) - np.arange(frame_count - ko_frame)
+
+    return hit_points.astype(np.int16), rng.integers(0, 300, size=(frame_count, 2)).astype(np.int16)
+
+
+def get_games(seed: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    rng: np.random.Generator = np.random.default_rng(seed)
+    return [
+        *[make_game(rng, int(frame_count)) for frame_count in rng.integers(0, 4000, size=8)],
+        make_game(rng, 1),
+        make_game(rng, 2),
+        make_game(rng, 0),
+        # KOs in the middle of a window, and on its edge
+        make_game(rng, 1000, ko_frame=437),
+        make_game(rng, 1000, ko_frame=600),
+        make_game(rng, 3600),
+    ]
+
+
+def assert_identical(actual: np.ndarray, expected: np.ndarray) -> None:
+    assert actual.dtype == expected.dtype
+    assert actual.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('frame_window', [1, 10, 60, 300])
+@pytest.mark.parametrize('tanh_scale', [-1, 3])
+def test_ragged_kernel_matches_loops(seed: int, frame_window: int, tanh_scale: float) -> None:
+    games: list[tuple[np.ndarray, np.ndarray]] = get_games(seed)
+    loop_win_probabilities: list[np.ndarray] = [
+        calculate_loop_win_probabilities(hit_points, energy, frame_window, PLAYER_HP)  #
+        for hit_points, energy in games
+    ]
+
+    hit_points, offsets = ex.get_ragged_columns([hit_points for hit_points, _ in games])
+    energy, _ = ex.get_ragged_columns([energy for _, energy in games])
+    win_probabilities: np.ndarray = ex.calculate_win_probabilities(hit_points, energy, offsets, PLAYER_HP, frame_window=frame_window)
+    for game_win_probabilities, loop_game_win_probabilities in zip(np.split(win_probabilities, offsets[1:-1]), loop_win_probabilities, strict=True):
+        assert_identical(game_win_probabilities, loop_game_win_probabilities)
+
+    assert_identical(
+        ex.calculate_match_costs(win_probabilities, offsets, GAME_DURATION_SEC, frame_window=frame_window, tanh_scale=tanh_scale),
+        calculate_loop_match_costs(loop_win_probabilities, frame_window, tanh_scale, GAME_DURATION_SEC),
+    )
+
+
+def test_padded_games_match_loops() -> None:
+    games: list[tuple[np.ndarray, np.ndarray]] = get_games(7)
+    frame_counts: np.ndarray = np.array([len(hit_points) for hit_points, _ in games])
+    padded_hit_points: np.ndarray = np.zeros((len(games), frame_counts.max(), 2), dtype=np.int16)
+    padded_energy: np.ndarray = np.zeros_like(padded_hit_points)
+    for game_index, (hit_points, energy) in enumerate(games):
+        padded_hit_points[game_index, : len(hit_points)] = hit_points
+        padded_energy[game_index, : len(energy)] = energy
+
+    hit_points, offsets = ex.get_ragged_from_padded(padded_hit_points, frame_counts)
+    energy, _ = ex.get_ragged_from_padded(padded_energy, frame_counts)
+    win_probabilities: np.ndarray = ex.calculate_win_probabilities(hit_points, energy, offsets, PLAYER_HP, frame_window=60)
+    for game_win_probabilities, (game_hit_points, game_energy) in zip(np.split(win_probabilities, offsets[1:-1]), games, strict=True):
+        assert_identical(game_win_probabilities, calculate_loop_win_probabilities(game_hit_points, game_energy, 60, PLAYER_HP))
+
+
+def test_entry_points_match_loops(tmp_path: pathlib.Path) -> None:
+    games: list[tuple[np.ndarray, np.ndarray]] = get_games(11)
+    loop_win_probabilities: list[np.ndarray] = [
+        calculate_loop_win_probabilities(hit_points, energy, 300, gf.c.PLAYER_HP)  #
+        for hit_points, energy in games
+    ]
+
+    for (hit_points, energy), loop_game_win_probabilities in zip(games, loop_win_probabilities, strict=True):
+        assert_identical(gf.calculate_game_win_probabilities(hit_points, energy, frame_window=300), loop_game_win_probabilities)
+
+    archive_path: pathlib.Path = fa.write_frame_archive(
+        tmp_path / 'games.npz',
+        [
+            fa.ArchivedGame(
+                f'game-{instance}', instance, -1, {'frame': np.arange(len(hit_points), dtype=np.int32), 'hitPoints': hit_points, 'energy': energy}
+            )
+            for instance, (hit_points, energy) in enumerate(games)
+        ],
+    )
+    for game_win_probabilities, loop_game_win_probabilities in zip(
+        gf.calculate_win_probabilities(archive_path, frame_window=300), loop_win_probabilities, strict=True
+    ):
+        assert_identical(game_win_probabilities, loop_game_win_probabilities)
+
+    loop_costs: np.ndarray = calculate_loop_match_costs(loop_win_probabilities, 300, 3, gf.c.GAME_DURATION_SEC)
+    assert gf.calculate_excitement(archive_path, tanh_scale=3, frame_window=300) == gf.aggregate_entropy_score(loop_costs)
+
+
+# A single window per game, so nothing of the cost of a window gets lost in a sum.
+# An ulp off in a log or a square shows up here, it does for about 1 in 20000 windows with np.log on arrays.
+def test_window_costs_match_loops() -> None:
+    rng: np.random.Generator = np.random.default_rng(3)
+    win_probabilities_list: list[np.ndarray] = list(rng.random((200_000, 2)))
+    win_probabilities, offsets = ex.get_ragged_columns(win_probabilities_list)
+
+    assert_identical(
+        ex.calculate_match_costs(win_probabilities, offsets, GAME_DURATION_SEC, frame_window=1),
+        calculate_loop_match_costs(win_probabilities_list, 1, -1, GAME_DURATION_SEC),
+    )
+
+
+def write_strided_archive(archive_path: pathlib.Path, games: list[tuple[np.ndarray, np.ndarray]], frame_stride: int) -> pathlib.Path:
+    return fa.write_frame_archive(
+        archive_path,
+        [
+            fa.ArchivedGame(
+                f'game-{instance}',
+                instance,
+                -1,
+                {
+                    'frame': np.arange(len(hit_points), dtype=np.int32)[::frame_stride],
+                    'hitPoints': hit_points[::frame_stride],
+                    'energy': energy[::frame_stride],
+                },
+                frame_stride=frame_stride,
+                game_length=len(hit_points),
+            )
+            for instance, (hit_points, energy) in enumerate(games)
+        ],
+    )
+
+
+@pytest.mark.parametrize('frame_stride', [2, 5, 60])
+def test_strided_archive_matches_full_rate(tmp_path: pathlib.Path, frame_stride: int) -> None:
+    games: list[tuple[np.ndarray, np.ndarray]] = get_games(13)
+    frame_window: int = 300
+    full_path: pathlib.Path = write_strided_archive(tmp_path / 'full.npz', games, frame_stride=1)
+    strided_path: pathlib.Path = write_strided_archive(tmp_path / 'strided.npz', games, frame_stride=frame_stride)
+
+    for strided_win_probabilities, full_win_probabilities in zip(
+        gf.calculate_win_probabilities(strided_path, frame_window=frame_window),
+        gf.calculate_win_probabilities(full_path, frame_window=frame_window),
+        strict=True,
+    ):
+        assert_identical(strided_win_probabilities, full_win_probabilities[::frame_stride])
+
+    assert gf.calculate_excitement(strided_path, tanh_scale=3, frame_window=frame_window) == gf.calculate_excitement(
+        full_path, tanh_scale=3, frame_window=frame_window
+    )
+
+
+def test_incompatible_stride_is_rejected(tmp_path: pathlib.Path) -> None:
+    strided_path: pathlib.Path = write_strided_archive(tmp_path / 'strided.npz', get_games(13), frame_stride=7)
+
+    with pytest.raises(ValueError, match='stride of 7'):
+        gf.calculate_excitement(strided_path, tanh_scale=3, frame_window=300)
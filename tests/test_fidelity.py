@@ -0,0 +1,65 @@
+import numpy as np
+
+import GeneticAlgorithm.Fidelity as fi
+
+"""
+    * The screening fidelity keeps the HP in step with the duration it actually got, and who gets promoted against the population's front.
+"""
+
+FULL_FIDELITY: fi.Fidelity = fi.Fidelity(fi.FULL_FIDELITY, no_matches=8, game_duration_sec=60, player_hp=400)
+
+
+def test_hp_scales_with_the_duration() -> None:
+    screening_fidelity: fi.Fidelity = fi.get_screening_fidelity(FULL_FIDELITY, match_scale=0.25, duration_scale=0.5, min_duration_sec=10)
+
+    assert screening_fidelity.name == fi.SCREENING_FIDELITY
+    assert screening_fidelity.no_matches == FULL_FIDELITY.no_matches // 4
+    assert screening_fidelity.game_duration_sec == FULL_FIDELITY.game_duration_sec // 2
+    assert screening_fidelity.player_hp == FULL_FIDELITY.player_hp // 2
+
+
+def test_hp_follows_the_minimum_duration() -> None:
+    min_duration_sec: int = 20
+    screening_fidelity: fi.Fidelity = fi.get_screening_fidelity(
+        FULL_FIDELITY,
+        match_scale=0.01,
+        duration_scale=0.1,
+        min_duration_sec=min_duration_sec,
+    )
+
+    # A sixth of the duration would have been too short, the HP is a third like the duration that was used
+    assert screening_fidelity.no_matches == 1
+    assert screening_fidelity.game_duration_sec == min_duration_sec
+    assert screening_fidelity.player_hp == FULL_FIDELITY.player_hp // 3
+
+
+def test_promotion_margin() -> None:
+    front_screening_F: np.ndarray = np.array([[-0.8, -0.5, -1.0]])
+    # Slightly worse than the front in every objective
+    screened_F: np.ndarray = np.array([[-0.75, -0.45, -0.95]])
+
+    assert not fi.select_for_promotion(screened_F, front_screening_F, margin=0.0)[0]
+    assert fi.select_for_promotion(screened_F, front_screening_F, margin=0.1)[0]
+
+
+def test_promotion_only_looks_at_the_front() -> None:
+    front_screening_F: np.ndarray = np.array(
+        [
+            [-0.9, -0.1, -1.0],
+            [-0.1, -0.9, -1.0],
+        ]
+    )
+    # The rest of the population, all dominated by the front
+    population_screening_F: np.ndarray = np.concatenate([front_screening_F, [[-0.05, -0.05, -0.5], [-0.8, -0.05, -0.9]]])
+    screened_F: np.ndarray = np.array(
+        [
+            [-0.5, -0.5, -1.0],
+            [-0.04, -0.04, -0.4],
+            [-0.8, -0.05, -1.0],
+        ]
+    )
+
+    promoted: np.ndarray = fi.select_for_promotion(screened_F, population_screening_F, margin=0.0)
+
+    np.testing.assert_array_equal(promoted, [True, False, False])
+    np.testing.assert_array_equal(promoted, fi.select_for_promotion(screened_F, front_screening_F, margin=0.0))
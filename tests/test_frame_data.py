@@ -0,0 +1,96 @@
+import json
+import pathlib
+import random
+from typing import Any
+
+import pytest
+
+import GeneticAlgorithm.FrameData as fd
+
+"""
+    * GameFrames and its player views checked against the records parse_frame_data makes of the same frames.
+    * Speeds are whole numbers, like the engine writes them, so the float32 columns hold them exactly.
+"""
+
+FRAME_COUNT: int = 40
+PLAYER_HP: int = 400
+
+
+def make_box(rng: random.Random) -> dict[str, int]:
+    return {'top': rng.randint(0, 640), 'bottom': rng.randint(0, 640), 'left': rng.randint(0, 960), 'right': rng.randint(0, 960)}
+
+
+def make_speed(rng: random.Random) -> dict[str, float]:
+    return {'x': float(rng.randint(-20, 20)), 'y': float(rng.randint(-20, 20))}
+
+
+def make_frame(rng: random.Random, frame: int, hit_points: list[int]) -> dict[str, Any]:
+    return {
+        'frame': frame,
+        'hitPoints': list(hit_points),
+        'energy': [rng.randint(0, 300), rng.randint(0, 300)],
+        # Player 2 isn't attacking on every other frame
+        'attackHitBoxes': [make_box(rng), make_box(rng) if frame % 2 == 0 else None],
+        'characterSpeeds': [make_speed(rng), make_speed(rng)],
+        'projectileInformation': [
+            {'playerNumber': rng.choice([True, False]), 'hitArea': make_box(rng), 'speed': make_speed(rng)}  #
+            for _ in range(frame % 3)
+        ],
+        'characterHitBoxes': [make_box(rng), make_box(rng)],
+    }
+
+
+def write_frame_data_file(frame_data_file: pathlib.Path) -> list[dict[str, Any] | None]:
+    rng: random.Random = random.Random(0)
+    hit_points: list[int] = [PLAYER_HP, PLAYER_HP]
+    raw_frame_data: list[dict[str, Any] | None] = []
+    for frame in range(FRAME_COUNT):
+        hit_points[rng.randint(0, 1)] -= rng.randint(0, 20)
+        raw_frame_data.append(make_frame(rng, frame, hit_points))
+
+    # The engine leaves the frames after the game as null
+    raw_frame_data += [None] * 3
+    frame_data_file.write_text(json.dumps(raw_frame_data))
+    return raw_frame_data
+
+
+def get_box_row(box: fd.HitArea) -> list[int]:
+    return [box.top, box.bottom, box.left, box.right]
+
+
+@pytest.mark.parametrize('frame_stride', [1, 3])
+def test_game_frames_match_frame_records(tmp_path: pathlib.Path, frame_stride: int) -> None:
+    frame_data_file: pathlib.Path = tmp_path / 'frames.json'
+    records, max_frame = fd.parse_frame_data(write_frame_data_file(frame_data_file))
+    records = records[::frame_stride]
+
+    game_frames: fd.GameFrames = fd.read_game_frames(frame_data_file, frame_stride=frame_stride)
+
+    assert max_frame == FRAME_COUNT
+    assert len(game_frames) == len(records)
+    assert list(game_frames) == records
+    assert game_frames[-1] == records[-1]
+    for frame_row, record in enumerate(records):
+        assert game_frames.frame[frame_row] == record.frame
+        assert game_frames.hitPoints[frame_row].tolist() == record.hitPoints
+        assert game_frames.energy[frame_row].tolist() == record.energy
+
+        for player, player_frames in enumerate(game_frames.players):
+            assert player_frames.hitPoints[frame_row] == record.hitPoints[player]
+            assert player_frames.energy[frame_row] == record.energy[player]
+            assert player_frames.characterHitBoxes[frame_row].tolist() == get_box_row(record.characterHitBoxes[player])
+            assert player_frames.characterSpeeds[frame_row].tolist() == [record.characterSpeeds[player].x, record.characterSpeeds[player].y]
+
+            attack_hit_box: fd.HitArea | None = record.attackHitBoxes[player]
+            assert player_frames.attackHitBoxesPresent[frame_row] == (attack_hit_box is not None)
+            if attack_hit_box is not None:
+                assert player_frames.attackHitBoxes[frame_row].tolist() == get_box_row(attack_hit_box)
+
+
+def test_game_frames_index_like_a_list(tmp_path: pathlib.Path) -> None:
+    frame_data_file: pathlib.Path = tmp_path / 'frames.json'
+    game_frames: fd.GameFrames = fd.get_game_frames(write_frame_data_file(frame_data_file))
+
+    assert game_frames[-FRAME_COUNT] == game_frames[0]
+    with pytest.raises(IndexError):
+        game_frames[FRAME_COUNT]
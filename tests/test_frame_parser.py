@@ -0,0 +1,91 @@
+import json
+import pathlib
+import random
+from typing import Any
+
+import numpy as np
+import pytest
+
+import GeneticAlgorithm.FrameArchive as fa
+import GeneticAlgorithm.FrameParser as fp
+
+"""
+    * The streaming parser checked against json.load and fa.get_frame_columns, on frames whose nested objects reuse the frame's field names.
+"""
+
+FRAME_COUNT: int = 200
+# Frames the engine leaves as null at the end of a game
+NULL_FRAME_COUNT: int = 5
+
+
+def make_box(rng: random.Random) -> dict[str, int]:
+    return {'top': rng.randint(0, 640), 'bottom': rng.randint(0, 640), 'left': rng.randint(0, 960), 'right': rng.randint(0, 960)}
+
+
+# The projectiles and attack hitboxes carry their own frame, hitPoints and energy keys
+def make_frame(rng: random.Random, frame: int, hit_points: list[int]) -> dict[str, Any]:
+    projectile: dict[str, Any] = {
+        'playerNumber': rng.choice([True, False]),
+        'hitArea': make_box(rng),
+        'speed': {'x': rng.uniform(-5, 5), 'y': rng.uniform(-5, 5)},
+        'frame': rng.randint(0, 10_000),
+        'hitPoints': [rng.randint(-400, 0), rng.randint(-400, 0)],
+        'energy': rng.randint(-300, 0),
+        'attackHitBoxes': [make_box(rng), None],
+    }
+    attack_hit_box: dict[str, Any] = {**make_box(rng), 'energy': rng.randint(-300, 0), 'hitPoints': [rng.randint(-400, 0)]}
+
+    return {
+        'projectileInformation': [projectile, None] if frame % 3 == 0 else [],
+        'attackHitBoxes': [attack_hit_box, None] if frame % 2 == 0 else [],
+        'frame': frame,
+        'hitPoints': list(hit_points),
+        'energy': [rng.randint(0, 300), rng.randint(0, 300)],
+        'characterSpeeds': [{'x': rng.uniform(-5, 5), 'y': rng.uniform(-5, 5)} for _ in range(2)],
+        'characterHitBoxes': [make_box(rng), make_box(rng)],
+    }
+
+
+def write_frame_data_file(frame_data_file: pathlib.Path, seed: int) -> list[dict[str, Any] | None]:
+    rng: random.Random = random.Random(seed)
+    hit_points: list[int] = [400, 400]
+    raw_frame_data: list[dict[str, Any] | None] = []
+    for frame in range(FRAME_COUNT):
+        hit_points[rng.randint(0, 1)] -= rng.randint(0, 3)
+        raw_frame_data.append(make_frame(rng, frame, hit_points))
+
+    raw_frame_data += [None] * NULL_FRAME_COUNT
+    frame_data_file.write_text(json.dumps(raw_frame_data))
+    return raw_frame_data
+
+
+@pytest.mark.parametrize('chunk_size_bytes', [64, 4096, fp.CHUNK_SIZE_BYTES])
+@pytest.mark.parametrize('frame_stride', [1, 3])
+def test_nested_objects_do_not_match_frame_fields(tmp_path: pathlib.Path, chunk_size_bytes: int, frame_stride: int) -> None:
+    frame_data_file: pathlib.Path = tmp_path / 'frames.json'
+    raw_frame_data: list[dict[str, Any] | None] = write_frame_data_file(frame_data_file, seed=frame_stride)
+    expected: dict[str, np.ndarray] = fa.get_frame_columns(raw_frame_data[::frame_stride], hit_boxes=True)
+
+    columns, frame_count = fp.parse_frame_fields(
+        frame_data_file,
+        [*fa.FLAT_FIELDS, *fa.TABLE_FIELDS],
+        chunk_size_bytes=chunk_size_bytes,
+        frame_stride=frame_stride,
+    )
+
+    assert frame_count == FRAME_COUNT
+    assert columns.keys() == expected.keys()
+    for column_name, column in expected.items():
+        np.testing.assert_array_equal(columns[column_name], column, err_msg=column_name)
+
+
+def test_scoring_fields_only(tmp_path: pathlib.Path) -> None:
+    frame_data_file: pathlib.Path = tmp_path / 'frames.json'
+    write_frame_data_file(frame_data_file, seed=0)
+
+    game: fa.ArchivedGame = fp.read_frame_data_file(frame_data_file, instance=0, round_number=1)
+
+    assert sorted(game.columns) == sorted(['frame', *fa.SCORING_COLUMNS])
+    np.testing.assert_array_equal(game.columns['frame'], np.arange(FRAME_COUNT))
+    assert (game.columns['hitPoints'] > 0).all()
+    assert (game.columns['energy'] >= 0).all()
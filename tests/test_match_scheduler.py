@@ -0,0 +1,163 @@
+import asyncio
+from collections import deque
+
+import pytest
+
+import constants as c
+import EngineClasses.EnginePool as ep
+import EngineClasses.MatchScheduler as ms
+
+"""
+    * The scheduler against a stand in pool, the engines never start a process.
+"""
+
+
+class FakeProcess:
+    def __init__(self) -> None:
+        self.pid: int = 0
+        self.exited: asyncio.Event = asyncio.Event()
+
+    async def wait(self) -> int:
+        await self.exited.wait()
+        return 0
+
+
+class FakeEngine:
+    def __init__(self, slot: int) -> None:
+        self.slot: int = slot
+        self.process: FakeProcess = FakeProcess()
+        self.peak_rss_bytes: int = 0
+        self.restarts: int = 0
+
+    @property
+    def is_alive(self) -> bool:
+        return not self.process.exited.is_set()
+
+
+# The pool's own acquire, release and retire, only starting and stopping the engines is faked
+class FakePool(ep.EnginePool):
+    def __init__(self, size: int, restarts_fail: bool = False) -> None:
+        self.engines: list[FakeEngine] = [FakeEngine(slot) for slot in range(size)]
+        self.idle_engines: deque[FakeEngine] = deque(self.engines)
+        self.engines_changed: asyncio.Event = asyncio.Event()
+        self.restarts_fail: bool = restarts_fail
+        self.pool_name: str = 'fakepool'
+        self.reserved_engines: int = 0
+
+    async def restart_engine(self, engine: FakeEngine) -> None:
+        if self.restarts_fail:
+            raise RuntimeError(f'Engine in slot {engine.slot} failed to start')
+        engine.restarts += 1
+        engine.process = FakeProcess()
+
+    async def stop_engine(self, engine: FakeEngine) -> None:
+        engine.process.exited.set()
+
+    def record_rss(self, engine: FakeEngine) -> None:
+        engine.peak_rss_bytes = max(engine.peak_rss_bytes, 1)
+
+
+@pytest.fixture(autouse=True)
+def no_heartbeat(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(c, 'POLL_INTERVAL_SEC', 0)
+
+
+def test_failed_game_is_retried_on_a_recycled_engine() -> None:
+    played: list[tuple[int, int]] = []
+    failed_instances: set[int] = set()
+
+    async def play_item(_engine: FakeEngine, item: ms.MatchItem) -> None:
+        # Every game fails the first time, like a game file that wasn't written yet
+        if item.instance not in failed_instances:
+            failed_instances.add(item.instance)
+            raise FileNotFoundError(f'Game {item} finished without its point and frame data files')
+        played.append((item.pairing, item.game))
+
+    pool: FakePool = FakePool(2)
+    scheduler: ms.MatchScheduler = ms.MatchScheduler(pool, play_item, item_timeout_sec=5)
+    asyncio.run(scheduler.run(ms.create_match_items(2), no_engines=2))
+
+    assert sorted(played) == [(pairing, game) for pairing in range(3) for game in range(2)]
+    assert all(item.attempts == 1 for item in scheduler.completed_items)
+    assert len(scheduler.failed_items) == 0
+    assert sum(engine.restarts for engine in pool.engines) == len(played)
+
+
+def test_game_that_keeps_failing_runs_out_of_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(c, 'GAME_RETRY_LIMIT', 2)
+
+    async def play_item(_engine: FakeEngine, item: ms.MatchItem) -> None:
+        if item.pairing == 0:
+            raise OSError('Disk quota exceeded')
+
+    scheduler: ms.MatchScheduler = ms.MatchScheduler(FakePool(1), play_item, item_timeout_sec=5)
+    with pytest.raises(RuntimeError, match='1 games could not be played'):
+        asyncio.run(scheduler.run(ms.create_match_items(1), no_engines=1))
+
+    assert [item.attempts for item in scheduler.failed_items] == [3]
+    assert len(scheduler.completed_items) == len(ms.create_match_items(1)) - 1
+
+
+def test_slow_engine_preparation_is_not_timed() -> None:
+    # Like a restart for new motions that waits on admission and a slow JVM
+    item_timeout_sec: float = 0.05
+    prepared_slots: list[int] = []
+
+    async def prepare_engine(engine: FakeEngine) -> None:
+        await asyncio.sleep(item_timeout_sec * 4)
+        prepared_slots.append(engine.slot)
+
+    async def play_item(_engine: FakeEngine, _item: ms.MatchItem) -> None:
+        await asyncio.sleep(0)
+
+    pool: FakePool = FakePool(2)
+    scheduler: ms.MatchScheduler = ms.MatchScheduler(pool, play_item, item_timeout_sec=item_timeout_sec, prepare_engine=prepare_engine)
+    asyncio.run(scheduler.run(ms.create_match_items(2), no_engines=2))
+
+    assert len(scheduler.completed_items) == len(ms.create_match_items(2))
+    assert sorted(prepared_slots) == [0, 1]
+    assert all(engine.restarts == 0 for engine in pool.engines)
+
+
+def test_runner_waiting_on_retired_engines_returns() -> None:
+    async def play_item(_engine: FakeEngine, _item: ms.MatchItem) -> None:
+        raise OSError('Disk quota exceeded')
+
+    async def run_evaluation() -> None:
+        pool: FakePool = FakePool(2, restarts_fail=True)
+        # Another evaluation sharing the pool holds the second engine, so the second runner has to wait for it
+        leased_engine: FakeEngine = await pool.acquire()
+        scheduler: ms.MatchScheduler = ms.MatchScheduler(pool, play_item, item_timeout_sec=5)
+        evaluation: asyncio.Task = asyncio.create_task(scheduler.run(ms.create_match_items(1), no_engines=2))
+
+        # The first runner retires its engine after a failed game and a failed restart
+        while len(pool.engines) != 1:
+            await asyncio.sleep(0)
+        await pool.release(leased_engine, healthy=False)
+
+        with pytest.raises(RuntimeError, match='games could not be played'):
+            await asyncio.wait_for(evaluation, timeout=5)
+        assert len(pool.engines) == 0
+
+    asyncio.run(run_evaluation())
+
+
+def test_growing_pool_stops_the_idle_engines_of_other_pools(monkeypatch: pytest.MonkeyPatch) -> None:
+    pool_size: int = 3
+    screening_pool: FakePool = FakePool(pool_size)
+    full_pool: FakePool = FakePool(pool_size)
+    monkeypatch.setattr(ep, '_ENGINE_POOLS', {('screening',): screening_pool, ('full',): full_pool})
+
+    async def grow_screening_pool() -> FakeEngine:
+        # An evaluation at full fidelity is still playing on one engine
+        full_pool.reserved_engines = 1
+        leased_engine: FakeEngine = await full_pool.acquire()
+        await ep.stop_unreserved_engines(screening_pool)
+        return leased_engine
+
+    leased_engine: FakeEngine = asyncio.run(grow_screening_pool())
+
+    assert full_pool.engines == [leased_engine]
+    assert leased_engine.is_alive
+    assert len(screening_pool.engines) == len(screening_pool.idle_engines) == pool_size
+    assert all(engine.is_alive for engine in screening_pool.engines)
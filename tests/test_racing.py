@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import GeneticAlgorithm.genetic_functions as gf
+import GeneticAlgorithm.Racing as ra
+from GeneticAlgorithm.GameResult import GameResult
+
+"""
+    * The racing interval checked against the competitive balance it is meant to bound, with unequal games per pairing.
+"""
+
+PLAYER_HP: int = 400
+
+
+def make_game_results(rng: np.random.Generator, games_per_pairing: list[int], win_chances: list[float]) -> list[GameResult]:
+    game_results: list[GameResult] = []
+    for pairing, (game_count, win_chance) in enumerate(zip(games_per_pairing, win_chances, strict=True)):
+        for game in range(game_count):
+            # A draw now and then, it is a win for neither side
+            hp_one, hp_two = rng.integers(0, PLAYER_HP, size=2).tolist()
+            if rng.random() < win_chance:
+                hp_one, hp_two = max(hp_one, hp_two), min(hp_one, hp_two)
+            else:
+                hp_one, hp_two = min(hp_one, hp_two), max(hp_one, hp_two)
+            game_results.append(GameResult(pairing, game, hp_one, hp_two))
+
+    return game_results
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_interval_holds_competitive_balance(seed: int) -> None:
+    rng: np.random.Generator = np.random.default_rng(seed)
+    game_results: list[GameResult] = make_game_results(
+        rng,
+        games_per_pairing=rng.integers(1, 30, size=3).tolist(),
+        win_chances=rng.random(size=3).tolist(),
+    )
+
+    lower_bound, upper_bound = ra.calculate_competitive_balance_interval(game_results, z=1.96)
+
+    assert lower_bound <= gf.calculate_competitive_balance(game_results) <= upper_bound
+
+
+def test_pairings_weigh_the_same() -> None:
+    # Zen wins every game against garnet, and loses every game against lud. Pooled, the many garnet games would make zen look dominant.
+    game_results: list[GameResult] = [
+        *[GameResult(0, game, PLAYER_HP, 0) for game in range(40)],
+        *[GameResult(1, game, 0, PLAYER_HP) for game in range(4)],
+        *[GameResult(2, game, PLAYER_HP * (game % 2), PLAYER_HP * (1 - game % 2)) for game in range(40)],
+    ]
+
+    lower_win_rates, upper_win_rates = ra.calculate_win_rate_interval(game_results, z=1.96)
+
+    # Averaged per pairing zen's win rate is 0.5, pooled over 44 games it would be 40 / 44
+    assert lower_win_rates[0] < ra.EVEN_WIN_RATE < upper_win_rates[0]
+
+
+def test_is_settled() -> None:
+    racing_settings: ra.RacingSettings = ra.RacingSettings(batch_games=2, min_games=4, max_interval_width=0.5, balance_floor=0.1)
+    rng: np.random.Generator = np.random.default_rng(0)
+
+    assert not ra.is_settled(make_game_results(rng, [3, 3, 3], [0.5, 0.5, 0.5]), racing_settings)
+    assert not ra.is_settled(make_game_results(rng, [4, 4, 4], [0.5, 0.5, 0.5]), racing_settings)
+    assert ra.is_settled(make_game_results(rng, [200, 200, 200], [0.5, 0.5, 0.5]), racing_settings)
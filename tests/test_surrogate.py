@@ -0,0 +1,89 @@
+import numpy as np
+
+import GeneticAlgorithm.Surrogate as su
+
+"""
+    * Dominance, which offspring get simulated (with the top-up to the minimum), and the offline check on a population the forest can learn.
+"""
+
+
+def test_is_dominated() -> None:
+    front: np.ndarray = np.array([[0.0, 1.0], [1.0, 0.0]])
+    F: np.ndarray = np.array(
+        [
+            # On the front, equal isn't dominated
+            [0.0, 1.0],
+            # Worse than the first in one objective, and as good in the other
+            [0.0, 1.5],
+            # Between the two
+            [0.5, 0.5],
+            # Worse than both
+            [2.0, 2.0],
+        ]
+    )
+
+    np.testing.assert_array_equal(su.is_dominated(F, front), [False, True, False, True])
+
+
+def test_promising_and_uncertain_are_simulated() -> None:
+    history_F: np.ndarray = np.array([[0.0, 1.0], [1.0, 0.0], [2.0, 2.0]])
+    mean: np.ndarray = np.array([[0.2, 0.2], [1.5, 1.5], [1.5, 1.5], [1.5, 1.5]])
+    std: np.ndarray = np.array([[0.0, 0.0], [0.0, 0.0], [0.0, 1.0], [1.0, 0.0]])
+
+    simulate: np.ndarray = su.select_for_simulation(mean, std, history_F, kappa=0.0, uncertainty_threshold=0.5, min_simulated_fraction=0.0)
+
+    np.testing.assert_array_equal(simulate, [True, False, True, True])
+
+    # The optimism is kappa standard deviations
+    simulate = su.select_for_simulation(mean, std, history_F, kappa=2.0, uncertainty_threshold=5.0, min_simulated_fraction=0.0)
+
+    np.testing.assert_array_equal(simulate, [True, False, True, True])
+
+
+def test_min_simulated_is_topped_up_by_uncertainty() -> None:
+    history_F: np.ndarray = np.array([[0.0, 0.0]])
+    # Nothing beats the history, and nothing is over the threshold
+    mean: np.ndarray = np.ones(shape=(5, 2))
+    std: np.ndarray = np.array([[0.1, 0.0], [0.0, 0.4], [0.2, 0.2], [0.0, 0.0], [0.3, 0.1]])
+
+    simulate: np.ndarray = su.select_for_simulation(mean, std, history_F, kappa=0.0, uncertainty_threshold=1.0, min_simulated_fraction=0.5)
+
+    # ceil(0.5 * 5) of them, the most uncertain first
+    np.testing.assert_array_equal(simulate, [False, True, True, False, True])
+
+
+def test_single_objective_keeps_the_objective_axis() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    X: np.ndarray = rng.integers(0, 10, size=(30, 3))
+
+    model = su.fit_surrogate(X, X.sum(axis=1).astype(np.float64), no_trees=5, seed=0)
+    mean, std = su.predict_objectives(model, X[:4])
+
+    assert mean.shape == (4, 1)
+    assert std.shape == (4, 1)
+
+
+def test_evaluate_surrogate_offline() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    X: np.ndarray = rng.integers(0, 10, size=(200, 2))
+    F: np.ndarray = np.column_stack([X[:, 0], 10 - X[:, 0] + 0.1 * X[:, 1]]).astype(np.float64)
+    test_count: int = 60
+
+    # Everyone is promising with a big enough kappa, so the screening can't miss any of the front
+    optimistic: dict[str, float | np.ndarray] = su.evaluate_surrogate_offline(X, F, kappa=100.0, seed=0)
+    assert optimistic['simulated_fraction'] == 1.0
+    assert optimistic['missed_front'] == 0
+    assert optimistic['rmse'].shape == (2,)
+    assert (optimistic['rmse'] < 1.0).all()
+
+    # Nothing is promising or uncertain, only the minimum is simulated
+    strict: dict[str, float | np.ndarray] = su.evaluate_surrogate_offline(
+        X,
+        F,
+        kappa=-100.0,
+        uncertainty_threshold=100.0,
+        min_simulated_fraction=0.25,
+        seed=0,
+    )
+    assert strict['simulated_fraction'] == np.ceil(0.25 * test_count) / test_count
+    assert 0 <= strict['missed_front'] <= test_count